@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Content-addressed blob store for project media
+Blobs are stored once by SHA-256 and hardlinked into build content directories,
+so figures and logos shared across projects and builds are transferred and
+stored only once.
+
+Usage:
+    echo '["<sha256>", ...]' | python blob_store.py missing
+    python blob_store.py put media/logo.png
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+from pathlib import Path
+
+# Store location (shared by all projects on this machine)
+BLOB_STORE_DIR = Path(os.getenv("THESIS_BLOB_STORE", Path(tempfile.gettempdir()) / "thesis-blobs"))
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def is_blob_digest(value: str) -> bool:
+    """Check that value looks like a lowercase hex SHA-256 digest"""
+    return isinstance(value, str) and len(value) == 64 and all(c in '0123456789abcdef' for c in value)
+
+
+class BlobStore:
+    """Local content-addressed store: <root>/<first two hex chars>/<sha256>"""
+
+    def __init__(self, root: Path = None):
+        self.root = Path(root) if root else BLOB_STORE_DIR
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path(self, digest: str) -> Path:
+        """Path of a blob inside the store"""
+        if not is_blob_digest(digest):
+            raise ValueError(f"Invalid blob digest: {digest!r}")
+        return self.root / digest[:2] / digest
+
+    def has(self, digest: str) -> bool:
+        return is_blob_digest(digest) and self.path(digest).exists()
+
+    def missing(self, digests) -> list:
+        """Return the valid digests that are not in the store, in input order, without duplicates"""
+        result = []
+        for digest in digests:
+            if digest not in result and is_blob_digest(digest) and not self.has(digest):
+                result.append(digest)
+        return result
+
+    @staticmethod
+    def invalid(digests) -> list:
+        """Return the values that are not SHA-256 digests, in input order, without duplicates"""
+        result = []
+        for digest in digests:
+            if digest not in result and not is_blob_digest(digest):
+                result.append(digest)
+        return result
+
+    def _commit(self, tmp_path: Path, digest: str) -> str:
+        """Move a fully written temp file into place (atomic, first writer wins)"""
+        target = self.path(digest)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if target.exists():
+            tmp_path.unlink()
+        else:
+            # Blobs are shared through hardlinks, so they must never be edited in place
+            os.chmod(tmp_path, 0o444)
+            os.replace(tmp_path, target)
+        return digest
+
+    def put_bytes(self, data: bytes, digest: str = None) -> str:
+        """Store data and return its digest (verified against digest if given)"""
+        actual = hashlib.sha256(data).hexdigest()
+        if digest and digest != actual:
+            raise ValueError(f"Blob content does not match digest {digest}")
+        if self.has(actual):
+            return actual
+
+        fd, tmp_name = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        return self._commit(Path(tmp_name), actual)
+
+    def put_stream(self, stream, digest: str = None) -> str:
+        """Store a binary stream chunk by chunk and return its digest"""
+        hasher = hashlib.sha256()
+        fd, tmp_name = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                hasher.update(chunk)
+                f.write(chunk)
+
+        actual = hasher.hexdigest()
+        if digest and digest != actual:
+            os.unlink(tmp_name)
+            raise ValueError(f"Blob content does not match digest {digest}")
+        return self._commit(Path(tmp_name), actual)
+
+    def put_file(self, file_path: Path) -> str:
+        """Store a copy of an existing file and return its digest
+
+        The store keeps its own copy: linking the caller's file would share
+        its inode, and a later in-place edit would corrupt the blob.
+        """
+        with open(file_path, 'rb') as f:
+            return self.put_stream(f)
+
+    def link_into(self, digest: str, dest: Path) -> bool:
+        """Materialize a blob at dest (hardlink, or copy across filesystems)
+
+        Returns False if the blob is not in the store.
+        """
+        source = self.path(digest)
+        if not source.exists():
+            return False
+
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        if dest.exists():
+            dest.unlink()
+        try:
+            os.link(source, dest)
+        except OSError:
+            shutil.copyfile(source, dest)
+        return True
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ('missing', 'put'):
+        print(__doc__)
+        sys.exit(1)
+
+    store = BlobStore()
+
+    if sys.argv[1] == 'missing':
+        digests = json.load(sys.stdin)
+        print(json.dumps({'missing': store.missing(digests), 'invalid': store.invalid(digests)}))
+    else:
+        for file_name in sys.argv[2:]:
+            print(f"{store.put_file(Path(file_name))}  {file_name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,9 +4,15 @@ Thesis Build Script
 Compiles LaTeX thesis to PDF with proper error handling
 """
 
+import os
+import re
 import sys
+import time
+import signal
+import threading
 import subprocess
 from pathlib import Path
+from convert_md import convert_project
 
 # Directories
 ROOT_DIR = Path(__file__).parent.parent.parent
@@ -39,16 +45,49 @@ def warning(message):
     """Print warning message"""
     log(message, Colors.YELLOW)
 
-def run_command(cmd, cwd=None):
-    """Run shell command and return success status"""
+class BuildCancelled(Exception):
+    """Raised when a command is stopped through its cancel event"""
+
+def run_cancellable(cmd, cwd=None, cancel_event=None):
+    """subprocess.run() that kills the command's process group when cancel_event is set"""
+    process = subprocess.Popen(
+        cmd,
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        start_new_session=True
+    )
+    while True:
+        try:
+            stdout, stderr = process.communicate(timeout=0.2)
+            return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+        except subprocess.TimeoutExpired:
+            if cancel_event.is_set():
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                process.communicate()
+                raise BuildCancelled(' '.join(cmd))
+
+def run_command(cmd, cwd=None, cancel_event=None):
+    """Run shell command and return success status
+
+    If cancel_event is given and gets set, the command (and everything it
+    spawned) is killed and BuildCancelled is raised.
+    """
     try:
-        result = subprocess.run(
-            cmd,
-            cwd=cwd,
-            capture_output=True,
-            text=True,
-            check=False
-        )
+        if cancel_event is not None:
+            result = run_cancellable(cmd, cwd, cancel_event)
+        else:
+            result = subprocess.run(
+                cmd,
+                cwd=cwd,
+                capture_output=True,
+                text=True,
+                check=False
+            )
 
         if result.returncode != 0:
             error(f"Command failed: {' '.join(cmd)}")
@@ -57,6 +96,8 @@ def run_command(cmd, cwd=None):
             return False
 
         return True
+    except BuildCancelled:
+        raise
     except Exception as e:
         error(f"Error running command: {e}")
         return False
@@ -79,21 +120,29 @@ def convert_markdown():
 
     log(f"Found {len(md_files)} Markdown chapters")
 
-    # Run conversion script
-    convert_script = CORE_DIR / "scripts" / "convert_md.py"
-    if not convert_script.exists():
-        error("Conversion script not found!")
-        return False
+    # Convert in-process (no extra interpreter)
+    result = convert_project(
+        CONTENT_DIR / "text",
+        BUILD_DIR,
+        CONTENT_DIR / "metadata.yaml",
+        content_dir=CONTENT_DIR
+    )
 
-    if run_command([sys.executable, str(convert_script)], cwd=ROOT_DIR):
-        success("✓ Markdown converted to LaTeX")
+    for file_result in result['files']:
+        if file_result['status'] == 'failed':
+            error(f"{file_result['source'].name}: {file_result['error']}")
+
+    if result['success']:
+        success(f"✓ Markdown converted to LaTeX "
+                f"({result['converted']} converted, {result['skipped']} unchanged, "
+                f"{result['removed']} removed, {result['seconds']:.1f}s)")
         return True
     else:
         error("✗ Markdown conversion failed")
         return False
 
-def build_latex():
-    """Build LaTeX thesis using latexmk"""
+def build_latex(cancel_event=None):
+    """Build LaTeX thesis using latexmk (cancellable through cancel_event)"""
     log("Compiling LaTeX to PDF...")
 
     # Check if thesis.tex exists (generated from MD or original)
@@ -120,7 +169,7 @@ def build_latex():
 
     log("Running: " + " ".join(cmd))
 
-    run_command(cmd)  # Run regardless of return code (with -f flag)
+    run_command(cmd, cancel_event=cancel_event)  # Run regardless of return code (with -f flag)
 
     # Check if PDF was generated in build directory
     pdf_build = BUILD_DIR / "thesis.pdf"
@@ -137,6 +186,125 @@ def build_latex():
         error("✗ Compilation failed. No PDF generated.")
         return False
 
+class LatexmkSession:
+    """latexmk kept running in continuous-preview mode (-pvc) across builds
+
+    latexmk polls its own dependency list (every sleep_time seconds) and
+    recompiles when the generated .tex, .bib or theme files change, reusing
+    its aux files and dependency database instead of starting cold. compile()
+    waits until latexmk has picked up the latest changes and gone idle.
+    """
+
+    RUN_STARTED_RE = re.compile(r"Run number \d+ of rule|applying rule")
+    IDLE_MARKER = "=== Watching for updated files"
+
+    def __init__(self, thesis_file: Path = None, build_dir: Path = None, sleep_time: float = 0.5):
+        self.thesis_file = thesis_file or BUILD_DIR / "thesis.tex"
+        self.build_dir = build_dir or BUILD_DIR
+        self.sleep_time = sleep_time
+        self.process = None
+        self.condition = threading.Condition()
+        self.running = False
+        self.runs_started = 0
+        self.runs_finished = 0
+        self.last_run_started = 0.0
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        cmd = [
+            "latexmk",
+            "-bibtex",
+            "-pdf",
+            "-pvc",
+            "-view=none",
+            "-interaction=nonstopmode",
+            "-f",  # Force completion even with errors
+            "-e", f"$sleep_time = {self.sleep_time}",
+            "-output-directory=" + str(self.build_dir),
+            "-cd",
+            str(self.thesis_file)
+        ]
+        log("Starting persistent latexmk session: " + " ".join(cmd))
+        self.process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            stdin=subprocess.DEVNULL,
+            text=True,
+            errors='replace',
+            start_new_session=True
+        )
+        threading.Thread(target=self._read_output, name="latexmk-pvc", daemon=True).start()
+
+    def _read_output(self):
+        for line in self.process.stdout:
+            with self.condition:
+                if self.RUN_STARTED_RE.search(line):
+                    if not self.running:
+                        self.running = True
+                        self.runs_started += 1
+                        self.last_run_started = time.time()
+                elif line.startswith(self.IDLE_MARKER):
+                    if self.running or self.runs_finished == 0:
+                        self.running = False
+                        self.runs_finished += 1
+                self.condition.notify_all()
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+
+    def stop(self):
+        if self.alive:
+            try:
+                os.killpg(self.process.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+            self.process.wait()
+
+    def compile(self, cancel_event=None) -> bool:
+        """Wait for latexmk to compile the current sources; True if a PDF exists"""
+        if not self.alive:
+            self.start()
+
+        # latexmk needs up to one poll interval to notice a change
+        grace = self.sleep_time * 2 + 1.0
+        called_at = time.time()
+        deadline = called_at + grace
+
+        with self.condition:
+            while True:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise BuildCancelled("latexmk session")
+                if not self.alive:
+                    break
+                if not self.running and self.runs_finished and self.last_run_started >= called_at:
+                    # A run that started after the sources were written has finished
+                    break
+                if self.running or self.runs_finished == 0:
+                    # A run is in progress: wait for it, then allow a rerun to start
+                    deadline = time.time() + grace
+                elif time.time() >= deadline:
+                    # Idle for a whole poll interval: the sources are compiled
+                    break
+                self.condition.wait(0.1)
+
+        if not self.alive:
+            error("✗ latexmk session exited")
+            return False
+
+        pdf_build = self.build_dir / "thesis.pdf"
+        if pdf_build.exists():
+            # Copy PDF to root directory
+            import shutil
+            shutil.copy2(pdf_build, ROOT_DIR / "thesis-temp.pdf")
+            success("✓ PDF compiled successfully!")
+            return True
+        error("✗ Compilation failed. No PDF generated.")
+        return False
+
 def main():
     """Main build function"""
     log("=" * 60)
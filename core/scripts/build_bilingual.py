@@ -1,16 +1,39 @@
 #!/usr/bin/env python3
 """
 Bilingual Thesis Build Script
-Builds Portuguese and French versions in parallel
+Builds the source language version and every translation in parallel
+
+Languages come from metadata.yaml (see languages.py; default PT → FR).
+Each target language is translated into content/text-<code> and built in
+/tmp/thesis-build-<code> into thesis-temp-<code>.pdf; the source language
+builds into thesis-temp.pdf.
+
+The build is pipelined: the source build starts right away, each
+translated chapter is converted to LaTeX as soon as its translation lands,
+and each language is compiled as soon as its own translation is done.
+Compiles take their cores from the machine-wide build scheduler (see
+build_scheduler.py), so concurrent builds stay within THESIS_BUILD_CORES.
+Language-independent inputs are shared, not copied: every thesis.tex
+reads media, bibliography and theme in place from content/ and core/theme/.
 """
 
 import sys
 import os
+import json
+import time
+import threading
 import subprocess
 import shutil
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor
-from translator import translate_thesis_content
+from contextlib import contextmanager
+from translator import translate_languages
+from translation_backends import backend_available
+from translation_telemetry import report_path, summarize
+from convert_md import convert_project, convert_ahead, load_metadata
+from crossref import CrossrefIndex
+from languages import language_matrix
+from build_scheduler import BuildScheduler, TOTAL_CORES, POLL_INTERVAL
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -19,10 +42,15 @@ load_dotenv()
 # Directories
 ROOT_DIR = Path(__file__).parent.parent.parent
 CONTENT_DIR = ROOT_DIR / "content"
-BUILD_DIR_PT = Path("/tmp/thesis-build-pt")
-BUILD_DIR_FR = Path("/tmp/thesis-build-fr")
+BUILD_DIR_PATTERN = "/tmp/thesis-build-{}"  # per language code
 CORE_DIR = ROOT_DIR / "core"
 
+# Scheduler identity and priority of this build (see build_scheduler.py)
+SCHEDULER_PROJECT = "bilingual"
+SCHEDULER_PRIORITY = os.getenv("THESIS_BUILD_PRIORITY", "interactive")
+# Builds plus chapter conversions (one pandoc each)
+PIPELINE_WORKERS = max(2, TOTAL_CORES + 1)
+
 # Colors for terminal output
 class Colors:
     GREEN = '\033[92m'
@@ -47,20 +75,163 @@ def warning(message, lang=""):
     log(message, Colors.YELLOW, lang)
 
 
-def translate_content(api_key: str):
-    """Translate content to French"""
-    log("🌍 Translating content to French...", Colors.BLUE)
+def language_versions(metadata: dict) -> list:
+    """Source version first, then one per target language
 
-    content_dir = CONTENT_DIR / "text"
-    output_dir = CONTENT_DIR / "text-fr"
+    Each version: {'language', 'label', 'text_dir', 'metadata_file',
+    'build_dir', 'output_pdf'}. Raises ValueError for a bad languages config.
+    """
+    source, targets = language_matrix(metadata)
+    versions = [{
+        'language': source,
+        'label': source['code'].upper(),
+        'text_dir': CONTENT_DIR / "text",
+        'metadata_file': CONTENT_DIR / "metadata.yaml",
+        'build_dir': Path(BUILD_DIR_PATTERN.format(source['code'])),
+        'output_pdf': "thesis-temp.pdf",
+    }]
+    for target in targets:
+        text_dir = CONTENT_DIR / f"text-{target['code']}"
+        versions.append({
+            'language': target,
+            'label': target['code'].upper(),
+            'text_dir': text_dir,
+            'metadata_file': text_dir / "metadata.yaml",  # metadata.yaml inside text-<code>/
+            'build_dir': Path(BUILD_DIR_PATTERN.format(target['code'])),
+            'output_pdf': f"thesis-temp-{target['code']}.pdf",
+        })
+    return versions
+
+
+def translate_content(api_key: str, source: dict, targets: list, on_file=None, on_target=None) -> dict:
+    """Translate content into every target version; returns {code: success}
+
+    on_file: see translator.run_translation_jobs
+    on_target(version, success) is called as soon as each target is done
+    (from the translation event loop, so it must not block).
+    """
+    names = ', '.join(version['language']['name'] for version in targets)
+    log(f"🌍 Translating content to {names}...", Colors.BLUE)
+    versions = {version['language']['code']: version for version in targets}
+    translated = {}
+
+    def target_done(code, outcome):
+        version = versions[code]
+        translated[code] = outcome is None
+        if outcome is None:
+            success("✓ Translation complete!", version['label'])
+        else:
+            error(f"Translation failed: {outcome}", version['label'])
+        report_translation(report_path(version['text_dir']), version['label'])
+        if on_target:
+            on_target(version, outcome is None)
 
     try:
-        translate_thesis_content(api_key, content_dir, output_dir)
-        success("✓ Translation complete!")
-        return True
+        translate_languages(
+            api_key, CONTENT_DIR / "text",
+            [(version['language'], version['text_dir']) for version in targets],
+            on_file=on_file, source=source['language'], on_target=target_done)
     except Exception as e:
         error(f"Translation failed: {e}")
-        return False
+        for code in versions:
+            if code not in translated:
+                target_done(code, e)
+    return translated
+
+
+def report_translation(report_file: Path, lang: str = ""):
+    """Summarize the translation telemetry report (tokens, latency, cache hits)"""
+    try:
+        report = json.loads(report_file.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return
+    log(f"📊 Translation report: {report_file.name}", lang=lang)
+    for line in summarize(report):
+        log(line, lang=lang)
+
+
+class TargetConversions:
+    """Converts one target language's Markdown to LaTeX as the translations land
+
+    on_file() is called from the translation event loop and only submits
+    work to the executor. Chapters wait for the translated metadata, whose
+    strings give the cross-reference prefixes; build_version() then skips
+    every chapter converted here (see convert_md.convert_ahead).
+    """
+
+    def __init__(self, executor, version: dict):
+        self.executor = executor
+        self.version = version
+        self.text_dir = version['text_dir']
+        self.metadata = None
+        self.crossref = None
+        self.waiting = []
+        self.futures = []
+
+    def on_file(self, input_path: Path, output_path: Path):
+        output_path = Path(output_path)
+        if output_path == self.version['metadata_file']:
+            self.metadata = load_metadata(output_path)
+            self.crossref = CrossrefIndex(self.metadata)
+            waiting, self.waiting = self.waiting, []
+            for md_file in waiting:
+                self._submit(md_file)
+        elif output_path.parent.parent == self.text_dir and output_path.suffix == '.md':
+            if self.metadata is None:
+                self.waiting.append(output_path)
+            else:
+                self._submit(output_path)
+
+    def _submit(self, md_file: Path):
+        self.futures.append(self.executor.submit(
+            convert_ahead, md_file, self.version['build_dir'], self.metadata, CONTENT_DIR, self.crossref))
+
+    def wait(self):
+        """Wait for the conversions started so far"""
+        records = [future.result() for future in self.futures]
+        converted = sum(record['status'] == 'converted' for record in records)
+        failed = [record['source'].name for record in records if record['status'] == 'failed']
+        lang = self.version['label']
+        log(f"✓ {converted} file(s) converted during translation", Colors.GREEN, lang)
+        if failed:
+            # build_version() converts them again and reports the errors
+            warning(f"Early conversion failed: {', '.join(failed)}", lang)
+
+
+class CompileSlots:
+    """Cores for LaTeX compiles, taken from the global build budget
+
+    The run holds one scheduler core (BuildScheduler.job) for its first
+    compile; compiles running next to it borrow cores like build_project.py
+    does for conversions, waiting while the scheduler has none to lend.
+    """
+
+    def __init__(self, scheduler: BuildScheduler = None, job_id: str = None):
+        self.scheduler = scheduler
+        self.job_id = job_id
+        self.own_core_free = True
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def slot(self):
+        borrowed = 0
+        while True:
+            with self.lock:
+                if self.own_core_free:
+                    self.own_core_free = False
+                    break
+            borrowed = self.scheduler.borrow(self.job_id, 1) if self.scheduler else 0
+            if borrowed:
+                break
+            time.sleep(POLL_INTERVAL)
+        try:
+            yield
+        finally:
+            if borrowed:
+                self.scheduler.give_back(self.job_id, borrowed)
+            else:
+                with self.lock:
+                    self.own_core_free = True
 
 
 def run_command(cmd, cwd=None, lang=""):
@@ -86,56 +257,40 @@ def run_command(cmd, cwd=None, lang=""):
         return False
 
 
-def build_version(lang: str, build_dir: Path, output_pdf: str):
+def build_version(version: dict, slots: CompileSlots = None):
     """
     Build a single language version
 
     Args:
-        lang: "PT" or "FR"
-        build_dir: Build directory for this version
-        output_pdf: Output PDF filename
+        version: see language_versions()
+        slots: cores for the compile (default: unscheduled, one at a time)
 
     Returns:
         bool: Success status
     """
+    lang = version['label']
+    build_dir = version['build_dir']
+    output_pdf = version['output_pdf']
     log(f"Starting build...", Colors.BLUE, lang)
 
     # Create build directory
     build_dir.mkdir(exist_ok=True)
 
-    # Determine content directory
-    if lang == "PT":
-        text_dir = CONTENT_DIR / "text"
-        metadata_file = CONTENT_DIR / "metadata.yaml"
-    else:  # FR
-        text_dir = CONTENT_DIR / "text-fr"
-        metadata_file = text_dir / "metadata.yaml"  # metadata.yaml inside text-fr/
-
     # Convert Markdown to LaTeX
     log("Converting Markdown to LaTeX...", Colors.BLUE, lang)
 
-    convert_script = CORE_DIR / "scripts" / "convert_md.py"
-
-    # Run conversion with custom paths
-    env = os.environ.copy()
-    env['TEXT_DIR'] = str(text_dir)
-    env['BUILD_DIR'] = str(build_dir)
-    env['METADATA_FILE'] = str(metadata_file)
+    # Convert in-process with explicit paths (safe to run languages in parallel threads)
+    result = convert_project(version['text_dir'], build_dir, version['metadata_file'], content_dir=CONTENT_DIR)
 
-    result = subprocess.run(
-        [sys.executable, str(convert_script)],
-        cwd=ROOT_DIR,
-        env=env,
-        capture_output=True,
-        text=True
-    )
-
-    if result.returncode != 0:
+    if not result['success'] or not result['main_tex']:
         error("Markdown conversion failed", lang)
-        print(result.stderr)
+        for file_result in result['files']:
+            if file_result['status'] == 'failed':
+                print(f"  {file_result['source'].name}: {file_result['error']}")
         return False
 
-    success("✓ Markdown converted", lang)
+    success(f"✓ Markdown converted ({result['converted']} converted, "
+            f"{result['skipped']} unchanged, {result['seconds']:.1f}s)", lang)
 
     # Build LaTeX
     log("Compiling LaTeX to PDF...", Colors.BLUE, lang)
@@ -158,7 +313,9 @@ def build_version(lang: str, build_dir: Path, output_pdf: str):
         str(thesis_file)
     ]
 
-    run_command(cmd, lang=lang)
+    # Within the core budget
+    with (slots or CompileSlots()).slot():
+        run_command(cmd, lang=lang)
 
     # Check if PDF was generated
     pdf_build = build_dir / "thesis.pdf"
@@ -174,50 +331,80 @@ def build_version(lang: str, build_dir: Path, output_pdf: str):
 
 
 def build_parallel(api_key: str = None):
-    """Build both versions in parallel"""
+    """Build every language version, the source in parallel with the translation"""
+    try:
+        versions = language_versions(load_metadata(CONTENT_DIR / "metadata.yaml"))
+    except ValueError as e:
+        error(f"Invalid languages in metadata.yaml: {e}")
+        return 1
+    source, targets = versions[0], versions[1:]
+
     log("=" * 60)
-    log("Building Bilingual Thesis (PT + FR)")
+    log(f"Building Thesis ({' + '.join(version['label'] for version in versions)})")
     log("=" * 60)
 
-    # Step 1: Translate to French if API key provided
-    if api_key:
-        if not translate_content(api_key):
-            warning("⚠️  Translation failed, skipping French build")
-            # Continue with Portuguese only
-            success_pt = build_version("PT", BUILD_DIR_PT, "thesis-temp.pdf")
-            return 0 if success_pt else 1
-    else:
-        warning("⚠️  No GROQ_API_KEY provided, skipping translation")
-        warning("⚠️  Using existing French content if available")
-
-    # Step 2: Build both versions in parallel
-    log("🚀 Building PT and FR versions in parallel...")
-
-    with ThreadPoolExecutor(max_workers=2) as executor:
-        # Submit both build tasks
-        future_pt = executor.submit(build_version, "PT", BUILD_DIR_PT, "thesis-temp.pdf")
-        future_fr = executor.submit(build_version, "FR", BUILD_DIR_FR, "thesis-temp-fr.pdf")
-
-        # Wait for both to complete
-        success_pt = future_pt.result()
-        success_fr = future_fr.result()
+    def report_position(position):
+        log(f"Queued: position {position}", Colors.YELLOW)
+
+    scheduler = BuildScheduler()
+    with scheduler.job(SCHEDULER_PROJECT, SCHEDULER_PRIORITY, on_position=report_position) as job_id, \
+            ThreadPoolExecutor(max_workers=PIPELINE_WORKERS) as executor:
+        slots = CompileSlots(scheduler, job_id)
+
+        # The source build needs no translation: start it right away
+        log(f"🚀 Building {source['label']} while translating and converting the other languages...")
+        futures = {source['label']: executor.submit(build_version, source, slots)}
+
+        # Translate if API key provided (or a backend that needs none),
+        # converting each translated file as it lands
+        if targets and backend_available(api_key):
+            conversions = {version['label']: TargetConversions(executor, version) for version in targets}
+
+            def on_file(input_path, output_path):
+                for target_conversions in conversions.values():
+                    target_conversions.on_file(input_path, output_path)
+
+            def build_translated(version, translated):
+                conversions[version['label']].wait()
+                if not translated:
+                    warning("⚠️  Translation failed, skipping this build", version['label'])
+                    return None
+                return build_version(version, slots)
+
+            # Each language is compiled as soon as its own translation is done.
+            # Its conversions were submitted before it, so they never queue behind it.
+            def on_target(version, translated):
+                futures[version['label']] = executor.submit(build_translated, version, translated)
+
+            translate_content(api_key, source, targets, on_file, on_target)
+        else:
+            if targets:
+                warning("⚠️  No GROQ_API_KEY provided, skipping translation")
+                warning("⚠️  Using existing translated content if available")
+            for version in targets:
+                if version['metadata_file'].exists():
+                    futures[version['label']] = executor.submit(build_version, version, slots)
+                else:
+                    warning(f"⚠️  No translated content in {version['text_dir'].name}/, skipping", version['label'])
+
+        results = {label: future.result() for label, future in futures.items()}
+        # Skipped builds (failed translations) are not results
+        results = {label: ok for label, ok in results.items() if ok is not None}
 
     # Report results
     log("=" * 60)
-    if success_pt and success_fr:
-        success("✅ Both versions compiled successfully! 🎉")
-        log("📄 Portuguese: thesis-temp.pdf")
-        log("📄 French: thesis-temp-fr.pdf")
+    for version in versions:
+        if version['label'] not in results:
+            continue
+        if results[version['label']]:
+            log(f"📄 {version['language']['name']}: {version['output_pdf']}")
+        else:
+            error(f"✗ {version['language']['name']} failed", version['label'])
+    if all(results.values()):
+        success(f"✅ {len(results)} version(s) compiled successfully! 🎉")
         return 0
-    elif success_pt:
-        warning("⚠️  Portuguese OK, French failed")
-        return 1
-    elif success_fr:
-        warning("⚠️  French OK, Portuguese failed")
-        return 1
-    else:
-        error("❌ Both builds failed")
-        return 1
+    error(f"❌ {sum(not ok for ok in results.values())} of {len(results)} build(s) failed")
+    return 1
 
 
 def main():
@@ -225,9 +412,10 @@ def main():
     # Get API key from environment
     api_key = os.getenv("GROQ_API_KEY")
 
-    if not api_key:
+    if not backend_available(api_key):
         warning("GROQ_API_KEY not set - translation will be skipped")
         warning("Set it with: export GROQ_API_KEY='your-key-here'")
+        warning("(or TRANSLATION_BACKEND=openai for a local model, fake for an offline dry run)")
 
     return build_parallel(api_key)
 
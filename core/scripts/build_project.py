@@ -8,6 +8,27 @@ Usage:
 
 Or with a JSON file:
     python build_project.py --input project_data.json
+
+Or with a tar stream (project.json first, then files at their project paths,
+media stored as raw bytes instead of base64):
+    tar -cf - project.json chapters/ media/ | python build_project.py --format=tar
+
+Media can reference the shared blob store (see blob_store.py) instead of
+inlining bytes: {"path": "media/logo.png", "type": "IMAGE", "blob": "<sha256>"}.
+Unknown digests fail the build with "missing_blobs" in the result; upload them
+(inline with the same "blob" key, or as tar members blobs/<sha256>) and retry.
+Malformed digests, and blobs whose bytes do not match their digest, fail it
+with "invalid_blobs".
+
+Scheduling:
+    Builds wait for a core in the machine-wide build scheduler (see
+    build_scheduler.py). Use --priority=final for exports, which yield to
+    interactive previews, or --no-schedule to bypass the scheduler.
+
+Progress protocol:
+    --protocol=text    human-readable log on stdout, JSON after "--- RESULT ---" (default)
+    --protocol=ndjson  one JSON event per line on stdout, log written to
+                       <build_dir>/build.log, final line is {"event": "result", ...}
 """
 
 import sys
@@ -20,6 +41,14 @@ from pathlib import Path
 import yaml
 import argparse
 import re
+import time
+import signal
+import threading
+from collections import deque
+from contextlib import contextmanager, redirect_stdout, nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from build_scheduler import BuildScheduler, PRIORITIES
+from crossref import CrossrefIndex
 
 # Get the root directory of thesis-writer
 SCRIPT_DIR = Path(__file__).parent
@@ -27,6 +56,199 @@ CORE_DIR = SCRIPT_DIR.parent  # core/scripts/../ = core/
 THEME_DIR = CORE_DIR / "theme"
 TEMPLATES_DIR = CORE_DIR.parent / "templates"  # thesis-writer/templates/
 
+# Stream for NDJSON progress events (None in text mode)
+_EVENT_STREAM = None
+
+# (scheduler, job_id) while this build holds a scheduler slot
+_SCHEDULER_JOB = None
+
+# Per-stage timeouts in seconds (override with --stage-timeout STAGE=SECONDS)
+STAGE_TIMEOUTS = {
+    'setup': 120,
+    'write_files': 300,
+    'convert': 600,
+    'generate': 60,
+    'compile': 900,
+}
+
+# Cancellation state: tool processes run in their own process groups so the
+# whole tree (latexmk -> pdflatex/biber) can be killed
+_CANCEL = threading.Event()
+_ACTIVE_PROCESSES = set()
+# Reentrant: the SIGTERM/SIGINT handler takes it on the main thread, possibly
+# while start_tool/finish_tool already hold it there
+_ACTIVE_LOCK = threading.RLock()
+_STAGE_DEADLINE = None  # (stage name, time.monotonic() deadline)
+
+# Seconds between SIGTERM and SIGKILL when stopping a tool process group
+KILL_GRACE_SECONDS = 3
+
+# Lines of latexmk output kept for the error report (bounded memory)
+LATEXMK_TAIL_LINES = 200
+
+LATEXMK_PASS_RE = re.compile(r"Run number (\d+) of rule '([^']+)'")
+LATEX_WARNING_RE = re.compile(r"^((?:LaTeX|Package \S+|Class \S+) Warning: .*)$")
+
+
+class BuildCancelled(BaseException):
+    """Raised when the build is cancelled or a stage exceeds its timeout
+
+    A BaseException (like KeyboardInterrupt): it is raised from the signal
+    handler and must not be swallowed by the build's `except Exception` blocks.
+    """
+
+
+def kill_process_group(process: subprocess.Popen):
+    """Terminate a tool and everything it spawned, escalating to SIGKILL
+
+    The group is signalled even if the tool itself has exited: pdflatex or
+    biber children it left behind are still members.
+    """
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+    deadline = time.monotonic() + KILL_GRACE_SECONDS
+    while time.monotonic() < deadline:
+        process.poll()  # reap the tool so a zombie does not keep the group alive
+        try:
+            os.killpg(process.pid, 0)
+        except ProcessLookupError:
+            return
+        time.sleep(0.05)
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def cancel_build():
+    """Flag the build as cancelled and kill all running tool process groups"""
+    _CANCEL.set()
+    with _ACTIVE_LOCK:
+        processes = list(_ACTIVE_PROCESSES)
+    for process in processes:
+        kill_process_group(process)
+
+
+def handle_cancel_signal(signum, frame):
+    """SIGTERM/SIGINT handler: stop tools and unwind the build"""
+    if _CANCEL.is_set():
+        return
+    cancel_build()
+    raise BuildCancelled(f"Build cancelled ({signal.Signals(signum).name})")
+
+
+def check_cancelled():
+    """Raise BuildCancelled if the build was cancelled or the stage timed out"""
+    if _CANCEL.is_set():
+        raise BuildCancelled("Build cancelled")
+    if _STAGE_DEADLINE and time.monotonic() > _STAGE_DEADLINE[1]:
+        raise BuildCancelled(f"Stage '{_STAGE_DEADLINE[0]}' timed out")
+
+
+def remaining_stage_time():
+    """Seconds left before the current stage's deadline (None if unbounded)"""
+    if _STAGE_DEADLINE is None:
+        return None
+    return max(0.0, _STAGE_DEADLINE[1] - time.monotonic())
+
+
+def start_tool(cmd: list, cwd=None, **popen_args) -> subprocess.Popen:
+    """Start an external tool in its own process group and track it"""
+    check_cancelled()
+    process = subprocess.Popen(cmd, cwd=cwd, start_new_session=True, **popen_args)
+    with _ACTIVE_LOCK:
+        _ACTIVE_PROCESSES.add(process)
+    # A cancel may have raced with the start
+    if _CANCEL.is_set():
+        kill_process_group(process)
+    return process
+
+
+def finish_tool(process: subprocess.Popen):
+    """Stop tracking a tool process and make sure its group is gone"""
+    with _ACTIVE_LOCK:
+        _ACTIVE_PROCESSES.discard(process)
+    kill_process_group(process)
+
+
+def run_tool(cmd: list, cwd=None, input: str = None) -> subprocess.CompletedProcess:
+    """subprocess.run() replacement honouring cancellation and the stage timeout"""
+    stdin = subprocess.PIPE if input is not None else None
+    process = start_tool(cmd, cwd, stdin=stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    try:
+        stdout, stderr = process.communicate(input=input, timeout=remaining_stage_time())
+    except subprocess.TimeoutExpired:
+        kill_process_group(process)
+        process.communicate()
+        raise BuildCancelled(f"Stage '{_STAGE_DEADLINE[0]}' timed out")
+    finally:
+        finish_tool(process)
+
+    check_cancelled()
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+
+def emit_event(event: str, **fields):
+    """Write one progress event as a JSON line (no-op in text mode)"""
+    if _EVENT_STREAM is None:
+        return
+    record = {'event': event, 'time': round(time.time(), 3)}
+    record.update(fields)
+    _EVENT_STREAM.write(json.dumps(record, ensure_ascii=False) + "\n")
+    _EVENT_STREAM.flush()
+
+
+def borrow_cores(wanted: int) -> int:
+    """Borrow extra cores from the global build budget (0 when unscheduled)"""
+    if _SCHEDULER_JOB is None or wanted <= 0:
+        return 0
+    scheduler, job_id = _SCHEDULER_JOB
+    return scheduler.borrow(job_id, wanted)
+
+
+def return_cores(cores: int):
+    """Give borrowed cores back to the global build budget"""
+    if _SCHEDULER_JOB is not None and cores > 0:
+        scheduler, job_id = _SCHEDULER_JOB
+        scheduler.give_back(job_id, cores)
+
+
+@contextmanager
+def scheduled_build(project_id: str, priority: str):
+    """Wait for a slot in the global build scheduler and hold it while building"""
+    global _SCHEDULER_JOB
+
+    def report_position(position):
+        print(f"Queued: position {position}", file=sys.stderr if _EVENT_STREAM else sys.stdout)
+        emit_event('queued', position=position)
+
+    scheduler = BuildScheduler()
+    with scheduler.job(project_id, priority, on_position=report_position) as job_id:
+        _SCHEDULER_JOB = (scheduler, job_id)
+        try:
+            yield
+        finally:
+            _SCHEDULER_JOB = None
+
+
+@contextmanager
+def build_stage(name: str):
+    """Emit stage_start/stage_end events around a block of the build"""
+    global _STAGE_DEADLINE
+
+    check_cancelled()
+    started = time.time()
+    timeout = STAGE_TIMEOUTS.get(name)
+    _STAGE_DEADLINE = (name, time.monotonic() + timeout) if timeout else None
+    emit_event('stage_start', stage=name)
+    try:
+        yield
+    finally:
+        _STAGE_DEADLINE = None
+        emit_event('stage_end', stage=name, duration=round(time.time() - started, 3))
+
 
 def load_template_config(template_id: str) -> dict:
     """Load template configuration from template.json"""
@@ -98,11 +320,55 @@ def copy_theme_to_build(build_dir: Path) -> Path:
 
 
 import base64
+import tarfile
+from blob_store import BlobStore, is_blob_digest
+
+
+# Name of the manifest member in a tar project archive
+ARCHIVE_MANIFEST = "project.json"
+
+# Archive members under this prefix are uploads for the blob store
+ARCHIVE_BLOBS_PREFIX = "blobs/"
+
+
+def is_media_file(file_path: str, file_type: str) -> bool:
+    """Check whether a project file is binary media"""
+    return file_type == 'IMAGE' or file_path.startswith('media/')
+
+
+def organize_project_file(organized: dict, file_path: str, full_path: Path):
+    """Add a written text file to the organized dict by type"""
+    if file_path.endswith('.yaml') or file_path.endswith('.yml'):
+        if 'metadata' in file_path:
+            organized['metadata'] = full_path
+    elif file_path.endswith('.bib'):
+        organized['bibliography'].append(full_path)
+    elif file_path.endswith('.md'):
+        if 'chapters/' in file_path:
+            organized['chapters'].append(full_path)
+        elif 'sections/' in file_path:
+            organized['sections'].append(full_path)
+        elif 'structure/' in file_path:
+            organized['structure'].append(full_path)
+        elif 'appendices/' in file_path:
+            organized['appendices'].append(full_path)
+        else:
+            # Default to chapters for root-level .md files
+            organized['chapters'].append(full_path)
 
 
-def write_project_files(content_dir: Path, files: list) -> dict:
+def write_project_files(content_dir: Path, files: list, blob_store: BlobStore = None) -> dict:
     """Write project files from database to disk
 
+    Files marked as 'staged' are already on disk (extracted from a project
+    archive) and are only organized.
+
+    Media may reference the blob store with a 'blob' SHA-256 digest instead
+    of inlining 'content'; such files are hardlinked from the store. Digests
+    the store does not have are listed in 'missing_blobs', malformed digests
+    and inlined media not matching its digest in 'invalid_blobs'. Inlined
+    media is added to the store so later payloads can reference it by digest.
+
     Returns a dict with paths organized by type:
     {
         'chapters': [...],
@@ -120,7 +386,9 @@ def write_project_files(content_dir: Path, files: list) -> dict:
         'appendices': [],
         'bibliography': [],
         'media': [],
-        'metadata': None
+        'metadata': None,
+        'missing_blobs': [],
+        'invalid_blobs': []
     }
 
     for file_data in files:
@@ -128,21 +396,51 @@ def write_project_files(content_dir: Path, files: list) -> dict:
         content = file_data.get('content', '')
         file_type = file_data.get('type', '')
 
+        # Create full path
+        full_path = content_dir / file_path
+
+        if file_path and file_data.get('staged'):
+            print(f"  Staged: {file_path} ({file_data.get('size', 0)} bytes)")
+            if is_media_file(file_path, file_type):
+                organized['media'].append(full_path)
+            else:
+                organize_project_file(organized, file_path, full_path)
+            continue
+
+        digest = file_data.get('blob')
+        if file_path and digest and not content and blob_store:
+            if not is_blob_digest(digest):
+                organized['invalid_blobs'].append(digest)
+                print(f"  Invalid blob digest: {file_path} ({digest!r})")
+            elif blob_store.link_into(digest, full_path):
+                organized['media'].append(full_path)
+                print(f"  Linked: {file_path} (blob {digest[:12]})")
+            else:
+                organized['missing_blobs'].append(digest)
+                print(f"  Missing blob: {file_path} ({digest})")
+            continue
+
         if not file_path or content is None:
             continue
 
-        # Create full path
-        full_path = content_dir / file_path
         full_path.parent.mkdir(parents=True, exist_ok=True)
 
         # Handle different file types
-        if file_type == 'IMAGE' or file_path.startswith('media/'):
+        if is_media_file(file_path, file_type):
             # Decode base64 and write binary
             try:
                 binary_content = base64.b64decode(content)
-                full_path.write_bytes(binary_content)
+                if blob_store:
+                    digest = blob_store.put_bytes(binary_content, digest)
+                    blob_store.link_into(digest, full_path)
+                else:
+                    full_path.write_bytes(binary_content)
                 organized['media'].append(full_path)
                 print(f"  Wrote: {file_path} ({len(binary_content)} bytes, image)")
+            except ValueError as e:
+                # Content does not match the declared digest
+                organized['invalid_blobs'].append(digest)
+                print(f"  Invalid blob: {file_path} ({e})")
             except Exception as e:
                 print(f"  Warning: Failed to decode image {file_path}: {e}")
         else:
@@ -150,24 +448,7 @@ def write_project_files(content_dir: Path, files: list) -> dict:
             full_path.write_text(content, encoding='utf-8')
             print(f"  Wrote: {file_path} ({len(content)} chars)")
 
-            # Organize by type
-            if file_path.endswith('.yaml') or file_path.endswith('.yml'):
-                if 'metadata' in file_path:
-                    organized['metadata'] = full_path
-            elif file_path.endswith('.bib'):
-                organized['bibliography'].append(full_path)
-            elif file_path.endswith('.md'):
-                if 'chapters/' in file_path:
-                    organized['chapters'].append(full_path)
-                elif 'sections/' in file_path:
-                    organized['sections'].append(full_path)
-                elif 'structure/' in file_path:
-                    organized['structure'].append(full_path)
-                elif 'appendices/' in file_path:
-                    organized['appendices'].append(full_path)
-                else:
-                    # Default to chapters for root-level .md files
-                    organized['chapters'].append(full_path)
+            organize_project_file(organized, file_path, full_path)
 
     # Sort all lists
     for key in ['chapters', 'sections', 'structure', 'appendices', 'bibliography', 'media']:
@@ -176,6 +457,78 @@ def write_project_files(content_dir: Path, files: list) -> dict:
     return organized
 
 
+def read_project_archive(stream, blob_store: BlobStore = None) -> tuple:
+    """Read a project from a tar stream, writing file members straight to disk
+
+    The first member must be project.json with the same fields as the JSON
+    input, except that 'files' only needs 'path' and 'type' (content is
+    optional and ignored; 'blob' references are kept). Every other regular
+    member is a project file, stored uncompressed at its project path, so
+    media bytes are written without base64 transcoding and without holding
+    the payload in memory. Members named blobs/<sha256> are added to the
+    blob store instead; names that are not a digest, or bytes that do not
+    match it, are listed in project_data['invalid_blobs'].
+
+    Returns (project_data, content_dir).
+    """
+    project_data = None
+    content_dir = None
+    file_types = {}
+    files = []
+    invalid_blobs = []
+
+    with tarfile.open(fileobj=stream, mode='r|*') as archive:
+        for member in archive:
+            if project_data is None:
+                if member.name != ARCHIVE_MANIFEST or not member.isfile():
+                    raise ValueError(f"Project archive must start with {ARCHIVE_MANIFEST}")
+                project_data = json.load(archive.extractfile(member))
+                file_types = {f.get('path'): f.get('type', '') for f in project_data.get('files', [])}
+                # Blob references are resolved later by write_project_files()
+                files = [f for f in project_data.get('files', []) if f.get('blob')]
+                content_dir = setup_content_directory(project_data.get('project_id', 'unknown'))
+                continue
+
+            if not member.isfile():
+                continue
+
+            file_path = member.name
+            if file_path.startswith('/') or '..' in Path(file_path).parts:
+                # stdout may carry the NDJSON protocol here, so warn on stderr
+                print(f"  Warning: Skipping unsafe archive path {file_path}", file=sys.stderr)
+                continue
+
+            if file_path.startswith(ARCHIVE_BLOBS_PREFIX) and blob_store:
+                digest = file_path[len(ARCHIVE_BLOBS_PREFIX):]
+                try:
+                    if not is_blob_digest(digest):
+                        raise ValueError(f"Invalid blob digest: {digest!r}")
+                    blob_store.put_stream(archive.extractfile(member), digest)
+                except ValueError as e:
+                    invalid_blobs.append(digest)
+                    print(f"  Warning: {e}", file=sys.stderr)
+                continue
+
+            full_path = content_dir / file_path
+            full_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(full_path, 'wb') as out:
+                shutil.copyfileobj(archive.extractfile(member), out)
+
+            files.append({
+                'path': file_path,
+                'type': file_types.get(file_path, ''),
+                'size': member.size,
+                'staged': True
+            })
+
+    if project_data is None:
+        raise ValueError("Empty project archive")
+
+    project_data['files'] = files
+    project_data['invalid_blobs'] = invalid_blobs
+    return project_data, content_dir
+
+
 def load_metadata(metadata_path: Path) -> dict:
     """Load metadata from YAML file"""
     if metadata_path and metadata_path.exists():
@@ -184,63 +537,50 @@ def load_metadata(metadata_path: Path) -> dict:
     return {}
 
 
-def check_pandoc_crossref_available() -> bool:
-    """Check if pandoc-crossref filter is available"""
-    try:
-        result = subprocess.run(
-            ["which", "pandoc-crossref"],
-            capture_output=True,
-            text=True
-        )
-        return result.returncode == 0
-    except:
-        return False
-
-
-# Cache the pandoc-crossref availability check
-_PANDOC_CROSSREF_AVAILABLE = None
-
-
-def convert_md_to_tex(md_file: Path, build_dir: Path, content_dir: Path, bib_files: list = None) -> Path:
-    """Convert a single Markdown file to LaTeX using Pandoc"""
-    global _PANDOC_CROSSREF_AVAILABLE
-
-    tex_file = build_dir / md_file.with_suffix('.tex').name
-
-    print(f"  Converting {md_file.name} -> {tex_file.name}...")
-
-    # Check pandoc-crossref availability once
-    if _PANDOC_CROSSREF_AVAILABLE is None:
-        _PANDOC_CROSSREF_AVAILABLE = check_pandoc_crossref_available()
-        if not _PANDOC_CROSSREF_AVAILABLE:
-            print("    Note: pandoc-crossref not available, skipping cross-references")
-
+def pandoc_tex_cmd(bib_files: list = None) -> list:
+    """Pandoc command (input on stdin) shared by single and batched conversion"""
     cmd = [
         "pandoc",
-        str(md_file),
         "-f", "markdown+citations+footnotes+smart",
         "-t", "latex",
         "--top-level-division=chapter",
         "--natbib",
-        "-o", str(tex_file)
     ]
 
     # Add bibliography files for citation processing
-    if bib_files:
-        for bib_file in bib_files:
-            cmd.insert(-2, f"--bibliography={bib_file}")
+    for bib_file in bib_files or []:
+        cmd.append(f"--bibliography={bib_file}")
 
-    # Only add crossref filter if available
-    if _PANDOC_CROSSREF_AVAILABLE:
-        cmd.insert(5, "--filter")
-        cmd.insert(6, "pandoc-crossref")
+    return cmd
 
-    result = subprocess.run(
-        cmd,
-        capture_output=True,
-        text=True,
-        cwd=content_dir
-    )
+
+def read_markdown(md_file: Path, crossref: CrossrefIndex = None) -> str:
+    """Markdown with cross-references rewritten for LaTeX (see crossref.py)"""
+    if crossref is None:
+        crossref = CrossrefIndex()
+        crossref.scan({'chapters': [md_file]})
+    text, undefined = crossref.rewrite(md_file.read_text(encoding='utf-8'))
+    for label in undefined:
+        print(f"    Warning: undefined reference @{label} in {md_file.name}")
+        emit_event('warning', source='crossref', file=md_file.name,
+                   message=f"Undefined reference @{label}")
+    return text
+
+
+def convert_md_to_tex(md_file: Path, build_dir: Path, content_dir: Path, bib_files: list = None,
+                      crossref: CrossrefIndex = None) -> Path:
+    """Convert a single Markdown file to LaTeX using Pandoc"""
+    tex_file = build_dir / md_file.with_suffix('.tex').name
+    started = time.time()
+
+    print(f"  Converting {md_file.name} -> {tex_file.name}...")
+
+    text = read_markdown(md_file, crossref)
+    cmd = pandoc_tex_cmd(bib_files) + ["-o", str(tex_file)]
+
+    result = run_tool(cmd, cwd=content_dir, input=text)
+
+    emit_pandoc_warnings(md_file, result.stderr)
 
     if result.returncode != 0:
         print(f"    Warning: Pandoc returned code {result.returncode}")
@@ -250,7 +590,6 @@ def convert_md_to_tex(md_file: Path, build_dir: Path, content_dir: Path, bib_fil
             print(f"    Retrying with minimal options...")
             cmd_minimal = [
                 "pandoc",
-                str(md_file),
                 "-f", "markdown",
                 "-t", "latex",
                 "-o", str(tex_file)
@@ -260,25 +599,133 @@ def convert_md_to_tex(md_file: Path, build_dir: Path, content_dir: Path, bib_fil
                 for bib_file in bib_files:
                     cmd_minimal.insert(-2, f"--bibliography={bib_file}")
                 cmd_minimal.insert(-2, "--natbib")
-            result = subprocess.run(
-                cmd_minimal,
-                capture_output=True,
-                text=True,
-                cwd=content_dir
-            )
+            result = run_tool(cmd_minimal, cwd=content_dir, input=text)
             if result.returncode != 0:
                 print(f"    Error: {result.stderr[:500] if result.stderr else 'unknown'}")
 
     # Fix image paths if the file was created
-    if tex_file.exists():
+    ok = tex_file.exists()
+    if ok:
         fix_image_paths(tex_file, content_dir)
         print(f"    OK: {tex_file.name} created")
     else:
         print(f"    ERROR: Failed to create {tex_file.name}")
 
+    emit_event('file_converted', file=md_file.name, output=tex_file.name, ok=ok,
+               duration=round(time.time() - started, 3))
+
     return tex_file
 
 
+# Batched conversion of small files: one pandoc run for many files
+BATCH_MAX_FILE_BYTES = 32 * 1024
+BATCH_MAX_FILES = 50
+
+# Markdown that would change meaning once files share one document:
+# YAML metadata blocks, footnote and reference link definitions (file-local labels)
+BATCH_UNSAFE_RE = re.compile(r"\A---\s*$|^ {0,3}\[[^\]]+\]:", re.MULTILINE)
+HEADING_RE = re.compile(r"^#{1,6}\s+(.*?)\s*(?:\{[^}]*\})?\s*#*\s*$", re.MULTILINE)
+
+
+def plan_batches(md_files: list) -> tuple:
+    """Split md_files into (batches, singles)
+
+    A file is batched only if it is small and free of file-local definitions.
+    Files in one batch never share a heading text, since pandoc would
+    disambiguate the duplicate auto identifiers (intro-1) and the labels
+    would differ from a one-file conversion.
+    """
+    batches = []  # [(files, heading texts)]
+    singles = []
+    for md_file in md_files:
+        try:
+            if md_file.stat().st_size > BATCH_MAX_FILE_BYTES:
+                singles.append(md_file)
+                continue
+            text = md_file.read_text(encoding='utf-8')
+        except (OSError, UnicodeDecodeError):
+            singles.append(md_file)
+            continue
+        if BATCH_UNSAFE_RE.search(text):
+            singles.append(md_file)
+            continue
+
+        headings = {heading.strip().lower() for heading in HEADING_RE.findall(text)}
+        for files, batch_headings in batches:
+            if len(files) < BATCH_MAX_FILES and not headings & batch_headings:
+                files.append(md_file)
+                batch_headings |= headings
+                break
+        else:
+            batches.append(([md_file], set(headings)))
+
+    # A batch of one gains nothing
+    result = []
+    for files, _ in batches:
+        if len(files) > 1:
+            result.append(files)
+        else:
+            singles.extend(files)
+    return result, singles
+
+
+def convert_md_batch(md_files: list, build_dir: Path, content_dir: Path, bib_files: list = None,
+                     crossref: CrossrefIndex = None) -> list:
+    """Convert several small Markdown files in one pandoc run
+
+    The files are concatenated with a raw LaTeX marker before each one and
+    the LaTeX output is sliced back at the markers into per-file .tex files,
+    with the same content a separate run per file would produce. Falls back
+    to one run per file if pandoc fails or a marker got lost.
+    """
+    started = time.time()
+    token = os.urandom(8).hex()
+    markers = [f"% pandoc-batch {token} {i}" for i in range(len(md_files))]
+
+    print(f"  Converting {len(md_files)} files in one batch: {', '.join(f.name for f in md_files)}")
+
+    parts = []
+    for marker, md_file in zip(markers, md_files):
+        parts.append(f"```{{=latex}}\n{marker}\n```\n\n")
+        parts.append(read_markdown(md_file, crossref).rstrip('\n') + "\n\n")
+
+    result = run_tool(pandoc_tex_cmd(bib_files), cwd=content_dir, input=''.join(parts))
+
+    emit_pandoc_warnings(md_files[0], result.stderr)
+
+    chunks = None
+    if result.returncode == 0:
+        lines = result.stdout.split('\n')
+        positions = [i for i, line in enumerate(lines) if line.startswith(f"% pandoc-batch {token} ")]
+        if [lines[i] for i in positions] == markers:
+            ends = positions[1:] + [len(lines)]
+            chunks = ['\n'.join(lines[start + 1:end]).strip('\n') for start, end in zip(positions, ends)]
+
+    if chunks is None:
+        print(f"    Batch failed, converting files one by one")
+        return [convert_md_to_tex(md_file, build_dir, content_dir, bib_files, crossref) for md_file in md_files]
+
+    duration = round((time.time() - started) / len(md_files), 3)
+    tex_files = []
+    for md_file, chunk in zip(md_files, chunks):
+        tex_file = build_dir / md_file.with_suffix('.tex').name
+        tex_file.write_text(chunk + '\n' if chunk else '', encoding='utf-8')
+        fix_image_paths(tex_file, content_dir)
+        print(f"    OK: {tex_file.name} created")
+        emit_event('file_converted', file=md_file.name, output=tex_file.name, ok=True,
+                   duration=duration, batched=True)
+        tex_files.append(tex_file)
+    return tex_files
+
+
+def emit_pandoc_warnings(md_file: Path, stderr: str):
+    """Forward pandoc [WARNING] lines as warning events"""
+    for line in (stderr or '').splitlines():
+        if line.startswith('[WARNING]'):
+            emit_event('warning', source='pandoc', file=md_file.name,
+                       message=line[len('[WARNING]'):].strip())
+
+
 def fix_image_paths(tex_file: Path, content_dir: Path):
     """Fix image paths in generated LaTeX to use absolute paths and proper sizing"""
     content = tex_file.read_text(encoding='utf-8')
@@ -536,13 +983,15 @@ def generate_main_tex(build_dir: Path, organized_files: dict, metadata: dict, th
     return output_file
 
 
-def compile_pdf(build_dir: Path) -> Path:
-    """Compile LaTeX to PDF using latexmk"""
-    thesis_tex = build_dir / "thesis.tex"
-    thesis_pdf = build_dir / "thesis.pdf"
+def run_latexmk(tex_file: Path, build_dir: Path) -> tuple:
+    """Run latexmk on tex_file, streaming its output line by line
 
-    print("\nCompiling PDF with latexmk...")
+    Emits a latexmk_pass event for each rule run and a warning event for
+    each LaTeX/package warning. Only the last LATEXMK_TAIL_LINES lines are
+    kept in memory.
 
+    Returns (returncode, tail) where tail is the end of the combined output.
+    """
     cmd = [
         "latexmk",
         "-pdf",
@@ -550,82 +999,95 @@ def compile_pdf(build_dir: Path) -> Path:
         "-f",  # Force completion even with errors
         f"-output-directory={build_dir}",
         "-cd",
-        str(thesis_tex)
+        str(tex_file)
     ]
 
-    result = subprocess.run(
+    tail = deque(maxlen=LATEXMK_TAIL_LINES)
+
+    process = start_tool(
         cmd,
-        capture_output=True,
-        cwd=build_dir
+        cwd=build_dir,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT
     )
 
-    # Decode output with error handling
-    try:
-        stdout = result.stdout.decode('utf-8', errors='replace') if result.stdout else ''
-    except:
-        stdout = str(result.stdout)
+    # Output is streamed, so the stage timeout is enforced by a timer
+    timed_out = threading.Event()
+    timer = None
+    remaining = remaining_stage_time()
+    if remaining is not None:
+        timer = threading.Timer(remaining, lambda: (timed_out.set(), kill_process_group(process)))
+        timer.daemon = True
+        timer.start()
 
     try:
-        stderr = result.stderr.decode('utf-8', errors='replace') if result.stderr else ''
-    except:
-        stderr = str(result.stderr)
+        returncode = _read_latexmk_output(process, tail)
+    finally:
+        if timer:
+            timer.cancel()
+        finish_tool(process)
 
-    if thesis_pdf.exists():
-        print(f"  PDF generated: {thesis_pdf}")
-        return thesis_pdf
-    else:
-        print(f"  Error compiling PDF")
-        print(f"  stdout: {stdout[-2000:] if stdout else 'none'}")
-        print(f"  stderr: {stderr[-2000:] if stderr else 'none'}")
-        return None
+    if timed_out.is_set():
+        raise BuildCancelled(f"Stage '{_STAGE_DEADLINE[0]}' timed out")
+    check_cancelled()
 
+    return returncode, "\n".join(tail)
 
-def compile_template_pdf(build_dir: Path) -> Path:
-    """Compile LaTeX to PDF for template-based projects"""
-    main_tex = build_dir / "main.tex"
-    main_pdf = build_dir / "main.pdf"
 
-    print("\nCompiling PDF with latexmk...")
+def _read_latexmk_output(process: subprocess.Popen, tail: deque) -> int:
+    """Consume latexmk output, emitting pass and warning events"""
+    for raw_line in process.stdout:
+        # Decode output with error handling (TeX logs are not always UTF-8)
+        line = raw_line.decode('utf-8', errors='replace').rstrip('\n')
+        tail.append(line)
 
-    cmd = [
-        "latexmk",
-        "-pdf",
-        "-interaction=nonstopmode",
-        "-f",  # Force completion even with errors
-        f"-output-directory={build_dir}",
-        "-cd",
-        str(main_tex)
-    ]
+        match = LATEXMK_PASS_RE.search(line)
+        if match:
+            emit_event('latexmk_pass', run=int(match.group(1)), rule=match.group(2))
+            continue
 
-    result = subprocess.run(
-        cmd,
-        capture_output=True,
-        cwd=build_dir
-    )
+        match = LATEX_WARNING_RE.match(line)
+        if match:
+            emit_event('warning', source='latex', message=match.group(1))
 
-    # Decode output with error handling
-    try:
-        stdout = result.stdout.decode('utf-8', errors='replace') if result.stdout else ''
-    except:
-        stdout = str(result.stdout)
+    process.stdout.close()
+    return process.wait()
 
-    try:
-        stderr = result.stderr.decode('utf-8', errors='replace') if result.stderr else ''
-    except:
-        stderr = str(result.stderr)
 
-    if main_pdf.exists():
-        print(f"  PDF generated: {main_pdf}")
-        return main_pdf
+def compile_latex(build_dir: Path, tex_name: str) -> Path:
+    """Compile build_dir/<tex_name> to PDF using latexmk"""
+    tex_file = build_dir / tex_name
+    pdf_file = tex_file.with_suffix('.pdf')
+
+    print("\nCompiling PDF with latexmk...")
+
+    returncode, output = run_latexmk(tex_file, build_dir)
+
+    if pdf_file.exists():
+        print(f"  PDF generated: {pdf_file}")
+        return pdf_file
     else:
-        print(f"  Error compiling PDF")
-        print(f"  stdout: {stdout[-2000:] if stdout else 'none'}")
-        print(f"  stderr: {stderr[-2000:] if stderr else 'none'}")
+        print(f"  Error compiling PDF (latexmk exit code {returncode})")
+        print(f"  output: {output[-2000:] if output else 'none'}")
         return None
 
 
-def build_project(project_data: dict) -> dict:
-    """Main build function - takes project data, returns build result"""
+def compile_pdf(build_dir: Path) -> Path:
+    """Compile LaTeX to PDF using latexmk"""
+    return compile_latex(build_dir, "thesis.tex")
+
+
+def compile_template_pdf(build_dir: Path) -> Path:
+    """Compile LaTeX to PDF for template-based projects"""
+    return compile_latex(build_dir, "main.tex")
+
+
+def build_project(project_data: dict, content_dir: Path = None) -> dict:
+    """Main build function - takes project data, returns build result
+
+    content_dir is passed when the files were already staged on disk by
+    read_project_archive(); otherwise a fresh content directory is created.
+    """
     project_id = project_data.get('project_id', 'unknown')
     files = project_data.get('files', [])
     template_id = project_data.get('template_id', None)
@@ -637,63 +1099,122 @@ def build_project(project_data: dict) -> dict:
     print("=" * 60)
 
     # Setup directories
-    build_dir = setup_build_directory(project_id)
-    content_dir = setup_content_directory(project_id)
-
-    print(f"\nBuild directory: {build_dir}")
-    print(f"Content directory: {content_dir}")
-
-    # Load template configuration if provided
-    template_config = None
-    template_latex = {}
-    if template_id:
-        template_config = load_template_config(template_id)
-        if template_config:
-            print(f"\nTemplate loaded: {template_config.get('name', 'Unknown')}")
-            template_latex = get_template_latex_files(template_id)
-        else:
-            print(f"\nWarning: Template '{template_id}' not found, using default theme")
-
-    # Copy theme to build directory (for fallback)
-    print("\nCopying theme files...")
-    theme_dir = copy_theme_to_build(build_dir)
+    with build_stage('setup'):
+        build_dir = setup_build_directory(project_id)
+        if content_dir is None:
+            content_dir = setup_content_directory(project_id)
+
+        print(f"\nBuild directory: {build_dir}")
+        print(f"Content directory: {content_dir}")
+
+        # Load template configuration if provided
+        template_config = None
+        template_latex = {}
+        if template_id:
+            template_config = load_template_config(template_id)
+            if template_config:
+                print(f"\nTemplate loaded: {template_config.get('name', 'Unknown')}")
+                template_latex = get_template_latex_files(template_id)
+            else:
+                print(f"\nWarning: Template '{template_id}' not found, using default theme")
+                emit_event('warning', source='build', message=f"Template '{template_id}' not found, using default theme")
+
+        # Copy theme to build directory (for fallback)
+        print("\nCopying theme files...")
+        theme_dir = copy_theme_to_build(build_dir)
 
     # Write files to disk
-    print(f"\nWriting {len(files)} files...")
-    organized = write_project_files(content_dir, files)
-
-    # Load metadata
-    metadata = {}
-    if organized['metadata']:
-        metadata = load_metadata(organized['metadata'])
-        print(f"\nMetadata loaded: {metadata.get('title', 'No title')}")
+    with build_stage('write_files'):
+        print(f"\nWriting {len(files)} files...")
+        organized = write_project_files(content_dir, files, BlobStore())
+
+        invalid = organized['invalid_blobs'] + project_data.get('invalid_blobs', [])
+        if organized['missing_blobs'] or invalid:
+            # Caller uploads only the missing blobs (and fixes invalid ones) and retries
+            missing = organized['missing_blobs']
+            print(f"\n{len(missing)} media blob(s) missing from the store, {len(invalid)} invalid")
+            if missing:
+                emit_event('missing_blobs', blobs=missing)
+            if invalid:
+                emit_event('invalid_blobs', blobs=invalid)
+            return {
+                'success': False,
+                'project_id': project_id,
+                'build_dir': str(build_dir),
+                'pdf_path': None,
+                'template_id': template_id,
+                'error': 'invalid_blobs' if invalid else 'missing_blobs',
+                'missing_blobs': missing,
+                'invalid_blobs': invalid
+            }
+
+        # Load metadata
+        metadata = {}
+        if organized['metadata']:
+            metadata = load_metadata(organized['metadata'])
+            print(f"\nMetadata loaded: {metadata.get('title', 'No title')}")
 
     # Convert Markdown to LaTeX
-    print("\nConverting Markdown to LaTeX...")
-
-    # Include sections for template-based projects
-    all_md_files = organized['chapters'] + organized['sections'] + organized['structure'] + organized['appendices']
-
-    # Pass bibliography files to pandoc for citation processing
-    bib_files = [str(f) for f in organized['bibliography']]
-
-    for md_file in all_md_files:
-        convert_md_to_tex(md_file, build_dir, content_dir, bib_files)
+    with build_stage('convert'):
+        print("\nConverting Markdown to LaTeX...")
+
+        # Pass bibliography files to pandoc for citation processing
+        bib_files = [str(f) for f in organized['bibliography']]
+
+        # One cross-reference pass over all sources, in document order
+        crossref = CrossrefIndex(metadata)
+        crossref.scan({
+            'chapters': organized['chapters'],
+            'sections': organized['sections'],
+            'structure': organized['structure'],
+            'appendices': organized['appendices'],
+        })
+        for label, md_file in crossref.duplicates:
+            print(f"  Warning: duplicate label {label} in {md_file.name}")
+            emit_event('warning', source='crossref', file=md_file.name, message=f"Duplicate label {label}")
+
+        # Include sections for template-based projects; their many small
+        # files and the structure files share pandoc runs
+        batches, singles = plan_batches(organized['sections'] + organized['structure'])
+        tasks = [
+            (convert_md_to_tex, md_file)
+            for md_file in organized['chapters'] + singles + organized['appendices']
+        ] + [(convert_md_batch, batch) for batch in batches]
+
+        def run_task(task):
+            convert, target = task
+            return convert(target, build_dir, content_dir, bib_files, crossref)
+
+        # Pandoc runs are independent: use extra cores if the scheduler lends them
+        extra_cores = borrow_cores(len(tasks) - 1)
+        try:
+            if extra_cores:
+                with ThreadPoolExecutor(max_workers=1 + extra_cores) as executor:
+                    list(executor.map(run_task, tasks))
+            else:
+                for task in tasks:
+                    run_task(task)
+        finally:
+            return_cores(extra_cores)
 
     # Generate main document based on template or theme
     if template_config:
-        print("\nGenerating main.tex from template...")
-        main_tex = generate_template_main_tex(build_dir, organized, metadata, template_config, template_latex)
-        print(f"  Created: {main_tex}")
+        with build_stage('generate'):
+            print("\nGenerating main.tex from template...")
+            main_tex = generate_template_main_tex(build_dir, organized, metadata, template_config, template_latex)
+            print(f"  Created: {main_tex}")
         # Compile with template-specific function
-        pdf_path = compile_template_pdf(build_dir)
+        with build_stage('compile'):
+            pdf_path = compile_template_pdf(build_dir)
     else:
         # Generate main thesis.tex using default theme
-        print("\nGenerating main thesis.tex...")
-        main_tex = generate_main_tex(build_dir, organized, metadata, theme_dir)
-        print(f"  Created: {main_tex}")
+        with build_stage('generate'):
+            print("\nGenerating main thesis.tex...")
+            main_tex = generate_main_tex(build_dir, organized, metadata, theme_dir)
+            print(f"  Created: {main_tex}")
         # Compile PDF
-        pdf_path = compile_pdf(build_dir)
+        with build_stage('compile'):
+            pdf_path = compile_pdf(build_dir)
 
     # Return result
     result = {
@@ -714,21 +1235,141 @@ def build_project(project_data: dict) -> dict:
     return result
 
 
+def cleanup_partial_outputs(project_id: str):
+    """Remove everything a cancelled build may have left half-written
+
+    The build and content directories are fully regenerated by each build,
+    so emptying them (keeping only build.log) gives the next build a
+    consistent starting point, including latexmk's dependency database.
+    """
+    build_dir = Path(tempfile.gettempdir()) / f"thesis-build-{project_id}"
+    content_dir = Path(tempfile.gettempdir()) / f"thesis-content-{project_id}"
+
+    if build_dir.exists():
+        for item in build_dir.iterdir():
+            if item.name == "build.log":
+                continue
+            if item.is_dir() and not item.is_symlink():
+                shutil.rmtree(item, ignore_errors=True)
+            else:
+                item.unlink(missing_ok=True)
+
+    shutil.rmtree(content_dir, ignore_errors=True)
+
+
+def run_build(project_data: dict, content_dir: Path = None) -> dict:
+    """Run build_project(), turning cancellation and timeouts into a failed result"""
+    project_id = project_data.get('project_id', 'unknown')
+    try:
+        return build_project(project_data, content_dir)
+    except BuildCancelled as e:
+        print(f"\nBUILD STOPPED: {e}")
+        cancel_build()
+        cleanup_partial_outputs(project_id)
+        return {
+            'success': False,
+            'project_id': project_id,
+            'pdf_path': None,
+            'cancelled': True,
+            'error': str(e)
+        }
+
+
+def run_ndjson(project_data: dict, content_dir: Path = None) -> dict:
+    """Build with NDJSON events on stdout and the log in <build_dir>/build.log"""
+    global _EVENT_STREAM
+
+    project_id = project_data.get('project_id', 'unknown')
+    log_file = setup_build_directory(project_id) / "build.log"
+
+    _EVENT_STREAM = sys.stdout
+    emit_event('build_start', project_id=project_id, log_file=str(log_file))
+
+    with open(log_file, 'w', encoding='utf-8') as log, redirect_stdout(log):
+        try:
+            result = run_build(project_data, content_dir)
+        except Exception as e:
+            print(f"\nBuild crashed: {e}")
+            result = {
+                'success': False,
+                'project_id': project_id,
+                'error': str(e)
+            }
+
+    result['log_file'] = str(log_file)
+    emit_event('result', **result)
+    return result
+
+
 def main():
+    global _EVENT_STREAM
+
     parser = argparse.ArgumentParser(description='Build PDF from project data')
     parser.add_argument('--input', '-i', help='JSON file with project data')
+    parser.add_argument('--protocol', choices=['text', 'ndjson'], default='text',
+                        help='Output protocol: human-readable text or NDJSON progress events')
+    parser.add_argument('--priority', choices=sorted(PRIORITIES), default='interactive',
+                        help='Scheduler priority class (interactive previews run before final builds)')
+    parser.add_argument('--no-schedule', action='store_true',
+                        help='Build immediately, bypassing the global build scheduler')
+    parser.add_argument('--format', choices=['json', 'tar'], default='json',
+                        help='Input format: JSON with base64 media, or a tar stream with project.json first')
+    parser.add_argument('--stage-timeout', action='append', default=[], metavar='STAGE=SECONDS',
+                        help=f"Override a stage timeout (stages: {', '.join(STAGE_TIMEOUTS)}); 0 disables it")
     args = parser.parse_args()
 
+    for override in args.stage_timeout:
+        stage, _, seconds = override.partition('=')
+        if stage not in STAGE_TIMEOUTS or not seconds:
+            parser.error(f"Invalid --stage-timeout value: {override}")
+        STAGE_TIMEOUTS[stage] = float(seconds)
+
     # Read project data
-    if args.input:
+    content_dir = None
+    if args.format == 'tar':
+        if args.input:
+            with open(args.input, 'rb') as f:
+                project_data, content_dir = read_project_archive(f, BlobStore())
+        else:
+            project_data, content_dir = read_project_archive(sys.stdin.buffer, BlobStore())
+    elif args.input:
         with open(args.input, 'r', encoding='utf-8') as f:
             project_data = json.load(f)
     else:
         # Read from stdin
         project_data = json.load(sys.stdin)
 
-    # Build project
-    result = build_project(project_data)
+    if args.protocol == 'ndjson':
+        # Queue position events go out before the build starts
+        _EVENT_STREAM = sys.stdout
+
+    project_id = project_data.get('project_id', 'unknown')
+    schedule = nullcontext() if args.no_schedule else scheduled_build(project_id, args.priority)
+
+    # SIGTERM (e.g. the caller's timeout) or Ctrl+C kills the tool process groups
+    signal.signal(signal.SIGTERM, handle_cancel_signal)
+    signal.signal(signal.SIGINT, handle_cancel_signal)
+
+    try:
+        with schedule:
+            if args.protocol == 'ndjson':
+                result = run_ndjson(project_data, content_dir)
+            else:
+                # Build project
+                result = run_build(project_data, content_dir)
+    except BuildCancelled as e:
+        # Cancelled while waiting in the scheduler queue
+        result = {
+            'success': False,
+            'project_id': project_id,
+            'pdf_path': None,
+            'cancelled': True,
+            'error': str(e)
+        }
+        emit_event('result', **result)
+
+    if args.protocol == 'ndjson':
+        sys.exit(0 if result['success'] else 1)
 
     # Output result as JSON
     print("\n--- RESULT ---")
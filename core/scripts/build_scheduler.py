@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Build scheduler shared by concurrent build_project.py processes
+Keeps the number of cores used by builds within a global budget
+
+Every build process registers in a small state file (protected by flock)
+and waits until it is first in line and a core is free. The line is ordered
+by priority class (interactive previews before final/export builds), then by
+how many builds the same project already has running (so one project cannot
+starve the others), then by arrival time. Work inside a build that can run
+in parallel (Markdown conversion) borrows extra cores from the same budget,
+but only while nobody is waiting.
+
+Usage:
+    python build_scheduler.py status
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+import tempfile
+from pathlib import Path
+from contextlib import contextmanager
+
+SCHEDULER_DIR = Path(os.getenv("THESIS_SCHEDULER_DIR", Path(tempfile.gettempdir()) / "thesis-scheduler"))
+
+# Total cores available to builds (default: all cores of the machine)
+TOTAL_CORES = int(os.getenv("THESIS_BUILD_CORES", os.cpu_count() or 1))
+
+# Priority classes, lower runs first
+PRIORITIES = {
+    'interactive': 0,
+    'final': 1,
+}
+
+POLL_INTERVAL = 0.25
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class BuildScheduler:
+    """Global core budget for build processes on this machine"""
+
+    def __init__(self, state_dir: Path = None, total_cores: int = None):
+        self.state_dir = Path(state_dir) if state_dir else SCHEDULER_DIR
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        self.state_file = self.state_dir / "state.json"
+        self.lock_file = self.state_dir / "state.lock"
+        self.total_cores = max(1, total_cores or TOTAL_CORES)
+
+    @contextmanager
+    def _locked_state(self):
+        """Load the state under an exclusive lock and save it on exit"""
+        with open(self.lock_file, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                try:
+                    state = json.loads(self.state_file.read_text(encoding='utf-8'))
+                except (FileNotFoundError, ValueError):
+                    state = {}
+                state.setdefault('running', {})
+                state.setdefault('waiting', {})
+
+                # Forget jobs whose process died without releasing
+                for key in ('running', 'waiting'):
+                    for job_id, job in list(state[key].items()):
+                        if not _pid_alive(job['pid']):
+                            del state[key][job_id]
+
+                yield state
+
+                tmp = self.state_file.with_suffix('.tmp')
+                tmp.write_text(json.dumps(state), encoding='utf-8')
+                os.replace(tmp, self.state_file)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _queue(state: dict) -> list:
+        """Waiting job ids in the order they will be started"""
+        running_per_project = {}
+        for job in state['running'].values():
+            running_per_project[job['project']] = running_per_project.get(job['project'], 0) + 1
+
+        def sort_key(job_id):
+            job = state['waiting'][job_id]
+            return (
+                job['priority'],
+                running_per_project.get(job['project'], 0),
+                job['enqueued'],
+            )
+
+        return sorted(state['waiting'], key=sort_key)
+
+    def _free_cores(self, state: dict) -> int:
+        used = sum(job['cores'] for job in state['running'].values())
+        return self.total_cores - used
+
+    def acquire(self, job_id: str, project_id: str, priority: str = 'interactive', on_position=None):
+        """Block until the job may start, then hold one core for it
+
+        on_position(position) is called whenever the job's place in line
+        changes (1 = next to start).
+        """
+        with self._locked_state() as state:
+            state['waiting'][job_id] = {
+                'pid': os.getpid(),
+                'project': project_id,
+                'priority': PRIORITIES.get(priority, PRIORITIES['final']),
+                'enqueued': time.time(),
+            }
+
+        last_position = None
+        while True:
+            with self._locked_state() as state:
+                queue = self._queue(state)
+                position = queue.index(job_id) + 1
+                if position == 1 and self._free_cores(state) > 0:
+                    job = state['waiting'].pop(job_id)
+                    job['cores'] = 1
+                    state['running'][job_id] = job
+                    return
+
+            if position != last_position and on_position:
+                on_position(position)
+            last_position = position
+            time.sleep(POLL_INTERVAL)
+
+    def borrow(self, job_id: str, wanted: int) -> int:
+        """Take up to wanted extra cores for a running job, without waiting
+
+        Cores are only lent while no other build is waiting.
+        Returns the number of cores actually granted (may be 0).
+        """
+        if wanted <= 0:
+            return 0
+        with self._locked_state() as state:
+            job = state['running'].get(job_id)
+            if job is None or state['waiting']:
+                return 0
+            granted = max(0, min(wanted, self._free_cores(state)))
+            job['cores'] += granted
+            return granted
+
+    def give_back(self, job_id: str, cores: int):
+        """Return cores obtained with borrow()"""
+        if cores <= 0:
+            return
+        with self._locked_state() as state:
+            job = state['running'].get(job_id)
+            if job:
+                job['cores'] = max(1, job['cores'] - cores)
+
+    def release(self, job_id: str):
+        """Remove the job from the scheduler (running or still waiting)"""
+        with self._locked_state() as state:
+            state['running'].pop(job_id, None)
+            state['waiting'].pop(job_id, None)
+
+    def status(self) -> dict:
+        with self._locked_state() as state:
+            return {
+                'total_cores': self.total_cores,
+                'free_cores': self._free_cores(state),
+                'running': state['running'],
+                'queue': [dict(state['waiting'][job_id], job_id=job_id) for job_id in self._queue(state)],
+            }
+
+    @contextmanager
+    def job(self, project_id: str, priority: str = 'interactive', on_position=None):
+        """Hold a core for the duration of a build; yields the job id"""
+        job_id = f"{project_id}-{os.getpid()}-{time.time_ns()}"
+        try:
+            self.acquire(job_id, project_id, priority, on_position)
+            yield job_id
+        finally:
+            self.release(job_id)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == 'status':
+        print(json.dumps(BuildScheduler().status(), indent=2))
+    else:
+        print(__doc__)
+        sys.exit(1)
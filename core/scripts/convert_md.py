@@ -3,14 +3,28 @@
 Convert Markdown chapters to LaTeX
 Uses Pandoc with custom template
 Supports custom paths via environment variables for bilingual builds
+
+Library use (reentrant, safe from several threads for different build dirs):
+    from convert_md import convert_project
+    result = convert_project(text_dir, build_dir, metadata_file)
+
+Files that become available one at a time can be converted with
+convert_ahead() first; convert_project() then only assembles thesis.tex.
 """
 
 import sys
 import os
+import json
+import hashlib
+import re
+import time
+import threading
 import subprocess
 from pathlib import Path
 import yaml
 
+from crossref import CrossrefIndex
+
 ROOT_DIR = Path(__file__).parent.parent.parent
 CONTENT_DIR = ROOT_DIR / "content"
 
@@ -26,58 +40,130 @@ CORE_DIR = ROOT_DIR / "core"
 CONFIG_DIR = CORE_DIR / "config"
 THEME_DIR = CORE_DIR / "theme"
 
-def load_metadata():
+# Pandoc options for chapter conversion - let LaTeX/BibLaTeX handle citations, not Pandoc
+# Cross-references (@fig:, @sec:, etc) are rewritten beforehand by crossref.py
+PANDOC_ARGS = [
+    "-f", "markdown+citations+footnotes+smart",
+    "-t", "latex",
+    "--top-level-division=chapter",
+    "--natbib",  # Use natbib citation commands compatible with biblatex
+]
+
+# Records input hashes and conversion parameters of each generated .tex
+MANIFEST_NAME = ".convert-manifest.json"
+MANIFEST_VERSION = 2
+
+# One conversion at a time per build directory (the manifest is per directory)
+_BUILD_DIR_LOCKS = {}
+_BUILD_DIR_LOCKS_GUARD = threading.Lock()
+
+def _build_dir_lock(build_dir: Path) -> threading.Lock:
+    key = str(Path(build_dir).absolute())
+    with _BUILD_DIR_LOCKS_GUARD:
+        return _BUILD_DIR_LOCKS.setdefault(key, threading.Lock())
+
+def _silent(message: str):
+    pass
+
+def load_metadata(metadata_file: Path = None) -> dict:
     """Load metadata from metadata.yaml (or custom path)"""
-    if METADATA_FILE.exists():
-        with open(METADATA_FILE, 'r', encoding='utf-8') as f:
-            return yaml.safe_load(f)
+    metadata_file = Path(metadata_file) if metadata_file else METADATA_FILE
+    if metadata_file.exists():
+        with open(metadata_file, 'r', encoding='utf-8') as f:
+            return yaml.safe_load(f) or {}
     return {}
 
-def convert_chapter(md_file: Path, tex_file: Path, metadata: dict) -> bool:
-    """Convert a single Markdown file to LaTeX"""
+def convert_chapter(md_file: Path, tex_file: Path, metadata: dict,
+                    content_dir: Path = None, log=print, crossref: CrossrefIndex = None) -> tuple:
+    """Convert a single Markdown file to LaTeX
+
+    crossref is the project's CrossrefIndex (a one-file index if omitted).
+    Returns (ok, error message or None).
+    """
+    content_dir = Path(content_dir) if content_dir else CONTENT_DIR
     try:
-        print(f"  Converting {md_file.name} → {tex_file.name}...")
-
-        # Pandoc command - let LaTeX/BibLaTeX handle citations, not Pandoc
-        cmd = [
-            "pandoc",
-            str(md_file),
-            "-f", "markdown+citations+footnotes+smart",
-            "-t", "latex",
-            "--filter", "pandoc-crossref",  # Enable cross-references (@fig:, @sec:, etc)
-            "--top-level-division=chapter",
-            "--natbib",  # Use natbib citation commands compatible with biblatex
-            "-o", str(tex_file)
-        ]
+        log(f"  Converting {md_file.name} → {tex_file.name}...")
+
+        if crossref is None:
+            crossref = CrossrefIndex(metadata)
+            crossref.scan({'chapters': [md_file]})
+        text, undefined = crossref.rewrite(md_file.read_text(encoding='utf-8'))
+        for label in undefined:
+            log(f"    Warning: undefined reference @{label}")
+
+        cmd = ["pandoc"] + PANDOC_ARGS + ["-o", str(tex_file)]
 
         result = subprocess.run(
             cmd,
+            input=text,
             capture_output=True,
             text=True,
-            cwd=CONTENT_DIR
+            cwd=content_dir
         )
 
         if result.returncode != 0:
-            print(f"    ✗ Error: {result.stderr}")
-            return False
+            log(f"    ✗ Error: {result.stderr}")
+            return False, result.stderr.strip() or f"pandoc exited with {result.returncode}"
 
         # Post-process: fix image paths to be absolute
-        fix_image_paths_in_tex(tex_file)
+        fix_image_paths_in_tex(tex_file, content_dir / "media")
 
-        print(f"    ✓ Converted")
-        return True
+        log(f"    ✓ Converted")
+        return True, None
 
     except Exception as e:
-        print(f"    ✗ Error: {e}")
-        return False
+        log(f"    ✗ Error: {e}")
+        return False, str(e)
+
+def conversion_params_hash(content_dir: Path, crossref: CrossrefIndex = None) -> str:
+    """Hash of everything besides the Markdown itself that shapes the .tex output
+
+    LaTeX resolves \\ref itself, so only the reference prefixes of the
+    cross-reference pass matter, not the numbers of other files' labels.
+    """
+    params = {
+        'version': MANIFEST_VERSION,
+        'pandoc_args': PANDOC_ARGS,
+        'media_dir': str((Path(content_dir) / "media").absolute()),
+        'crossref_prefixes': crossref.prefixes if crossref else None,
+    }
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+
+def file_hash(path: Path, cache: dict = None) -> str:
+    """SHA-256 of a file; with a cache dict, unchanged files (same mtime and size) are not re-read"""
+    if cache is None:
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+
+    stat = path.stat()
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = cache.get(str(path))
+    if cached and cached[0] == signature:
+        return cached[1]
 
-def fix_image_paths_in_tex(tex_file: Path):
+    digest = hashlib.sha256(path.read_bytes()).hexdigest()
+    cache[str(path)] = (signature, digest)
+    return digest
+
+def load_manifest(build_dir: Path) -> dict:
+    """Load the conversion manifest ({tex name: {source, input_hash, params_hash}})"""
+    try:
+        manifest = json.loads((Path(build_dir) / MANIFEST_NAME).read_text(encoding='utf-8'))
+    except (FileNotFoundError, ValueError):
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
+
+def save_manifest(build_dir: Path, manifest: dict):
+    manifest_file = Path(build_dir) / MANIFEST_NAME
+    tmp_file = manifest_file.with_suffix('.tmp')
+    tmp_file.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding='utf-8')
+    os.replace(tmp_file, manifest_file)
+
+def fix_image_paths_in_tex(tex_file: Path, media_dir: Path = None):
     """Fix image paths in generated LaTeX to use absolute paths"""
-    import re
     content = tex_file.read_text(encoding='utf-8')
 
     # Replace media/ with absolute path (handles both with and without options)
-    media_dir = CONTENT_DIR / "media"
+    media_dir = Path(media_dir) if media_dir else CONTENT_DIR / "media"
     # Pattern: \includegraphics[...]{media/file.jpg} or \includegraphics{media/file.jpg}
     content = re.sub(
         r'(\\includegraphics(?:\[[^\]]*\])?)\{media/',
@@ -87,11 +173,12 @@ def fix_image_paths_in_tex(tex_file: Path):
 
     tex_file.write_text(content, encoding='utf-8')
 
-def generate_strings_tex(metadata: dict) -> Path:
+def generate_strings_tex(metadata: dict, build_dir: Path = None) -> Path:
     """Generate strings.tex with theme strings from metadata"""
-    output_file = BUILD_DIR / "strings.tex"
+    output_file = Path(build_dir or BUILD_DIR) / "strings.tex"
 
-    strings = metadata.get('strings', {})
+    # Copy: metadata may be shared between threads
+    strings = dict(metadata.get('strings') or {})
 
     # Default strings if not provided
     defaults = {
@@ -134,15 +221,20 @@ def generate_strings_tex(metadata: dict) -> Path:
     output_file.write_text(content, encoding='utf-8')
     return output_file
 
-def generate_main_tex(metadata: dict) -> Path:
+def generate_main_tex(metadata: dict, text_dir: Path = None, build_dir: Path = None,
+                      content_dir: Path = None, theme_dir: Path = None) -> Path:
     """Generate main thesis.tex file"""
-    output_file = BUILD_DIR / "thesis.tex"
+    text_dir = Path(text_dir or TEXT_DIR)
+    build_dir = Path(build_dir or BUILD_DIR)
+    content_dir = Path(content_dir or CONTENT_DIR)
+    theme_dir = Path(theme_dir or THEME_DIR)
+    output_file = build_dir / "thesis.tex"
 
     # Load only general.tex (which includes the other preamble files)
-    general_preamble = THEME_DIR / "preamble" / "general.tex"
+    general_preamble = theme_dir / "preamble" / "general.tex"
 
     # Generate strings.tex
-    strings_file = generate_strings_tex(metadata)
+    strings_file = generate_strings_tex(metadata, build_dir)
 
     # Generate document
     content = f"""\\RequirePackage{{fix-cm}}
@@ -153,6 +245,9 @@ def generate_main_tex(metadata: dict) -> Path:
     paper={metadata.get('papersize', 'a5')}, fontsize={metadata.get('fontsize', '10pt')},%
 ]{{scrreprt}}
 
+% Document language, loaded by babel in the shared preamble
+\\PassOptionsToPackage{{{metadata.get('language', 'english')}}}{{babel}}
+
 % Preamble
 \\input{{{general_preamble.absolute()}}}
 
@@ -164,7 +259,7 @@ def generate_main_tex(metadata: dict) -> Path:
 
     # Add bibliography files with absolute paths
     for bib in metadata.get('bibliography', []):
-        bib_path = CONTENT_DIR / bib
+        bib_path = content_dir / bib
         if bib_path.exists():
             content += f"\\addbibresource{{{bib_path.absolute()}}}\n"
 
@@ -179,7 +274,7 @@ def generate_main_tex(metadata: dict) -> Path:
 """
 
     # Add cover if exists
-    cover_file = THEME_DIR / "cover" / "cover.tex"
+    cover_file = theme_dir / "cover" / "cover.tex"
     if cover_file.exists():
         content += f"\\input{{{cover_file.absolute()}}}\n"
 
@@ -194,7 +289,7 @@ def generate_main_tex(metadata: dict) -> Path:
     ]
 
     for fm_file in frontmatter_files:
-        fm_path = THEME_DIR / "frontbackmatter" / fm_file
+        fm_path = theme_dir / "frontbackmatter" / fm_file
         if fm_path.exists():
             content += f"\\cleardoublepage\\input{{{fm_path.absolute()}}}\n"
 
@@ -207,25 +302,26 @@ def generate_main_tex(metadata: dict) -> Path:
 """
 
     # Add variable chapters (converted from MD) - sorted by numeric prefix
-    chapter_files = sorted(CHAPTERS_DIR.glob("*.md"))
+    chapter_files = sorted((text_dir / "chapters").glob("*.md"))
     for md_file in chapter_files:
-        tex_file = BUILD_DIR / md_file.with_suffix('.tex').name
+        tex_file = build_dir / md_file.with_suffix('.tex').name
         if tex_file.exists():
             content += f"\\input{{{tex_file.absolute()}}}\n\\cleardoublepage\n"
 
     # Add structure files (appendix, etc) - always at the end
-    structure_files = sorted(STRUCTURE_DIR.glob("*.md"))
+    structure_files = sorted((text_dir / "structure").glob("*.md"))
     for md_file in structure_files:
-        tex_file = BUILD_DIR / md_file.with_suffix('.tex').name
+        tex_file = build_dir / md_file.with_suffix('.tex').name
         if tex_file.exists():
             content += f"\\input{{{tex_file.absolute()}}}\n\\cleardoublepage\n"
 
     # Add appendices - after structure, before bibliography
-    if APPENDICES_DIR.exists():
+    appendices_dir = text_dir / "appendices"
+    if appendices_dir.exists():
         content += "\\appendix\n"  # Switch to appendix mode
-        appendix_files = sorted(APPENDICES_DIR.glob("*.md"))
+        appendix_files = sorted(appendices_dir.glob("*.md"))
         for md_file in appendix_files:
-            tex_file = BUILD_DIR / md_file.with_suffix('.tex').name
+            tex_file = build_dir / md_file.with_suffix('.tex').name
             if tex_file.exists():
                 content += f"\\input{{{tex_file.absolute()}}}\n\\cleardoublepage\n"
 
@@ -240,6 +336,180 @@ def generate_main_tex(metadata: dict) -> Path:
     output_file.write_text(content, encoding='utf-8')
     return output_file
 
+def find_markdown_files(text_dir: Path) -> dict:
+    """Markdown sources per section, in document order"""
+    text_dir = Path(text_dir)
+    found = {}
+    for section in ("chapters", "structure", "appendices"):
+        section_dir = text_dir / section
+        found[section] = sorted(section_dir.glob("*.md")) if section_dir.exists() else []
+    return found
+
+def convert_ahead(md_file: Path, build_dir: Path, metadata: dict, content_dir: Path = None,
+                  crossref: CrossrefIndex = None, log=None, hash_cache: dict = None) -> dict:
+    """Convert one Markdown file into build_dir ahead of convert_project()
+
+    For pipelines that get their sources one at a time (e.g. as translations
+    land): the output is recorded in the manifest, so the next
+    convert_project() of the same tree and metadata skips it. pandoc runs
+    outside the build dir lock, so several files can convert in parallel.
+    Returns a convert_project() file record.
+    """
+    started = time.time()
+    log = log or _silent
+    md_file = Path(md_file)
+    build_dir = Path(build_dir)
+    content_dir = Path(content_dir or CONTENT_DIR)
+    crossref = crossref or CrossrefIndex(metadata)
+    build_dir.mkdir(parents=True, exist_ok=True)
+
+    tex_file = build_dir / md_file.with_suffix('.tex').name
+    input_hash = file_hash(md_file, hash_cache)
+    params_hash = conversion_params_hash(content_dir, crossref)
+    record = {'source': md_file, 'output': tex_file, 'status': 'skipped', 'error': None}
+
+    entry = load_manifest(build_dir).get(tex_file.name, {})
+    if not (tex_file.exists()
+            and entry.get('source') == str(md_file)
+            and entry.get('input_hash') == input_hash
+            and entry.get('params_hash') == params_hash):
+        ok, error = convert_chapter(md_file, tex_file, metadata, content_dir, log, crossref)
+        with _build_dir_lock(build_dir):
+            manifest = load_manifest(build_dir)
+            if ok:
+                manifest[tex_file.name] = {
+                    'source': str(md_file),
+                    'input_hash': input_hash,
+                    'params_hash': params_hash,
+                }
+                record['status'] = 'converted'
+            else:
+                manifest.pop(tex_file.name, None)
+                tex_file.unlink(missing_ok=True)
+                record['status'] = 'failed'
+                record['error'] = error
+            save_manifest(build_dir, manifest)
+
+    record['seconds'] = round(time.time() - started, 3)
+    return record
+
+def convert_project(text_dir: Path, build_dir: Path, metadata_file: Path = None,
+                    content_dir: Path = None, theme_dir: Path = None,
+                    metadata: dict = None, log=None, hash_cache: dict = None) -> dict:
+    """Convert a Markdown tree to LaTeX and generate thesis.tex
+
+    Only new or changed Markdown is converted (see MANIFEST_NAME) and .tex
+    files whose source disappeared are removed. Holds no module state, so
+    it can run concurrently from several threads for different build_dirs
+    (calls for the same build_dir are serialized). A long-lived caller can
+    pass the same hash_cache dict to every call to skip re-hashing files
+    whose mtime and size did not change.
+
+    Returns:
+        {
+            'success': bool,             # every source has an up-to-date .tex
+            'main_tex': Path or None,
+            'metadata': dict,
+            'files': [{'source', 'output', 'status', 'seconds', 'error'}, ...],
+            'converted': int, 'skipped': int, 'failed': int, 'removed': int,
+            'seconds': float
+        }
+    where status is 'converted', 'skipped', 'failed' or 'removed'.
+    """
+    started = time.time()
+    log = log or _silent
+    text_dir = Path(text_dir)
+    build_dir = Path(build_dir)
+    content_dir = Path(content_dir or CONTENT_DIR)
+    if metadata is None:
+        metadata = load_metadata(metadata_file or content_dir / "metadata.yaml")
+
+    result = {
+        'success': False,
+        'main_tex': None,
+        'metadata': metadata,
+        'files': [],
+        'converted': 0,
+        'skipped': 0,
+        'failed': 0,
+        'removed': 0,
+        'seconds': 0.0,
+    }
+
+    sources = find_markdown_files(text_dir)
+    all_files = sources['chapters'] + sources['structure'] + sources['appendices']
+    if not all_files:
+        result['seconds'] = round(time.time() - started, 3)
+        return result
+
+    with _build_dir_lock(build_dir):
+        build_dir.mkdir(parents=True, exist_ok=True)
+
+        # One cross-reference pass over the whole tree
+        crossref = CrossrefIndex(metadata)
+        crossref.scan(sources)
+        for label, md_file in crossref.duplicates:
+            log(f"  Warning: duplicate label {label} in {md_file.name}")
+
+        manifest = load_manifest(build_dir)
+        params_hash = conversion_params_hash(content_dir, crossref)
+        outputs = set()
+
+        for md_file in all_files:
+            file_started = time.time()
+            tex_file = build_dir / md_file.with_suffix('.tex').name
+            outputs.add(tex_file.name)
+            input_hash = file_hash(md_file, hash_cache)
+            entry = manifest.get(tex_file.name, {})
+            record = {'source': md_file, 'output': tex_file, 'error': None}
+
+            if (tex_file.exists()
+                    and entry.get('source') == str(md_file)
+                    and entry.get('input_hash') == input_hash
+                    and entry.get('params_hash') == params_hash):
+                record['status'] = 'skipped'
+            else:
+                ok, error = convert_chapter(md_file, tex_file, metadata, content_dir, log, crossref)
+                if ok:
+                    manifest[tex_file.name] = {
+                        'source': str(md_file),
+                        'input_hash': input_hash,
+                        'params_hash': params_hash,
+                    }
+                    record['status'] = 'converted'
+                else:
+                    # Never reuse a failed or partial output
+                    manifest.pop(tex_file.name, None)
+                    tex_file.unlink(missing_ok=True)
+                    record['status'] = 'failed'
+                    record['error'] = error
+
+            record['seconds'] = round(time.time() - file_started, 3)
+            result['files'].append(record)
+            result[record['status']] += 1
+
+        # Remove outputs whose Markdown source was deleted or renamed
+        for tex_name in sorted(set(manifest) - outputs):
+            (build_dir / tex_name).unlink(missing_ok=True)
+            result['files'].append({
+                'source': Path(manifest[tex_name]['source']),
+                'output': build_dir / tex_name,
+                'status': 'removed',
+                'seconds': 0.0,
+                'error': None,
+            })
+            result['removed'] += 1
+            del manifest[tex_name]
+            log(f"  Removed stale {tex_name}")
+
+        save_manifest(build_dir, manifest)
+
+        result['main_tex'] = generate_main_tex(metadata, text_dir, build_dir, content_dir, theme_dir)
+
+    result['success'] = result['failed'] == 0
+    result['seconds'] = round(time.time() - started, 3)
+    return result
+
 def convert_all():
     """Convert all Markdown chapters to LaTeX"""
     print("=" * 60)
@@ -252,45 +522,32 @@ def convert_all():
     print(f"Loaded metadata: {metadata.get('title', 'No title')}")
     print()
 
-    # Ensure build directory exists
-    BUILD_DIR.mkdir(exist_ok=True)
-
-    # Find all .md files in chapters, structure, and appendices
-    chapter_files = sorted(CHAPTERS_DIR.glob("*.md"))
-    structure_files = sorted(STRUCTURE_DIR.glob("*.md")) if STRUCTURE_DIR.exists() else []
-    appendix_files = sorted(APPENDICES_DIR.glob("*.md")) if APPENDICES_DIR.exists() else []
-    all_files = chapter_files + structure_files + appendix_files
+    sources = find_markdown_files(TEXT_DIR)
+    total = sum(len(files) for files in sources.values())
 
-    if not all_files:
+    if not total:
         print("No .md files found in content/text/")
         print("Run: python3 core/scripts/convert_tex_to_md.py")
         return False
 
-    print(f"Found {len(chapter_files)} chapters + {len(structure_files)} structure files + {len(appendix_files)} appendices")
+    print(f"Found {len(sources['chapters'])} chapters + {len(sources['structure'])} structure files + {len(sources['appendices'])} appendices")
     print()
 
-    # Convert each file
-    success = 0
-    for md_file in all_files:
-        tex_file = BUILD_DIR / md_file.with_suffix('.tex').name
-        if convert_chapter(md_file, tex_file, metadata):
-            success += 1
+    result = convert_project(TEXT_DIR, BUILD_DIR, METADATA_FILE, metadata=metadata, log=print)
 
     print()
-    print(f"Converted {success}/{len(all_files)} files")
+    print(f"Converted {result['converted']}, skipped {result['skipped']} unchanged, "
+          f"failed {result['failed']}, removed {result['removed']} stale")
     print()
 
-    # Generate main thesis.tex
-    print("Generating main thesis.tex...")
-    main_tex = generate_main_tex(metadata)
-    print(f"  ✓ Created: {main_tex}")
+    print(f"  ✓ Created: {result['main_tex']}")
     print()
 
     print("=" * 60)
     print("Conversion complete!")
     print("=" * 60)
 
-    return success == len(all_files)
+    return result['success']
 
 if __name__ == "__main__":
     # Check if pandoc is available
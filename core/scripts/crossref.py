@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Project-wide cross-references for Markdown sources
+Replaces the per-file pandoc-crossref filter with one Python pre-pass.
+
+All Markdown files are scanned once (in document order) for labels:
+    # Heading {#sec:intro}
+    ![Caption](media/plot.png){#fig:plot}
+    : Caption {#tbl:results}          (table caption)
+    $$ E = mc^2 $$ {#eq:energy}
+Every label gets a global number (chapter-based, like the LaTeX output:
+figure 2.3 is the third figure of chapter 2, appendices use letters).
+
+References are rewritten before pandoc sees the text:
+    @fig:plot, [@fig:a; @fig:b], [see @fig:plot, p. 3], -@fig:plot (no prefix)
+For LaTeX they become \\ref commands, so LaTeX resolves them across
+chapters; for HTML (html_preview.py) they become links with the numbers
+computed here. As with pandoc-crossref, the brackets of a group are not
+printed. Prefixes come from metadata strings (figure, figures, table,
+tables, section, sections, chapter, chapters, appendix, appendices,
+equation, equations), then from the document language's strings in
+languages.py; labels of level-1 headings use chapter (appendix).
+In a group that also cites bibliography keys the cross-references move
+after the brackets, so pandoc still sees a citation:
+    [@smith2020; @fig:plot] -> [@smith2020], Figure~\\ref{fig:plot}
+
+Usage:
+    python crossref.py [text_dir]     # list labels and undefined references
+"""
+
+import re
+import sys
+import threading
+from pathlib import Path
+
+from languages import LANGUAGES, language_matrix
+
+# Default reference prefixes (singular, plural), overridable via metadata strings
+DEFAULT_PREFIXES = {
+    'fig': ('Figure', 'Figures'),
+    'tbl': ('Table', 'Tables'),
+    'sec': ('Section', 'Sections'),
+    'chap': ('Chapter', 'Chapters'),
+    'app': ('Appendix', 'Appendices'),
+    'eq': ('Equation', 'Equations'),
+}
+PREFIX_STRINGS = {'fig': 'figure', 'tbl': 'table', 'sec': 'section', 'chap': 'chapter',
+                  'app': 'appendix', 'eq': 'equation'}
+PLURAL_STRINGS = {'appendix': 'appendices'}
+
+LABEL = r"(?:fig|tbl|sec|eq):[\w:.-]*\w"
+
+# Code is never rewritten: fenced blocks and inline code spans
+PROTECTED_RE = re.compile(r"^(`{3,}|~{3,}).*?^\1[ \t]*$|`[^`\n]+`", re.MULTILINE | re.DOTALL)
+
+HEADING_RE = re.compile(r"^(#{1,6})[ \t]+(.*?)(?:[ \t]+\{([^}]*)\})?[ \t]*#*[ \t]*$", re.MULTILINE)
+FIGURE_RE = re.compile(r"(!\[)((?:[^\[\]]|\[[^\[\]]*\])*)(\]\([^)]*\)\{[^}]*#(fig:[\w:.-]*\w)[^}]*\})")
+TABLE_CAPTION_RE = re.compile(rf"^((?:Table)?:[ \t]+)(.*?)[ \t]*\{{#({LABEL})\}}[ \t]*$", re.MULTILINE)
+EQUATION_RE = re.compile(rf"\$\$((?:[^$]|\$(?!\$))+?)\$\$[ \t]*\{{#({LABEL})\}}")
+
+REF = rf"([-+]?)@({LABEL})"
+REF_RE = re.compile(rf"(?<![\w@\\]){REF}")
+# Bracketed group (not a link, image or span); rewritten when it holds references
+GROUP_RE = re.compile(r"(?<![!\]])\[([^\[\]\n]*)\](?![(\[{])")
+CITE_KEY_RE = re.compile(rf"(?<![\w@])[-+]?@(?!{LABEL})\w")
+
+
+def split_protected(text: str) -> list:
+    """[(is_code, part), ...] covering text"""
+    parts = []
+    position = 0
+    for match in PROTECTED_RE.finditer(text):
+        parts.append((False, text[position:match.start()]))
+        parts.append((True, match.group(0)))
+        position = match.end()
+    parts.append((False, text[position:]))
+    return parts
+
+
+def scan_text(text: str) -> list:
+    """Label events of one file in document order
+
+    ('heading', level, label, numbered, title) or (kind, label)
+    """
+    events = []
+    for is_code, part in split_protected(text):
+        if is_code:
+            continue
+        found = []
+        for match in HEADING_RE.finditer(part):
+            attributes = (match.group(3) or '').split()
+            label = next((a[1:] for a in attributes if a.startswith('#sec:')), None)
+            numbered = '-' not in attributes and '.unnumbered' not in attributes
+            found.append((match.start(), ('heading', len(match.group(1)), label, numbered, match.group(2))))
+        for match in FIGURE_RE.finditer(part):
+            found.append((match.start(), ('fig', match.group(4))))
+        for match in TABLE_CAPTION_RE.finditer(part):
+            found.append((match.start(), ('tbl', match.group(3))))
+        for match in EQUATION_RE.finditer(part):
+            found.append((match.start(), ('eq', match.group(2))))
+        events += [event for _, event in sorted(found, key=lambda item: item[0])]
+    return events
+
+
+def appendix_letter(n: int) -> str:
+    letters = ''
+    while n > 0:
+        n, rest = divmod(n - 1, 26)
+        letters = chr(ord('A') + rest) + letters
+    return letters
+
+
+def language_strings(metadata: dict) -> dict:
+    """Theme strings of the document language: metadata 'language' (babel name),
+    else the source of the languages matrix (languages.py)"""
+    metadata = metadata or {}
+    for entry in LANGUAGES.values():
+        if entry['babel'] == metadata.get('language'):
+            return entry['strings']
+    try:
+        return language_matrix(metadata)[0]['strings']
+    except ValueError:
+        return {}
+
+
+class CrossrefIndex:
+    """Labels and numbers of a whole Markdown tree"""
+
+    def __init__(self, metadata: dict = None):
+        strings = dict(language_strings(metadata), **((metadata or {}).get('strings') or {}))
+        self.prefixes = {
+            kind: (strings.get(name, DEFAULT_PREFIXES[kind][0]),
+                   strings.get(PLURAL_STRINGS.get(name, name + 's'), DEFAULT_PREFIXES[kind][1]))
+            for kind, name in PREFIX_STRINGS.items()
+        }
+        self.labels = {}          # {label: (number, md_file)}
+        self.chapters = {}        # {label of a level-1 heading: 'chap' or 'app'}
+        self.duplicates = []      # [(label, md_file)]
+        self.chapter_offsets = {}  # {md_file: numbered chapters before it}
+        self._scans = {}          # {md_file: ((mtime, size), events)}
+        self.lock = threading.Lock()
+
+    def _events(self, md_file: Path) -> list:
+        stat = md_file.stat()
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._scans.get(md_file)
+        if cached and cached[0] == signature:
+            return cached[1]
+        events = scan_text(md_file.read_text(encoding='utf-8'))
+        self._scans[md_file] = (signature, events)
+        return events
+
+    def scan(self, sources: dict):
+        """Number all labels; sources maps section name → Markdown files in document order
+
+        Files in an 'appendices' section are numbered A, B, ... Unchanged
+        files (same mtime and size) are not re-read on later scans.
+        """
+        with self.lock:
+            labels = {}
+            chapters = {}
+            duplicates = []
+            offsets = {}
+            chapter = 0
+            chapter_name = ''
+            counters = dict.fromkeys(('fig', 'tbl', 'eq'), 0)
+            sections = []
+
+            for section, md_files in sources.items():
+                if section == 'appendices':
+                    chapter = 0
+                for md_file in md_files:
+                    md_file = Path(md_file)
+                    offsets[md_file] = chapter
+                    for event in self._events(md_file):
+                        if event[0] == 'heading':
+                            _, level, label, numbered, title = event
+                            number = None
+                            if numbered and level == 1:
+                                chapter += 1
+                                chapter_name = appendix_letter(chapter) if section == 'appendices' else str(chapter)
+                                counters = dict.fromkeys(counters, 0)
+                                sections = []
+                                number = chapter_name
+                            elif numbered:
+                                sections = (sections + [0] * level)[:level - 1]
+                                sections[-1] += 1
+                                number = '.'.join([chapter_name] + [str(n) for n in sections])
+                            label_number = number or title
+                            if level == 1 and label:
+                                chapters[label] = 'app' if section == 'appendices' else 'chap'
+                        else:
+                            kind, label = event
+                            counters[kind] += 1
+                            label_number = f"{chapter_name}.{counters[kind]}" if chapter_name else str(counters[kind])
+
+                        if label is None:
+                            continue
+                        if label in labels:
+                            duplicates.append((label, md_file))
+                        else:
+                            labels[label] = (label_number, md_file)
+
+            self.labels = labels
+            self.chapters = chapters
+            self.duplicates = duplicates
+            self.chapter_offsets = offsets
+            # Forget files that are no longer part of the tree
+            self._scans = {path: scan for path, scan in self._scans.items() if path in offsets}
+
+    def number(self, label: str) -> str:
+        entry = self.labels.get(label)
+        return entry[0] if entry else None
+
+    def kind(self, label: str) -> str:
+        """Prefix kind of a label (chapter and appendix headings apart from sections)"""
+        return self.chapters.get(label) or label.split(':', 1)[0]
+
+    def format_refs(self, refs: list, target: str, md_file: Path = None) -> str:
+        """Reference text for [(modifier, label), ...] in md_file"""
+        kinds = {self.kind(label) for _, label in refs}
+        plural = len(refs) > 1 and len(kinds) == 1
+        formatted = []
+        for i, (modifier, label) in enumerate(refs):
+            kind = self.kind(label)
+            if target == 'latex':
+                ref = f"\\ref{{{label}}}"
+            else:
+                # Labels of other chapters link to that chapter's preview page
+                entry = self.labels.get(label)
+                page = f"{entry[1].stem}.html" if entry and entry[1] != md_file else ""
+                ref = f"[{entry[0] if entry else '??'}]({page}#{label})"
+            # A group of one kind shares a single plural prefix
+            if modifier == '-' or (plural and i > 0):
+                formatted.append(ref)
+            else:
+                prefix = self.prefixes[kind][1 if plural else 0]
+                formatted.append(f"{prefix}~{ref}" if target == 'latex' else f"{prefix} {ref}")
+        text = ', '.join(formatted)
+        return f"`{text}`{{=latex}}" if target == 'latex' else text
+
+    def rewrite(self, text: str, target: str = 'latex', md_file: Path = None) -> tuple:
+        """Rewrite labels and references of md_file for pandoc; returns (text, undefined labels)
+
+        target is 'latex' (\\label/\\ref, LaTeX numbers) or 'html' (numbers from this index).
+        """
+        undefined = []
+
+        def refs_of(group_text):
+            refs = re.findall(REF, group_text)
+            undefined.extend(label for _, label in refs if label not in self.labels)
+            return refs
+
+        def group(match):
+            if not re.search(REF, match.group(1)):
+                return match.group(0)
+            items = [item.strip() for item in match.group(1).split(';')]
+            with_refs = [item for item in items if re.search(REF, item)]
+            others = [item for item in items if item not in with_refs]
+            # Bare references are formatted together ("Figures 2.1, 2.2"), others keep their text
+            bare = [item for item in with_refs if re.fullmatch(REF, item)]
+            refs = [self.format_refs(refs_of(';'.join(bare)), target, md_file)] if bare else []
+            refs += [REF_RE.sub(lambda m: self.format_refs(refs_of(m.group(0)), target, md_file), item)
+                     for item in with_refs if item not in bare]
+            if any(CITE_KEY_RE.search(item) for item in others):
+                # Bibliography keys stay a citation for pandoc
+                return f"[{'; '.join(others)}], {', '.join(refs)}"
+            return ', '.join(refs + others)
+
+        def equation(match):
+            body, label = match.group(1), match.group(2)
+            if target == 'latex':
+                return f"`\\begin{{equation}}{body}\\label{{{label}}}\\end{{equation}}`{{=latex}}"
+            return f"[]{{#{label}}}$${body}\\qquad ({self.number(label)})$$"
+
+        def table_caption(match):
+            lead, caption, label = match.groups()
+            if target == 'latex':
+                return f"{lead}{caption} \\label{{{label}}}"
+            return f"{lead}[]{{#{label}}}{self.prefixes['tbl'][0]} {self.number(label)}: {caption}"
+
+        def figure(match):
+            if target == 'latex':
+                # pandoc emits \label{fig:...} for figure identifiers
+                return match.group(0)
+            return f"{match.group(1)}{self.prefixes['fig'][0]} {self.number(match.group(4))}: " \
+                   f"{match.group(2)}{match.group(3)}"
+
+        result = []
+        for is_code, part in split_protected(text):
+            if not is_code:
+                part = EQUATION_RE.sub(equation, part)
+                part = TABLE_CAPTION_RE.sub(table_caption, part)
+                part = FIGURE_RE.sub(figure, part)
+                part = GROUP_RE.sub(group, part)
+                part = REF_RE.sub(lambda m: self.format_refs(refs_of(m.group(0)), target, md_file), part)
+            result.append(part)
+        return ''.join(result), undefined
+
+
+if __name__ == "__main__":
+    from convert_md import TEXT_DIR, find_markdown_files
+
+    text_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else TEXT_DIR
+    sources = find_markdown_files(text_dir)
+    index = CrossrefIndex()
+    index.scan(sources)
+
+    for label, (number, md_file) in index.labels.items():
+        print(f"{label:30} {number:10} {md_file.name}")
+    for label, md_file in index.duplicates:
+        print(f"Duplicate label {label} in {md_file.name}")
+    for md_files in sources.values():
+        for md_file in md_files:
+            for label in index.rewrite(md_file.read_text(encoding='utf-8'))[1]:
+                print(f"Undefined reference @{label} in {md_file.name}")
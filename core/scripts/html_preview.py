@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Fast HTML preview of single chapters
+Converts one Markdown chapter to standalone HTML in a single pandoc run,
+so an edit can be previewed long before the PDF build finishes.
+
+The conversion uses the same input format and options as the LaTeX
+conversion (PANDOC_ARGS), but resolves citations with citeproc against the
+project bibliography and renders math as MathML (no network needed).
+Cross-references get the project-wide numbers of crossref.py.
+Results are cached per chapter by content hash (rewritten Markdown +
+bibliography + options), in memory and on disk.
+
+Usage:
+    python html_preview.py content/text/chapters/01-introduction.md [output.html]
+"""
+
+import sys
+import hashlib
+import threading
+import subprocess
+from pathlib import Path
+
+from convert_md import CONTENT_DIR, BUILD_DIR, PANDOC_ARGS, load_metadata, find_markdown_files
+from crossref import CrossrefIndex
+
+# Bump when the options below change the generated HTML
+HTML_CACHE_VERSION = 2
+
+
+def metadata_bib_files(metadata: dict, content_dir: Path) -> list:
+    """Bibliography files listed in metadata.yaml that exist (same rule as generate_main_tex)"""
+    bib_files = []
+    for bib in metadata.get('bibliography', []) or []:
+        bib_path = Path(content_dir) / bib
+        if bib_path.exists():
+            bib_files.append(bib_path.absolute())
+    return bib_files
+
+
+def html_pandoc_args(bib_files: list, lang: str = None) -> list:
+    """PANDOC_ARGS with the LaTeX-specific options swapped for their HTML equivalents"""
+    args = []
+    skip = False
+    for arg in PANDOC_ARGS:
+        if skip:
+            skip = False
+            continue
+        if arg == "-t":
+            args += ["-t", "html5"]
+            skip = True
+        elif arg == "--natbib":
+            # LaTeX leaves citations to biblatex; the preview resolves them itself
+            args.append("--citeproc")
+        else:
+            args.append(arg)
+
+    args += ["--standalone", "--mathml", "--number-sections", "--section-divs"]
+    for bib_file in bib_files:
+        args.append(f"--bibliography={bib_file}")
+    if lang:
+        args += ["-M", f"lang={lang}"]
+    return args
+
+
+class HtmlPreview:
+    """Per-chapter Markdown → HTML renderer with a content-hash cache"""
+
+    def __init__(self, content_dir: Path = None, cache_dir: Path = None,
+                 metadata: dict = None, bib_files: list = None, text_dir: Path = None):
+        self.content_dir = Path(content_dir or CONTENT_DIR)
+        self.text_dir = Path(text_dir or self.content_dir / "text").resolve()
+        self.cache_dir = Path(cache_dir or BUILD_DIR / "html-cache")
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.memory = {}  # {md_file: (cache key, html)}
+        self.lock = threading.Lock()
+        self.update_metadata(metadata if metadata is not None
+                             else load_metadata(self.content_dir / "metadata.yaml"), bib_files)
+
+    def update_metadata(self, metadata: dict, bib_files: list = None):
+        """Re-read the options that depend on metadata.yaml (bibliography, language)"""
+        self.bib_files = bib_files if bib_files is not None else metadata_bib_files(metadata, self.content_dir)
+        self.args = html_pandoc_args(self.bib_files, metadata.get('lang'))
+        self.crossref = CrossrefIndex(metadata)
+
+    def prepare(self, md_file: Path) -> tuple:
+        """(Markdown with numbered cross-references, pandoc arguments) for one chapter"""
+        # Cheap after the first call: unchanged files are not re-read
+        self.crossref.scan(find_markdown_files(self.text_dir))
+        text, _ = self.crossref.rewrite(md_file.read_text(encoding='utf-8'), 'html', md_file)
+        # Number headings like the chapter's position in the whole thesis
+        offset = self.crossref.chapter_offsets.get(md_file, 0)
+        return text, self.args + [f"--number-offset={offset}"]
+
+    def cache_key(self, text: str, args: list) -> str:
+        hasher = hashlib.sha256()
+        hasher.update(f"{HTML_CACHE_VERSION}\0{' '.join(args)}\0".encode('utf-8'))
+        for bib_file in self.bib_files:
+            hasher.update(Path(bib_file).read_bytes())
+        hasher.update(text.encode('utf-8'))
+        return hasher.hexdigest()
+
+    def render(self, md_file: Path) -> tuple:
+        """Convert one chapter; returns (html, cached)
+
+        Raises RuntimeError with pandoc's message if the conversion fails.
+        """
+        md_file = Path(md_file).resolve()
+        text, args = self.prepare(md_file)
+        key = self.cache_key(text, args)
+
+        with self.lock:
+            if self.memory.get(md_file) and self.memory[md_file][0] == key:
+                return self.memory[md_file][1], True
+
+        cache_file = self.cache_dir / f"{key}.html"
+        if cache_file.exists():
+            html = cache_file.read_text(encoding='utf-8')
+            cached = True
+        else:
+            cmd = ["pandoc"] + args
+            result = subprocess.run(cmd, input=text, capture_output=True, text=True, cwd=self.content_dir)
+            if result.returncode != 0:
+                raise RuntimeError(result.stderr.strip() or f"pandoc exited with {result.returncode}")
+            html = result.stdout
+            tmp = cache_file.with_suffix('.tmp')
+            tmp.write_text(html, encoding='utf-8')
+            tmp.replace(cache_file)
+            cached = False
+
+        with self.lock:
+            # Only the latest version of each chapter is kept in memory
+            self.memory[md_file] = (key, html)
+        return html, cached
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    html, _ = HtmlPreview().render(Path(sys.argv[1]))
+    if len(sys.argv) > 2:
+        Path(sys.argv[2]).write_text(html, encoding='utf-8')
+    else:
+        print(html)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Languages of a multilingual thesis build
+
+metadata.yaml names the source language and the translation targets:
+
+    languages:
+      source: pt
+      targets:
+        - fr
+        - en
+        - code: es
+          strings: {contents: Índice general}   # overrides of the defaults below
+
+Known codes (LANGUAGES) come with a name for the prompts, a lang tag, a
+babel language and theme strings; other codes need at least name and babel.
+Without a languages key the build is Portuguese → French.
+"""
+
+LANGUAGES = {
+    'pt': {
+        'name': 'Portuguese',
+        'lang': 'pt-BR',
+        'babel': 'portuguese',
+        'strings': {
+            'contents': 'Sumário',
+            'listfigures': 'Lista de figuras',
+            'listtables': 'Lista de tabelas',
+            'listlistings': 'Lista de códigos',
+            'abstract': 'Resumo',
+            'acknowledgments': 'Agradecimentos',
+            'bibliography': 'Referências',
+            'chapter': 'Capítulo', 'chapters': 'Capítulos',
+            'appendix': 'Apêndice', 'appendices': 'Apêndices',
+            'figure': 'Figura', 'figures': 'Figuras',
+            'table': 'Tabela', 'tables': 'Tabelas',
+            'section': 'Seção', 'sections': 'Seções',
+            'equation': 'Equação', 'equations': 'Equações',
+        },
+    },
+    'fr': {
+        'name': 'French',
+        'lang': 'fr-FR',
+        'babel': 'french',
+        'strings': {
+            'contents': 'Sommaire',
+            'listfigures': 'Liste des figures',
+            'listtables': 'Liste des tableaux',
+            'listlistings': 'Liste des codes',
+            'abstract': 'Résumé',
+            'acknowledgments': 'Remerciements',
+            'bibliography': 'Bibliographie',
+            'chapter': 'Chapitre', 'chapters': 'Chapitres',
+            'appendix': 'Annexe', 'appendices': 'Annexes',
+            'figure': 'Figure', 'figures': 'Figures',
+            'table': 'Tableau', 'tables': 'Tableaux',
+            'section': 'Section', 'sections': 'Sections',
+            'equation': 'Équation', 'equations': 'Équations',
+        },
+    },
+    'en': {
+        'name': 'English',
+        'lang': 'en-US',
+        'babel': 'english',
+        'strings': {
+            'contents': 'Contents',
+            'listfigures': 'List of Figures',
+            'listtables': 'List of Tables',
+            'listlistings': 'Listings',
+            'abstract': 'Abstract',
+            'acknowledgments': 'Acknowledgments',
+            'bibliography': 'Bibliography',
+            'chapter': 'Chapter', 'chapters': 'Chapters',
+            'appendix': 'Appendix', 'appendices': 'Appendices',
+            'figure': 'Figure', 'figures': 'Figures',
+            'table': 'Table', 'tables': 'Tables',
+            'section': 'Section', 'sections': 'Sections',
+            'equation': 'Equation', 'equations': 'Equations',
+        },
+    },
+    'es': {
+        'name': 'Spanish',
+        'lang': 'es-ES',
+        'babel': 'spanish',
+        'strings': {
+            'contents': 'Índice',
+            'listfigures': 'Índice de figuras',
+            'listtables': 'Índice de tablas',
+            'listlistings': 'Índice de códigos',
+            'abstract': 'Resumen',
+            'acknowledgments': 'Agradecimientos',
+            'bibliography': 'Bibliografía',
+            'chapter': 'Capítulo', 'chapters': 'Capítulos',
+            'appendix': 'Apéndice', 'appendices': 'Apéndices',
+            'figure': 'Figura', 'figures': 'Figuras',
+            'table': 'Tabla', 'tables': 'Tablas',
+            'section': 'Sección', 'sections': 'Secciones',
+            'equation': 'Ecuación', 'equations': 'Ecuaciones',
+        },
+    },
+    'de': {
+        'name': 'German',
+        'lang': 'de-DE',
+        'babel': 'ngerman',
+        'strings': {
+            'contents': 'Inhaltsverzeichnis',
+            'listfigures': 'Abbildungsverzeichnis',
+            'listtables': 'Tabellenverzeichnis',
+            'listlistings': 'Quelltextverzeichnis',
+            'abstract': 'Zusammenfassung',
+            'acknowledgments': 'Danksagung',
+            'bibliography': 'Literaturverzeichnis',
+            'chapter': 'Kapitel', 'chapters': 'Kapitel',
+            'appendix': 'Anhang', 'appendices': 'Anhänge',
+            'figure': 'Abbildung', 'figures': 'Abbildungen',
+            'table': 'Tabelle', 'tables': 'Tabellen',
+            'section': 'Abschnitt', 'sections': 'Abschnitte',
+            'equation': 'Gleichung', 'equations': 'Gleichungen',
+        },
+    },
+}
+
+DEFAULT_SOURCE = 'pt'
+DEFAULT_TARGETS = ['fr']
+
+
+def language(entry) -> dict:
+    """{'code', 'name', 'lang', 'babel', 'strings'} of a code or a {code: ..., overrides} entry"""
+    if isinstance(entry, str):
+        entry = {'code': entry}
+    if not isinstance(entry, dict) or not entry.get('code'):
+        raise ValueError(f"Invalid language entry: {entry!r}")
+
+    code = str(entry['code']).lower()
+    known = LANGUAGES.get(code, {})
+    result = {
+        'code': code,
+        'name': entry.get('name', known.get('name')),
+        'lang': entry.get('lang', known.get('lang', code)),
+        'babel': entry.get('babel', known.get('babel')),
+        'strings': dict(known.get('strings', {}), **(entry.get('strings') or {})),
+    }
+    if not result['name'] or not result['babel']:
+        raise ValueError(f"Language '{code}' is not built in: give at least its name and babel language")
+    return result
+
+
+def language_matrix(metadata: dict) -> tuple:
+    """(source language, [target languages]) configured in metadata"""
+    config = (metadata or {}).get('languages') or {}
+    source = language(config.get('source', DEFAULT_SOURCE))
+    targets = [language(entry) for entry in config.get('targets', DEFAULT_TARGETS)]
+    codes = [target['code'] for target in targets]
+    if source['code'] in codes or len(set(codes)) != len(codes):
+        raise ValueError(f"Duplicate language in {source['code']} → {', '.join(codes)}")
+    return source, targets
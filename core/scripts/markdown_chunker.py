@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Structure-aware Markdown chunking for translation
+
+Markdown is split into segments at block boundaries (blank lines) but never
+inside fenced code, display math ($$ ... $$), LaTeX environments or HTML
+comments. A segment larger than the token budget is split further at line
+ends (list items, wrapped lines), then sentences, but never inside a table,
+a citation ([@...]) or inline math. Segments are packed into chunks (one request each)
+within the budget, preferably starting a new chunk at a heading.
+
+Every split keeps the exact separator, so ''.join(text + separator)
+gives back the original Markdown.
+"""
+
+import os
+import re
+
+from translation_engine import estimate_tokens
+
+# Source tokens per translation request (output must stay under max_tokens)
+CHUNK_TOKENS = int(os.getenv("TRANSLATION_CHUNK_TOKENS", "1500"))
+
+FENCE_RE = re.compile(r"^(`{3,}|~{3,})")
+LETTER_RE = re.compile(r"[^\W\d_]")
+HEADING_RE = re.compile(r"^#{1,6}\s")
+TABLE_LINE_RE = re.compile(r"^\s*(?:\||\+[-=+]+\+)")
+BEGIN_ENV_RE = re.compile(r"\\begin\{[^}]+\}")
+END_ENV_RE = re.compile(r"\\end\{[^}]+\}")
+SENTENCE_END_RE = re.compile(r"(?<=[.!?…])\s+(?=[\"'«(\[]?[^\W\d_])")
+
+
+def _is_balanced(text: str) -> bool:
+    """No open citation/link bracket or inline math at the end of text"""
+    depth = 0
+    for char in text:
+        if char == '[':
+            depth += 1
+        elif char == ']':
+            depth = max(0, depth - 1)
+    dollars = len(re.findall(r"(?<!\\)\$", text))
+    return depth == 0 and dollars % 2 == 0
+
+
+def split_segments(content: str, budget: int = None) -> list:
+    """Split Markdown into [(segment, separator), ...]
+
+    Segments end at blank lines outside fenced code, display math, LaTeX
+    environments and HTML comments. With a budget (tokens), larger
+    segments are split further (see split_long_segment).
+    """
+    segments = []
+    current, separator = [], []
+    fence = None
+    in_math = False
+    env_depth = 0
+    in_comment = False
+    for line in content.splitlines(keepends=True):
+        stripped = line.strip()
+        protected = fence is not None or in_math or env_depth > 0 or in_comment
+        if not protected and not stripped:
+            separator.append(line)
+            continue
+        if separator:
+            segments.append((''.join(current), ''.join(separator)))
+            current, separator = [], []
+        current.append(line)
+
+        match = FENCE_RE.match(stripped)
+        if fence is None and match:
+            fence = match.group(1)
+        elif fence:
+            if stripped.startswith(fence) and set(stripped) == {fence[0]}:
+                fence = None
+        else:
+            if stripped.count('$$') % 2:
+                in_math = not in_math
+            env_depth = max(0, env_depth + len(BEGIN_ENV_RE.findall(line)) - len(END_ENV_RE.findall(line)))
+            if '<!--' in line and '-->' not in line.split('<!--')[-1]:
+                in_comment = True
+            elif '-->' in line:
+                in_comment = False
+    segments.append((''.join(current), ''.join(separator)))
+
+    if budget:
+        split = []
+        for segment, separator in segments:
+            pieces = split_long_segment(segment, budget)
+            pieces[-1] = (pieces[-1][0], separator)
+            split += pieces
+        segments = split
+    return segments
+
+
+def _units(text: str, pattern: re.Pattern) -> list:
+    """Split text at the separators matched by pattern, only where nothing is left open"""
+    units = []
+    start = 0
+    for match in pattern.finditer(text):
+        piece = text[start:match.start()]
+        if piece and _is_balanced(piece):
+            units.append((piece, match.group(0)))
+            start = match.end()
+    units.append((text[start:], ''))
+    return units
+
+
+def _pack(units: list, budget: int) -> list:
+    """Merge consecutive (text, separator) units while they fit in the budget"""
+    packed = []
+    for text, separator in units:
+        if packed and estimate_tokens(packed[-1][0] + packed[-1][1] + text) <= budget:
+            previous, previous_separator = packed[-1]
+            packed[-1] = (previous + previous_separator + text, separator)
+        else:
+            packed.append((text, separator))
+    return packed
+
+
+def split_long_segment(segment: str, budget: int) -> list:
+    """[(piece, separator), ...] of a segment, each piece within budget where possible
+
+    Tables, fenced code and display math are never split.
+    """
+    text = segment.rstrip('\n')
+    trailing = segment[len(text):]
+    lines = text.split('\n')
+    if (estimate_tokens(segment) <= budget
+            or FENCE_RE.match(text.strip())
+            or '$$' in text
+            or any(TABLE_LINE_RE.match(line) for line in lines)):
+        return [(segment, '')]
+
+    # Line units (list items, wrapped lines), only where no citation or inline math is open
+    units = _units(text, re.compile(r"\n"))
+
+    # Lines still over budget are split at sentence ends
+    sentence_units = []
+    for unit, separator in units:
+        if estimate_tokens(unit) > budget:
+            parts = _units(unit, SENTENCE_END_RE)
+            parts[-1] = (parts[-1][0], separator)
+            sentence_units += parts
+        else:
+            sentence_units.append((unit, separator))
+
+    pieces = _pack(sentence_units, budget)
+    pieces[-1] = (pieces[-1][0] + trailing, '')
+    return pieces
+
+
+def needs_translation(segment: str) -> bool:
+    """False for empty segments, fenced code blocks and segments without words"""
+    text = segment.strip()
+    return bool(text) and not FENCE_RE.match(text) and bool(LETTER_RE.search(text))
+
+
+def with_whitespace_of(segment: str, translation: str) -> str:
+    """Give a translation the leading/trailing whitespace of its source segment"""
+    lead = segment[:len(segment) - len(segment.lstrip())]
+    trail = segment[len(segment.rstrip()):]
+    return lead + translation.strip() + trail
+
+
+def pack_chunks(texts: list, budget: int = None) -> list:
+    """Group segment texts (in document order) into request chunks within budget
+
+    A heading starts a new chunk once the current one is half full, so
+    chunks tend to follow the document's sections.
+    """
+    budget = budget or CHUNK_TOKENS
+    chunks = []
+    current, size = [], 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        starts_section = HEADING_RE.match(text) and size >= budget // 2
+        if current and (size + tokens > budget or starts_section):
+            chunks.append(current)
+            current, size = [], 0
+        current.append(text)
+        size += tokens
+    if current:
+        chunks.append(current)
+    return chunks
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Live preview server for watch mode
+Serves the latest successfully built PDF and pushes reload notifications
+
+Endpoints:
+    /            viewer page that reloads itself when a new PDF is published
+    /thesis.pdf  latest PDF (content-hash ETag, Range requests)
+    /events      Server-Sent Events stream ("reload" events with timings and diagnostics,
+                 "chapter" events when a chapter's HTML preview changes)
+    /status      JSON with the latest build information
+    /html/       index of chapter HTML previews (see html_preview.py)
+    /html/<chapter>.html  chapter preview, reloads itself when the chapter changes
+    /html/media/...       project media referenced by the chapters
+"""
+
+import re
+import json
+import time
+import queue
+import hashlib
+import threading
+import mimetypes
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+DEFAULT_PORT = 8765
+
+# Seconds between SSE keep-alive comments
+KEEPALIVE_SECONDS = 15
+
+VIEWER_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Thesis preview</title>
+<style>
+  html, body { margin: 0; height: 100%; font-family: sans-serif; }
+  #status { padding: 4px 8px; background: #eee; font-size: 13px; }
+  #pdf { width: 100%; height: calc(100% - 26px); border: 0; }
+</style>
+</head>
+<body>
+<div id="status">Waiting for the first build...</div>
+<iframe id="pdf" src="/thesis.pdf"></iframe>
+<script>
+  const status = document.getElementById("status");
+  const pdf = document.getElementById("pdf");
+  const events = new EventSource("/events");
+  events.addEventListener("reload", (e) => {
+    const build = JSON.parse(e.data);
+    const d = build.diagnostics;
+    status.textContent = `Built ${build.built_at} in ${build.total_seconds.toFixed(2)}s - `
+      + `${d.errors} errors, ${d.warnings} warnings, ${d.undefined_references} undefined references`;
+    if (build.changed) {
+      pdf.src = "/thesis.pdf?v=" + build.etag;
+    }
+  });
+</script>
+</body>
+</html>
+"""
+
+# Injected into chapter pages so they reload when the chapter is republished
+CHAPTER_RELOAD_SCRIPT = """<script>
+  new EventSource("/events").addEventListener("chapter", (e) => {
+    if (JSON.parse(e.data).name === %s) location.reload();
+  });
+</script>
+"""
+
+LOG_ERROR_RE = re.compile(r"^! ", re.MULTILINE)
+LOG_WARNING_RE = re.compile(r"^(?:LaTeX|Package \S+|Class \S+) Warning:", re.MULTILINE)
+LOG_UNDEFINED_RE = re.compile(r"(?:Reference|Citation) `?[^ ]+'? .*undefined", re.MULTILINE)
+LOG_BOX_RE = re.compile(r"^(?:Overfull|Underfull) \\[hv]box", re.MULTILINE)
+
+
+def summarize_latex_log(log_file: Path) -> dict:
+    """Count errors, warnings, undefined references and bad boxes in a LaTeX log"""
+    summary = {'errors': 0, 'warnings': 0, 'undefined_references': 0, 'bad_boxes': 0}
+    if not log_file or not Path(log_file).exists():
+        return summary
+
+    text = Path(log_file).read_text(encoding='utf-8', errors='replace')
+    summary['errors'] = len(LOG_ERROR_RE.findall(text))
+    summary['warnings'] = len(LOG_WARNING_RE.findall(text))
+    summary['undefined_references'] = len(LOG_UNDEFINED_RE.findall(text))
+    summary['bad_boxes'] = len(LOG_BOX_RE.findall(text))
+    return summary
+
+
+class PreviewServer:
+    """Holds the published PDF snapshot and the connected SSE clients"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT, media_dir: Path = None):
+        self.host = host
+        self.port = port
+        self.media_dir = Path(media_dir).resolve() if media_dir else None
+        self.chapters = {}  # {name: (html bytes, etag)}
+        self.lock = threading.Lock()
+        self.pdf_bytes = None
+        self.etag = None
+        self.build_info = None
+        self.clients = set()
+        self.httpd = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/"
+
+    def start(self):
+        """Serve in a background thread"""
+        preview = self
+
+        class Handler(PreviewRequestHandler):
+            server_state = preview
+
+        self.httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, name="preview-server", daemon=True).start()
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+
+    def publish(self, pdf_path: Path, timings: dict = None, log_file: Path = None):
+        """Publish a successfully built PDF and notify connected viewers
+
+        The PDF is snapshotted in memory, so a later build rewriting the file
+        never serves a half-written document.
+        """
+        data = Path(pdf_path).read_bytes()
+        etag = hashlib.sha256(data).hexdigest()[:32]
+        timings = timings or {}
+        diagnostics = summarize_latex_log(log_file)
+
+        with self.lock:
+            changed = etag != self.etag
+            self.pdf_bytes = data
+            self.etag = etag
+            self.build_info = {
+                'etag': etag,
+                'changed': changed,
+                'size': len(data),
+                'built_at': time.strftime("%H:%M:%S"),
+                'timings': timings,
+                'total_seconds': round(sum(timings.values()), 3),
+                'diagnostics': diagnostics,
+            }
+            message = json.dumps(self.build_info)
+            clients = list(self.clients)
+
+        for client in clients:
+            client.put(('reload', message))
+
+    def publish_chapter(self, name: str, html: str, seconds: float = 0.0):
+        """Publish a chapter's HTML preview and notify open chapter pages"""
+        data = html.encode('utf-8')
+        etag = hashlib.sha256(data).hexdigest()[:32]
+        with self.lock:
+            if self.chapters.get(name, (None, None))[1] == etag:
+                return
+            self.chapters[name] = (data, etag)
+            message = json.dumps({'name': name, 'etag': etag, 'seconds': round(seconds, 3)})
+            clients = list(self.clients)
+
+        for client in clients:
+            client.put(('chapter', message))
+
+    def subscribe(self) -> queue.Queue:
+        client = queue.Queue()
+        with self.lock:
+            self.clients.add(client)
+        return client
+
+    def unsubscribe(self, client: queue.Queue):
+        with self.lock:
+            self.clients.discard(client)
+
+
+class PreviewRequestHandler(BaseHTTPRequestHandler):
+    """HTTP handler; server_state is set on a per-server subclass"""
+
+    server_state = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # Keep the watcher's terminal output clean
+        pass
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path == '/':
+            self.send_body(VIEWER_PAGE.encode('utf-8'), 'text/html; charset=utf-8')
+        elif path == '/thesis.pdf':
+            self.send_pdf()
+        elif path == '/events':
+            self.send_events()
+        elif path == '/html' or path == '/html/':
+            self.send_chapter_index()
+        elif path.startswith('/html/media/'):
+            self.send_media(path[len('/html/media/'):])
+        elif path.startswith('/html/'):
+            self.send_chapter(path[len('/html/'):])
+        elif path == '/status':
+            with self.server_state.lock:
+                info = self.server_state.build_info
+            self.send_body(json.dumps(info).encode('utf-8'), 'application/json')
+        else:
+            self.send_error(404)
+
+    def do_HEAD(self):
+        """Headers of the GET response (send_body skips the body); the event stream has none"""
+        if self.path.split('?', 1)[0] == '/events':
+            self.send_body(b'', 'text/plain', 405, {'Allow': 'GET'})
+            return
+        self.do_GET()
+
+    def send_body(self, body: bytes, content_type: str, status: int = 200, headers: dict = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def send_pdf(self):
+        state = self.server_state
+        with state.lock:
+            data, etag = state.pdf_bytes, state.etag
+
+        if data is None:
+            self.send_error(404, "No successful build yet")
+            return
+
+        quoted_etag = f'"{etag}"'
+        headers = {
+            'ETag': quoted_etag,
+            # Always revalidate; unchanged PDFs are answered with 304
+            'Cache-Control': 'no-cache',
+            'Accept-Ranges': 'bytes',
+        }
+
+        if self.headers.get('If-None-Match') == quoted_etag:
+            self.send_response(304)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        byte_range = self.parse_range(self.headers.get('Range'), len(data))
+        if_range = self.headers.get('If-Range')
+        if byte_range and (if_range is None or if_range == quoted_etag):
+            start, end = byte_range
+            headers['Content-Range'] = f"bytes {start}-{end}/{len(data)}"
+            self.send_body(data[start:end + 1], 'application/pdf', 206, headers)
+        elif byte_range is False:
+            self.send_response(416)
+            self.send_header('Content-Range', f"bytes */{len(data)}")
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        else:
+            self.send_body(data, 'application/pdf', 200, headers)
+
+    def send_chapter_index(self):
+        with self.server_state.lock:
+            names = sorted(self.server_state.chapters)
+        items = ''.join(f'<li><a href="/html/{name}.html">{name}</a></li>' for name in names)
+        page = f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>Chapters</title></head>" \
+               f"<body><ul>{items}</ul></body></html>"
+        self.send_body(page.encode('utf-8'), 'text/html; charset=utf-8')
+
+    def send_chapter(self, file_name: str):
+        name = file_name[:-len('.html')] if file_name.endswith('.html') else file_name
+        with self.server_state.lock:
+            chapter = self.server_state.chapters.get(name)
+        if chapter is None:
+            self.send_error(404, "Chapter not rendered yet")
+            return
+
+        data, etag = chapter
+        script = (CHAPTER_RELOAD_SCRIPT % json.dumps(name)).encode('utf-8')
+        if b'</body>' in data:
+            data = data.replace(b'</body>', script + b'</body>', 1)
+        else:
+            data += script
+        self.send_body(data, 'text/html; charset=utf-8', headers={'Cache-Control': 'no-cache'})
+
+    def send_media(self, rel_path: str):
+        media_dir = self.server_state.media_dir
+        if media_dir is None:
+            self.send_error(404)
+            return
+        file_path = (media_dir / rel_path).resolve()
+        if not file_path.is_relative_to(media_dir) or not file_path.is_file():
+            self.send_error(404)
+            return
+        content_type = mimetypes.guess_type(file_path.name)[0] or 'application/octet-stream'
+        self.send_body(file_path.read_bytes(), content_type)
+
+    @staticmethod
+    def parse_range(header: str, size: int):
+        """Parse a single 'bytes=' range: (start, end), None if absent, False if unsatisfiable"""
+        if not header or not header.startswith('bytes=') or ',' in header:
+            return None
+        start_text, _, end_text = header[len('bytes='):].strip().partition('-')
+        try:
+            if start_text:
+                start = int(start_text)
+                end = int(end_text) if end_text else size - 1
+            else:
+                # Suffix range: last N bytes
+                start = max(0, size - int(end_text))
+                end = size - 1
+        except ValueError:
+            return None
+        end = min(end, size - 1)
+        if start > end:
+            return False
+        return start, end
+
+    def send_events(self):
+        state = self.server_state
+        client = state.subscribe()
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Connection', 'keep-alive')
+            self.end_headers()
+
+            # Tell a new viewer about the current build right away
+            with state.lock:
+                current = state.build_info
+            if current:
+                self.write_event('reload', json.dumps(dict(current, changed=False)))
+
+            while True:
+                try:
+                    event, message = client.get(timeout=KEEPALIVE_SECONDS)
+                    self.write_event(event, message)
+                except queue.Empty:
+                    self.wfile.write(b": keep-alive\n\n")
+                    self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            state.unsubscribe(client)
+
+    def write_event(self, event: str, data: str):
+        self.wfile.write(f"event: {event}\ndata: {data}\n\n".encode('utf-8'))
+        self.wfile.flush()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Chat completion backends for the translator
+
+A backend has one coroutine, complete(messages, model, temperature,
+max_tokens), returning an OpenAI-style response (choices[0].message.content,
+usage.prompt_tokens/completion_tokens). Errors carry status_code (and
+response.headers) where there is one, so TranslationEngine can retry them.
+
+Backends (TRANSLATION_BACKEND):
+    groq     Groq API, needs GROQ_API_KEY (default)
+    openai   any OpenAI-compatible HTTP endpoint (llama.cpp, vLLM, Ollama, ...)
+             TRANSLATION_BASE_URL (default http://localhost:8000/v1),
+             TRANSLATION_API_KEY (optional)
+    fake     offline and deterministic: echoes the text to translate, for
+             benchmarks and CI. TRANSLATION_FAKE_LATENCY (seconds per request,
+             default 0.05), TRANSLATION_FAKE_ERROR_RATE (share of requests
+             failing with 429/503, default 0), TRANSLATION_FAKE_SEED
+
+Translation memory entries are keyed by backend and model, so echoes of the
+fake backend are never served to a real run.
+"""
+
+import os
+import json
+import random
+import asyncio
+import hashlib
+import urllib.error
+import urllib.request
+from types import SimpleNamespace
+
+from translation_engine import estimate_tokens
+
+BACKENDS = ('groq', 'openai', 'fake')
+
+BASE_URL = os.getenv("TRANSLATION_BASE_URL", "http://localhost:8000/v1")
+REQUEST_TIMEOUT_SECONDS = 300
+
+
+class BackendError(Exception):
+    """HTTP error of a backend (status_code and response.headers like the provider SDKs)"""
+
+    def __init__(self, message: str, status_code: int = None, headers: dict = None):
+        super().__init__(message)
+        self.status_code = status_code
+        # Lower-case names, as retry_delay() looks up 'retry-after'
+        self.response = SimpleNamespace(headers={name.lower(): value for name, value in (headers or {}).items()})
+
+
+def make_response(content: str, prompt_tokens: int, completion_tokens: int, model: str):
+    """OpenAI-style response object"""
+    return SimpleNamespace(
+        model=model,
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                              total_tokens=prompt_tokens + completion_tokens)
+    )
+
+
+class GroqBackend:
+    """Groq API (the groq package is only needed for this backend)"""
+
+    name = 'groq'  # part of the translation memory key
+
+    def __init__(self, api_key: str):
+        from groq import AsyncGroq
+        self.client = AsyncGroq(api_key=api_key)
+
+    async def complete(self, messages: list, model: str, temperature: float, max_tokens: int):
+        return await self.client.chat.completions.create(
+            messages=messages,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+
+
+class OpenAICompatibleBackend:
+    """POST {base_url}/chat/completions, for local or self-hosted model servers"""
+
+    name = 'openai'  # part of the translation memory key
+
+    def __init__(self, base_url: str = None, api_key: str = None, timeout: float = REQUEST_TIMEOUT_SECONDS):
+        self.url = (base_url or BASE_URL).rstrip('/') + '/chat/completions'
+        self.api_key = api_key
+        self.timeout = timeout
+
+    def _post(self, payload: dict) -> dict:
+        headers = {'Content-Type': 'application/json'}
+        if self.api_key:
+            headers['Authorization'] = f"Bearer {self.api_key}"
+        request = urllib.request.Request(self.url, json.dumps(payload).encode('utf-8'), headers)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            body = e.read().decode('utf-8', errors='replace')[:500]
+            raise BackendError(f"HTTP {e.code} from {self.url}: {body}", e.code, e.headers) from e
+        except urllib.error.URLError as e:
+            # Server not up (yet): retryable like any connection error
+            raise ConnectionError(f"{self.url}: {e.reason}") from e
+
+    async def complete(self, messages: list, model: str, temperature: float, max_tokens: int):
+        data = await asyncio.to_thread(self._post, {
+            'model': model,
+            'messages': messages,
+            'temperature': temperature,
+            'max_tokens': max_tokens,
+        })
+        try:
+            content = data['choices'][0]['message']['content']
+        except (KeyError, IndexError, TypeError) as e:
+            raise BackendError(f"Unexpected response from {self.url}: {str(data)[:200]}") from e
+        usage = data.get('usage') or {}
+        prompt = ''.join(message['content'] for message in messages)
+        return make_response(content,
+                             usage.get('prompt_tokens', estimate_tokens(prompt)),
+                             usage.get('completion_tokens', estimate_tokens(content or '')),
+                             data.get('model', model))
+
+
+class FakeBackend:
+    """Deterministic offline backend: returns the text to translate unchanged
+
+    The text is the last user message without a leading instruction line
+    ending in ':' (so segment markers, placeholders and JSON survive).
+    Latency and injected errors (429 or 503, retryable) are reproducible
+    for a given seed and request.
+    """
+
+    name = 'fake'  # part of the translation memory key
+
+    def __init__(self, latency: float = None, error_rate: float = None, seed: int = None):
+        self.latency = float(os.getenv("TRANSLATION_FAKE_LATENCY", "0.05")) if latency is None else latency
+        self.error_rate = float(os.getenv("TRANSLATION_FAKE_ERROR_RATE", "0")) if error_rate is None else error_rate
+        self.seed = int(os.getenv("TRANSLATION_FAKE_SEED", "0")) if seed is None else seed
+        self.attempts = {}  # {request hash: attempts so far}
+        self.requests = 0
+
+    async def complete(self, messages: list, model: str, temperature: float, max_tokens: int):
+        text = next(message['content'] for message in reversed(messages) if message['role'] == 'user')
+        instruction, _, rest = text.partition('\n\n')
+        if rest and '\n' not in instruction and instruction.rstrip().endswith(':'):
+            text = rest
+
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        attempt = self.attempts.get(digest, 0)
+        self.attempts[digest] = attempt + 1
+        self.requests += 1
+        rng = random.Random(f"{self.seed}:{digest}:{attempt}")
+
+        # Latency grows a little with the request size, jittered by ±50%
+        await asyncio.sleep(self.latency * (1 + estimate_tokens(text) / 1000) * rng.uniform(0.5, 1.5))
+        if rng.random() < self.error_rate:
+            status = rng.choice((429, 503))
+            raise BackendError(f"Injected error {status}", status)
+
+        prompt = ''.join(message['content'] for message in messages)
+        return make_response(text, estimate_tokens(prompt), estimate_tokens(text), model)
+
+
+def backend_name(name: str = None) -> str:
+    name = (name or os.getenv("TRANSLATION_BACKEND", "groq")).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown translation backend '{name}' (expected one of {', '.join(BACKENDS)})")
+    return name
+
+
+def backend_available(api_key: str = None, name: str = None) -> bool:
+    """Whether the backend can run (only Groq needs an API key)"""
+    return backend_name(name) != 'groq' or bool(api_key)
+
+
+def create_backend(api_key: str = None, name: str = None):
+    """Backend selected by name or TRANSLATION_BACKEND"""
+    name = backend_name(name)
+    if name == 'groq':
+        return GroqBackend(api_key)
+    if name == 'openai':
+        # Never send the Groq key to another server
+        return OpenAICompatibleBackend(api_key=os.getenv("TRANSLATION_API_KEY"))
+    return FakeBackend()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Concurrent, rate-limited chat completion calls for the translator
+
+Requests run concurrently up to a limit and pass through a token bucket
+matched to the provider quotas (requests and tokens per minute). Rate limit
+(429) and server (5xx) errors, timeouts and connection errors are retried
+with exponential backoff and jitter; anything else, or running out of
+retries, raises TranslationFailed. Every request is reported to the engine's
+telemetry object, or the one of the calling translator (see translation_telemetry.py).
+
+Configuration (environment):
+    TRANSLATION_CONCURRENCY   parallel requests (default 4)
+    TRANSLATION_RPM           requests per minute (default 30)
+    TRANSLATION_TPM           tokens per minute (default 60000)
+    TRANSLATION_MAX_RETRIES   retries per request (default 5)
+"""
+
+import os
+import time
+import random
+import asyncio
+
+from translation_telemetry import current_telemetry
+
+CONCURRENCY = int(os.getenv("TRANSLATION_CONCURRENCY", "4"))
+REQUESTS_PER_MINUTE = int(os.getenv("TRANSLATION_RPM", "30"))
+TOKENS_PER_MINUTE = int(os.getenv("TRANSLATION_TPM", "60000"))
+MAX_RETRIES = int(os.getenv("TRANSLATION_MAX_RETRIES", "5"))
+
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+# HTTP statuses worth retrying
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class TranslationFailed(Exception):
+    """A translation request failed for good (non-retryable error or retries exhausted)"""
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token)"""
+    return len(text) // 4 + 1
+
+
+def retry_delay(error: Exception):
+    """Seconds to wait before retrying error, or None if it must not be retried"""
+    status = getattr(error, 'status_code', None)
+    retryable = status in RETRY_STATUSES if status is not None else \
+        isinstance(error, (TimeoutError, ConnectionError)) or type(error).__name__ in (
+            'APIConnectionError', 'APITimeoutError')
+    if not retryable:
+        return None
+
+    # Honour the provider's Retry-After when it sends one
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class TokenBucket:
+    """Refills capacity units per minute; acquire(n) waits until n units are available"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = max(1, per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: int) -> float:
+        """Seconds until amount units are available (0 = take them now)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: int):
+        self.tokens -= min(amount, self.capacity)
+
+
+class TranslationEngine:
+    """Runs chat completions concurrently within the provider's rate limits"""
+
+    def __init__(self, backend, concurrency: int = None, requests_per_minute: int = None,
+                 tokens_per_minute: int = None, max_retries: int = None, telemetry=None):
+        self.backend = backend  # see translation_backends.py
+        self.concurrency = max(1, concurrency or CONCURRENCY)
+        self.requests = TokenBucket(requests_per_minute or REQUESTS_PER_MINUTE)
+        self.tokens = TokenBucket(tokens_per_minute or TOKENS_PER_MINUTE)
+        self.max_retries = MAX_RETRIES if max_retries is None else max_retries
+        self.telemetry = telemetry
+        self._loop = None
+
+    def _bind(self):
+        """asyncio primitives belong to one event loop; recreate them for a new one"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._bucket_lock = asyncio.Lock()
+
+    async def _acquire(self, tokens: int):
+        # One waiter at a time keeps the buckets first come, first served
+        async with self._bucket_lock:
+            while True:
+                delay = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                if delay <= 0:
+                    self.requests.take(1)
+                    self.tokens.take(tokens)
+                    return
+                await asyncio.sleep(delay)
+
+    def _record(self, model: str, started: float, retries: int, usage=None, failed: bool = False):
+        """Report a finished request (latency of its last attempt) to the telemetry"""
+        telemetry = self.telemetry or current_telemetry.get()
+        if telemetry:
+            telemetry.request(model, time.monotonic() - started, retries, usage, failed)
+
+    async def complete(self, messages: list, model: str, max_tokens: int, temperature: float = 0.3):
+        """One chat completion with rate limiting and retries; returns the response
+
+        Raises TranslationFailed when the request cannot succeed.
+        """
+        self._bind()
+        prompt = ''.join(message['content'] for message in messages)
+        # Input plus an output of about the same size
+        budget = min(2 * estimate_tokens(prompt), estimate_tokens(prompt) + max_tokens)
+
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                await self._acquire(budget)
+                started = time.monotonic()
+                try:
+                    response = await self.backend.complete(
+                        messages=messages,
+                        model=model,
+                        temperature=temperature,
+                        max_tokens=max_tokens
+                    )
+                    self._record(model, started, attempt, getattr(response, 'usage', None))
+                    return response
+                except Exception as e:
+                    delay = retry_delay(e)
+                    if delay is None or attempt >= self.max_retries:
+                        self._record(model, started, attempt, failed=True)
+                    if delay is None:
+                        raise TranslationFailed(f"{type(e).__name__}: {e}") from e
+                    if attempt >= self.max_retries:
+                        raise TranslationFailed(f"Gave up after {attempt + 1} attempts: {e}") from e
+                    error = e
+
+            # Exponential backoff with full jitter, outside the concurrency slot
+            backoff = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+            attempt += 1
+            print(f"    ↻ Retry {attempt}/{self.max_retries} after {type(error).__name__}")
+            await asyncio.sleep(max(delay, backoff))
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Placeholder masking for translation requests
+
+Spans the model must not touch are replaced by compact placeholders ({{0}},
+{{1}}, ...) before a request and restored afterwards:
+    fenced code and code spans, display and inline math, citation keys and
+    cross-references (@key, @fig:label), pandoc attributes ({#id}, {=latex}),
+    non-text LaTeX commands (\\ref{...}, \\begin{...}, \\newpage),
+    link/image targets, URLs, HTML tags and comments, and any {{...}} already
+    in the source (so it cannot be mistaken for a placeholder).
+Text inside brackets stays translatable ([see @key, p. 3] keeps "see").
+unmask() verifies every placeholder came back exactly once.
+"""
+
+import re
+
+from translation_engine import TranslationFailed
+
+PROTECTED_RE = re.compile(
+    r"(?ms:^(`{3,}|~{3,}).*?^\1[ \t]*$)"                       # fenced code
+    r"|`+[^`\n]+`+(?:\{[^}\n]*\})?"                              # code spans, raw inline {=latex}
+    r"|\$\$.+?\$\$"                                              # display math
+    r"|(?<![\\$])\$(?!\s)[^$\n]+?(?<![\s\\])\$(?!\d)"           # inline math
+    r"|\{\{[^\n]*?\}\}"                                          # literal {{...}} (templates, placeholder look-alikes)
+    r"|<!--.*?-->"                                               # HTML comments
+    r"|</?[a-zA-Z][^>\n]*>"                                      # HTML tags
+    r"|\\(?:begin|end|label|ref|eqref|autoref|cite\w*|includegraphics|input|include|url|href)\*?"
+    r"(?:\[[^\]\n]*\])?(?:\{[^{}\n]*\})?"                        # LaTeX commands without text
+    r"|\\[a-zA-Z]+\*?(?:\[[^\]\n]*\])?"                          # other LaTeX commands (argument stays)
+    r"|(?<![\w@])[-+]?@\w(?:[\w:.#$%&+?<>~/-]*\w)?"              # citation keys, @fig: references
+    r"|\{[#.=-][^}\n]*\}"                                        # pandoc attributes
+    r"|(?<=\])\([^)\s]*(?:\s+\"[^\"]*\")?\)"                     # link and image targets
+    r"|<?https?://[^\s)>\]]+>?",                                 # bare URLs
+    re.DOTALL
+)
+
+PLACEHOLDER = "{{{{{}}}}}"
+PLACEHOLDER_RE = re.compile(r"\{\{\s*(\d+)\s*\}\}")
+
+
+class MaskingError(TranslationFailed):
+    """A placeholder was lost, duplicated or invented by the model"""
+
+
+def mask(text: str, start: int = 0) -> tuple:
+    """Replace protected spans with placeholders numbered from start
+
+    Returns (masked text, {number: original span}).
+    """
+    spans = {}
+
+    def replace(match):
+        number = start + len(spans)
+        spans[number] = match.group(0)
+        return PLACEHOLDER.format(number)
+
+    return PROTECTED_RE.sub(replace, text), spans
+
+
+def unmask(text: str, spans: dict) -> str:
+    """Restore placeholders; raises MaskingError unless each one appears exactly once"""
+    found = [int(number) for number in PLACEHOLDER_RE.findall(text)]
+    if sorted(found) != sorted(spans):
+        missing = sorted(set(spans) - set(found))
+        extra = sorted(set(found) - set(spans)) + sorted({n for n in found if found.count(n) > 1})
+        raise MaskingError(f"Placeholders changed by the model (missing {missing}, unexpected {extra})")
+    return PLACEHOLDER_RE.sub(lambda match: spans[int(match.group(1))], text)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Translation memory for ThesisTranslator
+Stores translated segments (paragraphs) in a local SQLite database, keyed by
+a hash of the normalized source segment, the language pair, the model and
+the prompt version, so rebuilds only translate new or changed paragraphs.
+
+Usage:
+    python translation_memory.py stats [database]
+"""
+
+import os
+import re
+import sys
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent.parent
+
+# Default location: next to the content it was built from
+MEMORY_FILE = Path(os.getenv("TRANSLATION_MEMORY", ROOT_DIR / "content" / ".translation-memory.sqlite"))
+
+_SPACES_RE = re.compile(r"[ \t]+")
+
+
+def normalize_segment(text: str) -> str:
+    """Whitespace-insensitive form of a segment (line structure is kept)"""
+    lines = [_SPACES_RE.sub(' ', line).strip() for line in text.strip().splitlines()]
+    return '\n'.join(lines)
+
+
+def segment_key(text: str, pair: str, model: str, prompt_version: int) -> str:
+    data = f"{pair}\0{model}\0{prompt_version}\0{normalize_segment(text)}"
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class TranslationMemory:
+    """SQLite store {segment key: translation}, safe to share between threads"""
+
+    def __init__(self, path: Path = None):
+        self.path = Path(path) if path else MEMORY_FILE
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self.lock:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS segments (
+                    key TEXT PRIMARY KEY,
+                    pair TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    prompt_version INTEGER NOT NULL,
+                    source TEXT NOT NULL,
+                    translation TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    used REAL NOT NULL
+                )
+            """)
+            self.db.commit()
+
+    def get(self, text: str, pair: str, model: str, prompt_version: int) -> str:
+        """Cached translation of text, or None"""
+        key = segment_key(text, pair, model, prompt_version)
+        with self.lock:
+            row = self.db.execute("SELECT translation FROM segments WHERE key = ?", (key,)).fetchone()
+            if row:
+                self.db.execute("UPDATE segments SET used = ? WHERE key = ?", (time.time(), key))
+                self.db.commit()
+        return row[0] if row else None
+
+    def put(self, text: str, translation: str, pair: str, model: str, prompt_version: int):
+        key = segment_key(text, pair, model, prompt_version)
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO segments VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, pair, model, prompt_version, normalize_segment(text), translation, now, now)
+            )
+            self.db.commit()
+
+    def stats(self) -> dict:
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT pair, model, prompt_version, COUNT(*) FROM segments GROUP BY pair, model, prompt_version"
+            ).fetchall()
+        return {f"{pair} {model} v{version}": count for pair, model, version, count in rows}
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != 'stats':
+        print(__doc__)
+        sys.exit(1)
+
+    memory = TranslationMemory(Path(sys.argv[2]) if len(sys.argv) > 2 else None)
+    for name, count in memory.stats().items():
+        print(f"{count:8}  {name}")
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Translation telemetry: tokens, latency, retries and cache hits per file and per run
+
+TranslationEngine records every request (tokens from response.usage,
+latency, retries, model) and ThesisTranslator records translation memory
+hits and misses. Each record is attributed to the file being translated
+(current_file, a context variable, so concurrent files do not mix).
+
+The run report is written as JSON next to the output directory
+(content/text-fr-translation-report.json). With TRANSLATION_PRICE_INPUT and
+TRANSLATION_PRICE_OUTPUT (USD per million tokens) it includes a cost estimate.
+
+Usage:
+    python translation_telemetry.py [report.json]     # print a summary
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+import contextvars
+from pathlib import Path
+
+PRICE_INPUT = float(os.getenv("TRANSLATION_PRICE_INPUT", "0"))
+PRICE_OUTPUT = float(os.getenv("TRANSLATION_PRICE_OUTPUT", "0"))
+
+# File the running coroutine translates, and the telemetry of its target language
+# (set by ThesisTranslator.translate_file; translators can share one engine)
+current_file = contextvars.ContextVar('current_file', default='(none)')
+current_telemetry = contextvars.ContextVar('current_telemetry', default=None)
+
+COUNTERS = ('requests', 'failed_requests', 'retries', 'prompt_tokens', 'completion_tokens',
+            'request_seconds', 'cache_hits', 'cache_misses', 'failed_segments')
+
+
+def report_path(output_dir: Path) -> Path:
+    """Report location for a translation output directory (text-fr → text-fr-translation-report.json)"""
+    output_dir = Path(output_dir)
+    return output_dir.parent / f"{output_dir.name}-translation-report.json"
+
+
+def cost(stats: dict) -> float:
+    return (stats['prompt_tokens'] * PRICE_INPUT + stats['completion_tokens'] * PRICE_OUTPUT) / 1e6
+
+
+class TranslationTelemetry:
+    """Aggregates translation metrics per file; thread-safe"""
+
+    def __init__(self, **run_info):
+        self.run_info = run_info  # backend, model, concurrency, ... (copied into the report)
+        self.started = time.time()
+        self.files = {}
+        self.lock = threading.Lock()
+
+    def _file(self, name: str = None) -> dict:
+        name = name or current_file.get()
+        if name not in self.files:
+            self.files[name] = dict.fromkeys(COUNTERS, 0)
+            self.files[name].update(max_latency=0.0, seconds=0.0, models=[])
+        return self.files[name]
+
+    def request(self, model: str, latency: float, retries: int, usage=None, failed: bool = False):
+        """One API request (after its retries); usage is response.usage or None"""
+        with self.lock:
+            stats = self._file()
+            stats['requests'] += 1
+            stats['failed_requests'] += int(failed)
+            stats['retries'] += retries
+            stats['prompt_tokens'] += getattr(usage, 'prompt_tokens', 0) or 0
+            stats['completion_tokens'] += getattr(usage, 'completion_tokens', 0) or 0
+            stats['request_seconds'] += latency
+            stats['max_latency'] = max(stats['max_latency'], latency)
+            if model not in stats['models']:
+                stats['models'].append(model)
+
+    def cache(self, hits: int, misses: int):
+        with self.lock:
+            stats = self._file()
+            stats['cache_hits'] += hits
+            stats['cache_misses'] += misses
+
+    def segments_failed(self, count: int):
+        with self.lock:
+            self._file()['failed_segments'] += count
+
+    def file_done(self, name: str, seconds: float):
+        with self.lock:
+            self._file(name)['seconds'] = round(seconds, 3)
+
+    def report(self) -> dict:
+        with self.lock:
+            files = {name: dict(stats, models=list(stats['models'])) for name, stats in self.files.items()}
+        totals = {counter: sum(stats[counter] for stats in files.values()) for counter in COUNTERS}
+        totals['max_latency'] = max((stats['max_latency'] for stats in files.values()), default=0.0)
+        for stats in list(files.values()) + [totals]:
+            stats['request_seconds'] = round(stats['request_seconds'], 3)
+            stats['cost_usd'] = round(cost(stats), 6)
+        return {
+            'run': dict(self.run_info, started=self.started, seconds=round(time.time() - self.started, 3)),
+            'totals': totals,
+            'files': files,
+        }
+
+    def write(self, path: Path) -> dict:
+        """Write the report atomically; returns it"""
+        report = self.report()
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_name(path.name + '.tmp')
+        temp.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+        temp.replace(path)
+        return report
+
+
+def summarize(report: dict, slowest: int = 3) -> list:
+    """Summary lines of a report (totals and the slowest files)"""
+    totals = report['totals']
+    run = report['run']
+    lookups = totals['cache_hits'] + totals['cache_misses']
+    hit_rate = f"{100 * totals['cache_hits'] / lookups:.0f}%" if lookups else "n/a"
+    lines = [
+        f"{run.get('backend', '?')} / {run.get('model', '?')}: {totals['requests']} request(s) in {run['seconds']:.1f}s, "
+        f"{totals['retries']} retries, {totals['failed_requests']} failed",
+        f"Tokens: {totals['prompt_tokens']} in, {totals['completion_tokens']} out"
+        + (f" (≈ ${totals['cost_usd']:.4f})" if totals['cost_usd'] else ""),
+        f"Translation memory: {totals['cache_hits']} hit(s), {totals['cache_misses']} miss(es) ({hit_rate})",
+    ]
+    if totals['failed_segments']:
+        lines.append(f"Segments not translated: {totals['failed_segments']}")
+    files = sorted(report['files'].items(), key=lambda item: item[1]['seconds'], reverse=True)
+    for name, stats in files[:slowest]:
+        if stats['requests']:
+            lines.append(f"  {name}: {stats['seconds']:.1f}s, {stats['requests']} request(s), "
+                         f"{stats['prompt_tokens'] + stats['completion_tokens']} tokens, "
+                         f"slowest request {stats['max_latency']:.1f}s")
+    return lines
+
+
+if __name__ == "__main__":
+    root_dir = Path(__file__).parent.parent.parent
+    path = Path(sys.argv[1]) if len(sys.argv) > 1 else report_path(root_dir / "content" / "text-fr")
+    if not path.exists():
+        print(f"No translation report: {path}")
+        sys.exit(1)
+    for line in summarize(json.loads(path.read_text(encoding='utf-8'))):
+        print(line)
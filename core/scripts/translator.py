@@ -1,181 +1,420 @@
 #!/usr/bin/env python3
 """
-Translation module for thesis using Groq API
-Translates Markdown content from Portuguese to French
+Translation module for thesis using Groq API (or another backend, see translation_backends.py)
+Translates Markdown content from the source language (Portuguese) to each
+target language (French by default, see languages.py)
+
+Chapters are split into structure-aware segments (see markdown_chunker.py)
+and looked up in a translation memory (see translation_memory.py) first;
+only new or changed segments are sent to the API, packed into chunks. Requests run
+concurrently within the provider's rate limits (see translation_engine.py),
+and text that could not be translated is reported as an error, never
+silently shipped untranslated. Citations, math, code, LaTeX and URLs are
+masked with placeholders before a request (see translation_masking.py) and
+a response that lost one is rejected. Tokens, latency, retries and memory
+hits are written to a report next to the output (see translation_telemetry.py).
+
+Runs are resumable: every chunk is stored in the translation memory as
+soon as it lands, so a run restarted after a crash or quota error only
+sends what is still missing. While a chapter is in progress, its partial
+translation (source text where nothing landed yet) is kept in
+<output>.partial; outputs are always replaced atomically.
 """
 
 import os
 import re
+import json
+import time
+import asyncio
+from string import Template
 from pathlib import Path
-from groq import Groq
 import yaml
 from dotenv import load_dotenv
+from translation_memory import TranslationMemory
+from translation_engine import TranslationEngine, TranslationFailed, estimate_tokens
+from translation_backends import backend_available, backend_name, create_backend
+from translation_telemetry import TranslationTelemetry, current_file, current_telemetry, report_path
+from translation_masking import MaskingError, mask, unmask
+from markdown_chunker import CHUNK_TOKENS, split_segments, needs_translation, with_whitespace_of, pack_chunks
+from languages import language, language_matrix
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Bump when the prompts below change (invalidates the translation memory)
+PROMPT_VERSION = 3
+
+# Separates the segments of a multi-segment request
+SEGMENT_MARKER = "<<<{}>>>"
+SEGMENT_MARKER_RE = re.compile(r"^<<<(\d+)>>>[ \t]*$", re.MULTILINE)
+
+# Prompt templates ($source, $target: language names)
+SYSTEM_PROMPT = Template("""You are a professional academic translator specializing in translating $source academic texts to $target.
+
+IMPORTANT RULES:
+1. Translate ONLY the text content from $source to $target
+2. PRESERVE ALL Markdown formatting: **bold**, *italic*, headers (#), lists (-, *), etc.
+3. Placeholders such as {{0}}, {{1}} stand for citations, math, code, LaTeX and URLs:
+   copy every placeholder unchanged, exactly once, where it belongs in the translated sentence
+4. Keep academic/scientific terminology accurate
+5. Maintain the same paragraph structure
+6. Lines of the form <<<n>>> separate independent segments: copy each of them unchanged on its own line
+
+Return ONLY the translated text without explanations.""")
+USER_PROMPT = Template("Translate this academic text from $source to $target:\n\n")
+
+# Title page fields of metadata.yaml, translated together in one request
+METADATA_FIELDS = [
+    'title', 'subtitle', 'titleA', 'titleB',
+    'university', 'department', 'group',
+    'degree', 'author', 'supervisor',
+    'examiner', 'birthplace', 'abstract'
+]
+# Fields copied as they are (names), comma-separated in TRANSLATION_KEEP_FIELDS
+KEEP_FIELDS = [field.strip() for field in
+               os.getenv("TRANSLATION_KEEP_FIELDS", "author,supervisor,examiner").split(',') if field.strip()]
+
+METADATA_PROMPT = Template("""You are a professional academic translator. You receive a JSON object with the
+title page fields of a $source thesis (title, university, degree, abstract, ...).
+
+Translate every value from $source to $target and return a JSON object with exactly the same keys.
+Placeholders such as {{0}} must be copied unchanged, exactly once.
+Return ONLY the JSON object, without explanations or code fences.""")
+
+
+def write_atomic(path: Path, text: str):
+    """Write text to path via a temp file, so readers never see a half-written file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = path.with_name(f".{path.name}.tmp")
+    tmp_file.write_text(text, encoding='utf-8')
+    os.replace(tmp_file, path)
+
 
 class ThesisTranslator:
-    """Translates thesis content from Portuguese to French using Groq API"""
+    """Translates thesis content from one language to another using Groq API (or TRANSLATION_BACKEND)
 
-    def __init__(self, api_key: str):
-        self.client = Groq(api_key=api_key)
+    source and target are languages.language() dicts (default Portuguese → French).
+    Translators for several targets can share one engine (and its rate limits).
+    """
+
+    def __init__(self, api_key: str, memory: TranslationMemory = None, engine: TranslationEngine = None,
+                 telemetry: TranslationTelemetry = None, source: dict = None, target: dict = None):
+        self.telemetry = telemetry
+        self.engine = engine or TranslationEngine(create_backend(api_key), telemetry=telemetry)
         # Get model from environment variable or use default
         self.model = os.getenv("TRANSLATION_MODEL", "moonshotai/kimi-k2-instruct-0905")
-
-    def translate_markdown(self, content: str) -> str:
+        self.memory = memory
+        # Memory entries are per backend too: the fake backend's echoes must never serve a real run
+        self.memory_model = f"{self.engine.backend.name}:{self.model}"
+
+        self.source = source or language('pt')
+        self.target = target or language('fr')
+        names = {'source': self.source['name'], 'target': self.target['name']}
+        self.system_prompt = SYSTEM_PROMPT.substitute(names)
+        self.user_prompt = USER_PROMPT.substitute(names)
+        self.metadata_prompt = METADATA_PROMPT.substitute(names)
+        # Memory keys; metadata fields are cached apart from paragraphs (different prompt)
+        self.pair = f"{self.source['code']}-{self.target['code']}"
+        self.metadata_pair = self.pair + "/metadata"
+
+    async def translate_markdown(self, content: str, partial_path: Path = None) -> str:
         """
         Translate markdown content preserving formatting and citations
 
+        Paragraphs found in the translation memory are reused; the others are
+        translated (several per request, requests in parallel) and stored
+        as each chunk lands. Raises TranslationFailed if any paragraph could
+        not be translated (the ones that succeeded are still stored in the memory).
+
         Args:
-            content: Markdown text in Portuguese
+            content: Markdown text in the source language
+            partial_path: Rewritten (atomically) with the translation so far after every chunk
 
         Returns:
-            Translated markdown text in French
+            Translated markdown text in the target language
         """
         # Skip if content is too short
         if len(content.strip()) < 10:
             return content
 
-        # System prompt for translation
-        system_prompt = """You are a professional academic translator specializing in translating Portuguese academic texts to French.
+        segments = split_segments(content, CHUNK_TOKENS)
+        results = [segment for segment, _ in segments]
+
+        # {stripped source text: [segment indexes]} - identical paragraphs are translated once
+        missing = {}
+        cached = 0
+        for i, (segment, _) in enumerate(segments):
+            # Nothing but math, code or references left once masked: keep as is
+            if not needs_translation(mask(segment)[0]):
+                continue
+            text = segment.strip()
+            translation = self.memory.get(text, self.pair, self.memory_model, PROMPT_VERSION) if self.memory else None
+            if translation is not None:
+                results[i] = with_whitespace_of(segment, translation)
+                cached += 1
+            else:
+                missing.setdefault(text, []).append(i)
+
+        def document():
+            return ''.join(result + separator for result, (_, separator) in zip(results, segments))
+
+        def chunk_landed(texts, translations):
+            # Checkpoint: a resumed run finds these in the memory
+            for text, translation in zip(texts, translations):
+                if isinstance(translation, TranslationFailed):
+                    continue
+                if self.memory:
+                    self.memory.put(text, translation, self.pair, self.memory_model, PROMPT_VERSION)
+                for i in missing[text]:
+                    results[i] = with_whitespace_of(segments[i][0], translation)
+            if partial_path:
+                write_atomic(partial_path, document())
+
+        texts = list(missing)
+        translations = await self._translate_segments(texts, chunk_landed)
+        failures = [translation for translation in translations if isinstance(translation, TranslationFailed)]
+
+        if self.memory:
+            print(f"    {cached} paragraph(s) from memory, {len(texts)} translated")
+        if self.telemetry:
+            self.telemetry.cache(cached, len(texts))
+            self.telemetry.segments_failed(len(failures))
+
+        if failures:
+            raise TranslationFailed(f"{len(failures)} of {len(texts)} paragraph(s) not translated: {failures[0]}")
+
+        return document()
+
+    async def _translate_segments(self, texts: list, on_chunk=None) -> list:
+        """Translate segments, packed into chunks within the token budget, chunks in parallel
+
+        on_chunk(chunk texts, translations) is called as each chunk lands.
+        Returns one translation per text (a TranslationFailed where it failed).
+        """
+        async def translate_chunk(batch):
+            translations = await self._translate_batch(batch)
+            if on_chunk:
+                on_chunk(batch, translations)
+            return translations
 
-IMPORTANT RULES:
-1. Translate ONLY the text content from Portuguese to French
-2. PRESERVE ALL Markdown formatting: **bold**, *italic*, headers (#), lists (-, *), etc.
-3. PRESERVE ALL citations exactly as they are: [@author2023], [@fig:label], etc.
-4. PRESERVE ALL LaTeX commands: \\todo{}, \\newpage, etc.
-5. PRESERVE ALL code blocks and their content
-6. PRESERVE ALL URLs and links
-7. Keep academic/scientific terminology accurate
-8. Maintain the same paragraph structure
+        batches = pack_chunks(texts, CHUNK_TOKENS)
+        results = await asyncio.gather(*(translate_chunk(batch) for batch in batches))
+        return [translation for batch_results in results for translation in batch_results]
 
-Return ONLY the translated text without explanations."""
+    async def _translate_batch(self, texts: list) -> list:
+        """One request for several segments, split back at the segment markers
 
+        Placeholders are numbered across the whole request, so a placeholder
+        the model moved to another segment is caught when unmasking.
+        """
+        masked = []
+        for text in texts:
+            masked_text, spans = mask(text, start=sum(len(spans) for _, spans in masked))
+            masked.append((masked_text, spans))
+
+        if len(texts) == 1:
+            return [await self._try_translate(*masked[0])]
+
+        request = '\n\n'.join(f"{SEGMENT_MARKER.format(i)}\n{text}" for i, (text, _) in enumerate(masked))
+        response = await self._try_translate(request, None)
+        if isinstance(response, TranslationFailed):
+            return [response] * len(texts)
+
+        parts = SEGMENT_MARKER_RE.split(response)
+        # ['', '0', text0, '1', text1, ...] when every marker survived in order
+        if parts[1::2] != [str(i) for i in range(len(texts))] or parts[0].strip():
+            # Markers lost: fall back to one request per segment
+            return list(await asyncio.gather(*(self._try_translate(*item) for item in masked)))
+
+        results = []
+        retry = []
+        for i, (part, (_, spans)) in enumerate(zip(parts[2::2], masked)):
+            try:
+                results.append(unmask(part.strip(), spans))
+            except MaskingError:
+                results.append(None)
+                retry.append(i)
+        # Segments that lost a placeholder get one more request of their own
+        for i, translation in zip(retry, await asyncio.gather(*(self._try_translate(*masked[i]) for i in retry))):
+            results[i] = translation
+        return results
+
+    async def _try_translate(self, content: str, spans: dict):
+        """Translated and unmasked text (spans None: keep placeholders), or the TranslationFailed error"""
         try:
-            response = self.client.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Translate this academic text from Portuguese to French:\n\n{content}"}
-                ],
-                model=self.model,
-                temperature=0.3,  # Low temperature for consistent translations
-                max_tokens=8000
-            )
-
-            translated = response.choices[0].message.content.strip()
-            return translated
-
-        except Exception as e:
+            translated = await self._translate_text(content)
+            return translated if spans is None else unmask(translated, spans)
+        except TranslationFailed as e:
             print(f"⚠️  Translation error: {e}")
-            return content  # Return original on error
-
-    def translate_file(self, input_path: Path, output_path: Path):
+            return e
+
+    async def _translate_text(self, content: str) -> str:
+        """Single API call (rate limited, retried); raises TranslationFailed"""
+        response = await self.engine.complete(
+            messages=[
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": self.user_prompt + content}
+            ],
+            model=self.model,
+            temperature=0.3,  # Low temperature for consistent translations
+            max_tokens=8000
+        )
+
+        translated = (response.choices[0].message.content or '').strip()
+        if not translated:
+            raise TranslationFailed("Empty response")
+        return translated
+
+    async def translate_file(self, input_path: Path, output_path: Path):
         """
-        Translate a Markdown file from Portuguese to French
+        Translate a Markdown file to the target language
+
+        The output is only written (atomically) if the whole file was
+        translated, and left untouched if the translation did not change.
+        Until then, progress is kept in <output>.partial.
 
         Args:
-            input_path: Path to Portuguese .md file
-            output_path: Path to save French .md file
+            input_path: Path to source .md file
+            output_path: Path to save translated .md file
         """
-        print(f"  Translating: {input_path.name}")
+        print(f"  Translating ({self.target['code']}): {input_path.name}")
+        # Telemetry of everything this coroutine (and its requests) does
+        name = f"{input_path.parent.name}/{input_path.name}"
+        current_file.set(name)
+        current_telemetry.set(self.telemetry)
+        started = time.monotonic()
 
         # Read original content
         with open(input_path, 'r', encoding='utf-8') as f:
             content = f.read()
 
         # Translate
-        translated = self.translate_markdown(content)
-
-        # Ensure output directory exists
-        output_path.parent.mkdir(parents=True, exist_ok=True)
+        partial_path = output_path.with_name(output_path.name + '.partial')
+        try:
+            translated = await self.translate_markdown(content, partial_path)
+        finally:
+            if self.telemetry:
+                self.telemetry.file_done(name, time.monotonic() - started)
 
-        # Write translated content
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(translated)
+        # Write translated content (unchanged output keeps its mtime for the build)
+        if not output_path.exists() or output_path.read_text(encoding='utf-8') != translated:
+            write_atomic(output_path, translated)
+        partial_path.unlink(missing_ok=True)
 
-    def translate_metadata(self, metadata_path: Path, output_path: Path):
+    async def translate_metadata(self, metadata_path: Path, output_path: Path):
         """
-        Translate metadata.yaml from Portuguese to French
-        Only translates text fields, preserves structure and bibliography
+        Translate metadata.yaml to the target language
+        Only translates text fields (all in one request, cached in the
+        translation memory; KEEP_FIELDS are copied), preserves structure and
+        bibliography. Theme strings, lang and babel language are the target's.
 
         Args:
-            metadata_path: Path to Portuguese metadata.yaml
-            output_path: Path to save French metadata.yaml
+            metadata_path: Path to source metadata.yaml
+            output_path: Path to save translated metadata.yaml
         """
-        print(f"  Translating metadata: {metadata_path.name}")
+        print(f"  Translating metadata ({self.target['code']}): {metadata_path.name}")
+        current_file.set(metadata_path.name)
+        current_telemetry.set(self.telemetry)
 
         with open(metadata_path, 'r', encoding='utf-8') as f:
             metadata = yaml.safe_load(f)
 
-        # Fields to translate
-        translate_fields = [
-            'title', 'subtitle', 'titleA', 'titleB',
-            'university', 'department', 'group',
-            'degree', 'author', 'supervisor',
-            'examiner', 'birthplace', 'abstract'
-        ]
-
-        # Translate text fields
-        for field in translate_fields:
-            if field in metadata and isinstance(metadata[field], str):
-                original = metadata[field]
-                # Simple translation for metadata (shorter texts)
-                metadata[field] = self._translate_short_text(original)
-
-        # Translate theme strings
-        if 'strings' in metadata and isinstance(metadata['strings'], dict):
-            french_strings = {
-                'contents': 'Sommaire',
-                'listfigures': 'Liste des figures',
-                'listtables': 'Liste des tableaux',
-                'listlistings': 'Liste des codes',
-                'abstract': 'Résumé',
-                'acknowledgments': 'Remerciements',
-                'bibliography': 'Bibliographie',
-                'chapter': 'Chapitre',
-                'appendix': 'Annexe'
-            }
-            metadata['strings'] = french_strings
-
-        # Change language to French
-        metadata['lang'] = 'fr-FR'
-        metadata['language'] = 'french'
+        # Text fields: from the translation memory, the rest in one request
+        fields = {field: metadata[field] for field in METADATA_FIELDS
+                  if field not in KEEP_FIELDS and isinstance(metadata.get(field), str) and metadata[field].strip()}
+        missing = {}
+        for field, text in fields.items():
+            translation = self.memory.get(text, self.metadata_pair, self.memory_model, PROMPT_VERSION) if self.memory else None
+            if translation is not None:
+                metadata[field] = translation
+            else:
+                missing[field] = text
+
+        if self.telemetry:
+            self.telemetry.cache(len(fields) - len(missing), len(missing))
+        if missing:
+            for field, translation in (await self._translate_fields(missing)).items():
+                metadata[field] = translation
+                if self.memory:
+                    self.memory.put(missing[field], translation, self.metadata_pair, self.memory_model, PROMPT_VERSION)
+
+        # Theme strings and language of the target
+        metadata['strings'] = dict(self.target['strings'])
+        metadata['lang'] = self.target['lang']
+        metadata['language'] = self.target['babel']
 
         # Write translated metadata
-        with open(output_path, 'w', encoding='utf-8') as f:
-            yaml.dump(metadata, f, allow_unicode=True, sort_keys=False)
-
-    def _translate_short_text(self, text: str) -> str:
-        """Translate short text snippets (titles, names, etc.)"""
+        write_atomic(output_path, yaml.dump(metadata, allow_unicode=True, sort_keys=False))
+
+    async def _translate_fields(self, fields: dict) -> dict:
+        """Translate {field: text} in a single JSON request; raises TranslationFailed"""
+        masked = {}
+        spans = {}
+        start = 0
+        for field, text in fields.items():
+            masked[field], spans[field] = mask(text, start=start)
+            start += len(spans[field])
+        request = json.dumps(masked, ensure_ascii=False, indent=2)
+
+        response = await self.engine.complete(
+            messages=[
+                {"role": "system", "content": self.metadata_prompt},
+                {"role": "user", "content": request}
+            ],
+            model=self.model,
+            temperature=0.3,
+            max_tokens=min(8000, 2 * estimate_tokens(request) + 200)
+        )
+
+        # Tolerate a ```json fence around the object
+        content = (response.choices[0].message.content or '').strip()
+        content = re.sub(r"^```(?:json)?\s*|\s*```$", '', content)
         try:
-            response = self.client.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": "Translate from Portuguese to French. Return ONLY the translation, nothing else."},
-                    {"role": "user", "content": text}
-                ],
-                model=self.model,
-                temperature=0.3,
-                max_tokens=500
-            )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            print(f"⚠️  Short translation error: {e}")
-            return text
+            translated = json.loads(content)
+        except ValueError as e:
+            raise TranslationFailed(f"Metadata response is not JSON: {e}") from e
+        if not isinstance(translated, dict) or set(translated) != set(fields) \
+                or not all(isinstance(value, str) and value.strip() for value in translated.values()):
+            raise TranslationFailed(f"Metadata response does not match the fields {sorted(fields)}")
 
+        # Placeholders are numbered across fields, so one moved to another field fails too
+        return {field: unmask(value.strip(), spans[field]) for field, value in translated.items()}
 
-def translate_thesis_content(api_key: str, content_dir: Path, output_dir: Path):
-    """
-    Translate all thesis Markdown content to French
 
-    Args:
-        api_key: Groq API key
-        content_dir: Path to content/text directory (Portuguese)
-        output_dir: Path to output directory for French content
+async def run_translation_jobs(translator: ThesisTranslator, files: list, metadata: tuple = None,
+                               on_file=None):
+    """Translate [(input, output), ...] Markdown files and the metadata concurrently
+
+    on_file(input, output) is called as soon as each file (or the metadata)
+    has been written, e.g. to start converting it while the others are
+    still being translated; it must not block.
+    Raises TranslationFailed naming every file that could not be translated.
     """
-    translator = ThesisTranslator(api_key)
+    async def job(translate, input_path, output_path):
+        await translate(input_path, output_path)
+        if on_file:
+            on_file(input_path, output_path)
+
+    jobs = [job(translator.translate_file, input_path, output_path) for input_path, output_path in files]
+    names = [input_path.name for input_path, _ in files]
+    if metadata:
+        jobs.append(job(translator.translate_metadata, *metadata))
+        names.append(metadata[0].name)
+
+    results = await asyncio.gather(*jobs, return_exceptions=True)
 
-    print("📚 Translating thesis content to French...")
+    failed = []
+    for name, result in zip(names, results):
+        if isinstance(result, Exception):
+            print(f"  ✗ {name}: {result}")
+            failed.append(name)
+    if failed:
+        raise TranslationFailed(f"{len(failed)} file(s) not translated: {', '.join(failed)}")
+
+
+def collect_translation_jobs(content_dir: Path, output_dir: Path) -> tuple:
+    """([(input, output), ...] Markdown files, (metadata input, output) or None) of a thesis"""
+    files = []
 
     # Translate chapters
     chapters_in = content_dir / "chapters"
@@ -190,14 +429,14 @@ def translate_thesis_content(api_key: str, content_dir: Path, output_dir: Path):
             if item.is_file() and item.suffix == '.md':
                 # Direct .md file (e.g., 01-introduction.md)
                 output_file = chapters_out / item.name
-                translator.translate_file(item, output_file)
+                files.append((item, output_file))
 
             elif item.is_dir():
                 # Subdirectory with main.md (legacy structure)
                 md_file = item / "main.md"
                 if md_file.exists():
                     output_file = chapters_out / item.name / "main.md"
-                    translator.translate_file(md_file, output_file)
+                    files.append((md_file, output_file))
 
                     # Copy media directory if exists
                     media_in = item / "media"
@@ -213,16 +452,110 @@ def translate_thesis_content(api_key: str, content_dir: Path, output_dir: Path):
     if structure_in.exists():
         for md_file in sorted(structure_in.glob("*.md")):
             output_file = structure_out / md_file.name
-            translator.translate_file(md_file, output_file)
+            files.append((md_file, output_file))
 
-    # Translate metadata (save inside text-fr/ directory)
+    # Translate metadata (save inside the output directory, e.g. text-fr/metadata.yaml)
     metadata_in = content_dir.parent / "metadata.yaml"
-    metadata_out = output_dir / "metadata.yaml"  # Save as metadata.yaml inside text-fr/
+    metadata_out = output_dir / "metadata.yaml"
+
+    metadata = (metadata_in, metadata_out) if metadata_in.exists() else None
+    return files, metadata
+
+
+def translate_languages(api_key: str, content_dir: Path, targets: list, memory_path: Path = None,
+                        on_file=None, source: dict = None, on_target=None) -> dict:
+    """
+    Translate the thesis into several languages in one run
+
+    All targets share one engine, so together they stay within the
+    provider's rate limits, and one translation memory.
+
+    Args:
+        api_key: Groq API key (unused by the other backends)
+        content_dir: Path to content/text directory (source language)
+        targets: [(target language, output directory), ...] (see languages.py)
+        memory_path: Translation memory database (default: TRANSLATION_MEMORY
+            or content/.translation-memory.sqlite)
+        on_file: Called with (input, output) as each file lands (see run_translation_jobs)
+        source: Source language (default: from metadata.yaml)
+        on_target: Called with (target code, None or TranslationFailed) as soon as
+            one target is done and its report written, while the others may still
+            be translating; like on_file it runs in the event loop and must not block
+
+    Returns {target code: None, or the TranslationFailed of that target}.
+    Each target's telemetry report is written next to its output directory.
+    """
+    if source is None:
+        source = language_matrix(_load_yaml(content_dir.parent / "metadata.yaml"))[0]
+    memory_path = memory_path or Path(os.getenv("TRANSLATION_MEMORY", content_dir.parent / ".translation-memory.sqlite"))
+    memory = TranslationMemory(memory_path)
+    engine = TranslationEngine(create_backend(api_key))
+
+    translators = []
+    for target, output_dir in targets:
+        telemetry = TranslationTelemetry(backend=backend_name(), pair=f"{source['code']}-{target['code']}",
+                                         prompt_version=PROMPT_VERSION)
+        translator = ThesisTranslator(api_key, memory, engine, telemetry, source, target)
+        telemetry.run_info.update(model=translator.model, concurrency=engine.concurrency,
+                                  chunk_tokens=CHUNK_TOKENS)
+        translators.append((translator, Path(output_dir)))
+
+    async def run_target(translator, output_dir):
+        files, metadata = collect_translation_jobs(content_dir, output_dir)
+        try:
+            await run_translation_jobs(translator, files, metadata, on_file)
+            outcome = None
+        except Exception as e:
+            outcome = e
+        translator.telemetry.write(report_path(output_dir))
+        if on_target:
+            on_target(translator.target['code'], outcome)
+        return outcome
+
+    async def run_all():
+        jobs = []
+        for translator, output_dir in translators:
+            print(f"📚 Translating thesis content to {translator.target['name']}...")
+            jobs.append(run_target(translator, output_dir))
+        return await asyncio.gather(*jobs)
+
+    try:
+        outcomes = asyncio.run(run_all())
+    finally:
+        memory.close()
+        for translator, output_dir in translators:
+            translator.telemetry.write(report_path(output_dir))
+
+    results = {}
+    for (translator, _), outcome in zip(translators, outcomes):
+        results[translator.target['code']] = outcome
+        if outcome is None:
+            print(f"✅ Translation to {translator.target['name']} complete!")
+        else:
+            print(f"❌ Translation to {translator.target['name']} failed: {outcome}")
+    return results
+
+
+def translate_thesis_content(api_key: str, content_dir: Path, output_dir: Path, memory_path: Path = None,
+                             on_file=None, source: dict = None, target: dict = None):
+    """
+    Translate all thesis Markdown content to one language (French by default)
+
+    See translate_languages() for the arguments. Raises TranslationFailed if
+    any file could not be translated. The telemetry report is written next
+    to output_dir in any case.
+    """
+    target = target or language('fr')
+    results = translate_languages(api_key, content_dir, [(target, output_dir)], memory_path, on_file, source)
+    if results[target['code']] is not None:
+        raise results[target['code']]
 
-    if metadata_in.exists():
-        translator.translate_metadata(metadata_in, metadata_out)
 
-    print("✅ Translation complete!")
+def _load_yaml(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f) or {}
 
 
 if __name__ == "__main__":
@@ -233,15 +566,19 @@ if __name__ == "__main__":
     if len(sys.argv) > 1:
         api_key = sys.argv[1]
 
-    if not api_key:
+    if not backend_available(api_key):
         print("❌ Error: GROQ_API_KEY not found")
         print("Usage: python translator.py [API_KEY]")
+        print("   or: TRANSLATION_BACKEND=openai|fake python translator.py")
         sys.exit(1)
 
-    # Paths
+    # Paths: content/text → content/text-<code> for every target in metadata.yaml
     project_root = Path(__file__).parent.parent.parent
     content_dir = project_root / "content" / "text"
-    output_dir = project_root / "content" / "text-fr"
+    source, targets = language_matrix(_load_yaml(project_root / "content" / "metadata.yaml"))
 
     # Run translation
-    translate_thesis_content(api_key, content_dir, output_dir)
+    results = translate_languages(api_key, content_dir,
+                                  [(target, content_dir.parent / f"text-{target['code']}") for target in targets],
+                                  source=source)
+    sys.exit(1 if any(results.values()) else 0)
@@ -2,21 +2,49 @@
 """
 Thesis File Watcher
 Automatically rebuilds PDF when files change
+
+Only the pipeline stages affected by a change are run (see BuildGraph):
+a chapter only reconverts its own .tex, metadata only regenerates the main
+document, and .bib or theme changes go straight to the LaTeX compile.
 """
 
 import sys
 import time
+import shutil
+import argparse
+import threading
+from fnmatch import fnmatch
 from pathlib import Path
 from watchdog.observers import Observer
+from watchdog.observers.polling import PollingObserver
 from watchdog.events import FileSystemEventHandler
-import subprocess
+from build import ensure_build_dir, build_latex, BuildCancelled, LatexmkSession
+from convert_md import convert_project, generate_main_tex, load_metadata, find_markdown_files
+from preview_server import PreviewServer, DEFAULT_PORT
+from html_preview import HtmlPreview
+from concurrent.futures import ThreadPoolExecutor
 
 # Directories
 ROOT_DIR = Path(__file__).parent.parent.parent
 CONTENT_DIR = ROOT_DIR / "content"
-BUILD_SCRIPT = Path(__file__).parent / "build.py"
+TEXT_DIR = CONTENT_DIR / "text"
+METADATA_FILE = CONTENT_DIR / "metadata.yaml"
+THEME_DIR = ROOT_DIR / "core" / "theme"
 BUILD_DIR = Path("/tmp/thesis-build")
 
+# Pipeline stages, in execution order
+STAGES = ('convert', 'main_tex', 'latex')
+
+# Files that can trigger a rebuild
+DEFAULT_INCLUDE = ['*.md', '*.tex', '*.bib', '*.yaml', '*.yml']
+
+# Ignored: media trees, translated trees (text-fr, ...), hidden files
+# and editor temp/backup files used for atomic saves
+DEFAULT_EXCLUDE = [
+    'media', 'text-*', '.*', '__pycache__',
+    '*~', '*.swp', '*.swx', '.#*', '#*#', '4913', '*.tmp', '*.bak',
+]
+
 # Colors
 class Colors:
     GREEN = '\033[92m'
@@ -26,57 +54,372 @@ class Colors:
     BOLD = '\033[1m'
     END = '\033[0m'
 
+class BuildGraph:
+    """Maps changed input files to the pipeline stages they affect
+
+    - chapter/structure/appendix .md -> convert (only changed files are
+      reconverted, see convert_md.convert_project), then latex
+    - metadata.yaml                  -> main_tex (strings.tex + thesis.tex), then latex
+    - .bib                           -> latex (latexmk reruns the bibliography pass)
+    - theme files (preamble, frontbackmatter, cover) -> latex
+    - other .tex under content/      -> latex
+    """
+
+    SOURCE_SECTIONS = ('chapters', 'structure', 'appendices')
+
+    def __init__(self, text_dir: Path = TEXT_DIR, metadata_file: Path = METADATA_FILE,
+                 theme_dir: Path = THEME_DIR, content_dir: Path = CONTENT_DIR):
+        self.text_dir = Path(text_dir).resolve()
+        self.metadata_file = Path(metadata_file).resolve()
+        self.theme_dir = Path(theme_dir).resolve()
+        self.content_dir = Path(content_dir).resolve()
+
+    def stages_for(self, path) -> set:
+        """Stages directly affected by a change to path"""
+        path = Path(path).resolve()
+        suffix = path.suffix
+
+        if path == self.metadata_file:
+            return {'main_tex'}
+        if suffix == '.bib':
+            return {'latex'}
+        if path.is_relative_to(self.theme_dir):
+            return {'latex'}
+        if suffix == '.md' and path.is_relative_to(self.text_dir):
+            if path.relative_to(self.text_dir).parts[0] in self.SOURCE_SECTIONS:
+                return {'convert'}
+            return set()
+        if suffix == '.tex' and path.is_relative_to(self.content_dir):
+            return {'latex'}
+        return set()
+
+    def plan(self, paths) -> list:
+        """Ordered list of stages to run for a set of changed paths"""
+        stages = set()
+        for path in paths:
+            stages |= self.stages_for(path)
+        # Every stage feeds the PDF
+        if stages:
+            stages.add('latex')
+        return [stage for stage in STAGES if stage in stages]
+
+
+class CompileSession:
+    """Build state kept in memory for the whole watch session
+
+    - the toolchain probe runs once
+    - metadata.yaml is parsed again only when it changes
+    - Markdown hashes are cached by mtime/size for convert_project()
+    - LaTeX runs in a persistent latexmk -pvc session (LatexmkSession) that
+      keeps its aux files and dependency database warm in BUILD_DIR;
+      with persistent=False each build runs a one-shot latexmk
+    """
+
+    TOOLS = ('pandoc', 'latexmk')
+
+    def __init__(self, persistent: bool = True):
+        self.tools = {tool: shutil.which(tool) is not None for tool in self.TOOLS}
+        self.hash_cache = {}
+        self._metadata = None
+        self._metadata_signature = None
+        self.latexmk = LatexmkSession() if persistent and self.tools['latexmk'] else None
+
+    def missing_tools(self) -> list:
+        return [tool for tool, found in self.tools.items() if not found]
+
+    def metadata(self) -> dict:
+        """Parsed metadata.yaml, reloaded only when the file changed"""
+        try:
+            stat = METADATA_FILE.stat()
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            signature = None
+        if self._metadata is None or signature != self._metadata_signature:
+            self._metadata = load_metadata(METADATA_FILE)
+            self._metadata_signature = signature
+        return self._metadata
+
+    def convert(self) -> dict:
+        return convert_project(TEXT_DIR, BUILD_DIR, METADATA_FILE, content_dir=CONTENT_DIR,
+                               metadata=self.metadata(), hash_cache=self.hash_cache)
+
+    def main_tex(self):
+        generate_main_tex(self.metadata(), TEXT_DIR, BUILD_DIR, CONTENT_DIR)
+
+    def compile(self, cancel_event=None) -> bool:
+        if self.latexmk:
+            return self.latexmk.compile(cancel_event)
+        return build_latex(cancel_event)
+
+    def close(self):
+        if self.latexmk:
+            self.latexmk.stop()
+
+
+class WatchFilter:
+    """Include/exclude globs, applied when events are dispatched
+
+    Exclude patterns without '/' match any path component (so 'media'
+    prunes every media/ subtree and '*.swp' any swap file); patterns with
+    '/' match the whole path relative to the watched root. Include patterns
+    match file names. Events under excluded paths are dropped before any
+    handler runs.
+    """
+
+    def __init__(self, include=None, exclude=None):
+        self.include = list(include or DEFAULT_INCLUDE)
+        exclude = list(exclude if exclude is not None else DEFAULT_EXCLUDE)
+        self.name_patterns = [pattern for pattern in exclude if '/' not in pattern]
+        self.path_patterns = [pattern.strip('/') for pattern in exclude if '/' in pattern]
+
+    def is_excluded(self, rel_path: Path) -> bool:
+        if any(fnmatch(part, pattern) for part in rel_path.parts for pattern in self.name_patterns):
+            return True
+        return any(fnmatch(rel_path.as_posix(), pattern) for pattern in self.path_patterns)
+
+    def accepts_file(self, rel_path: Path) -> bool:
+        return not self.is_excluded(rel_path) and any(fnmatch(rel_path.name, pattern) for pattern in self.include)
+
+
 class ThesisWatcher(FileSystemEventHandler):
-    """Watch for file changes and trigger rebuild"""
+    """Watch for file changes and trigger rebuild
+
+    Observer callbacks only queue the changed path. A builder thread waits
+    until no change arrived for debounce_seconds (trailing edge), then builds
+    everything queued in one go. A change during a build cancels it, and the
+    cancelled changes are rebuilt together with the new ones, so the PDF
+    always ends up reflecting the latest saved state.
+    """
+
+    def __init__(self, preview: PreviewServer = None, watch_filter: WatchFilter = None,
+                 roots=(CONTENT_DIR, THEME_DIR), session: CompileSession = None,
+                 html: HtmlPreview = None):
+        self.debounce_seconds = 0.5  # Quiet period that ends a burst of saves
+        self.graph = BuildGraph()
+        self.session = session or CompileSession(persistent=False)
+        self.preview = preview
+        # Chapter HTML is rendered on its own thread, next to the PDF build
+        self.html = html if preview else None
+        self.html_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="html-preview") if self.html else None
+        self.filter = watch_filter or WatchFilter()
+        self.roots = [Path(root).resolve() for root in roots]
+        self.observer = None
+        self.watched_dirs = {}  # {root: watch handle from observer.schedule()}
+
+        self.condition = threading.Condition()
+        self.pending = set()
+        self.full_pending = False
+        self.last_event = 0
+        self.building = False
+        self.stopped = False
+        self.cancel_event = threading.Event()
+        self.builder = threading.Thread(target=self.build_loop, name="thesis-builder", daemon=True)
+
+    def start(self):
+        self.builder.start()
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.cancel_event.set()
+            self.condition.notify_all()
+        self.builder.join()
+        if self.html_worker:
+            self.html_worker.shutdown(cancel_futures=True)
+
+    def render_html(self, md_file: Path):
+        """Render one chapter's HTML preview and publish it (runs on the HTML worker)"""
+        if not md_file.exists():
+            return
+        started = time.time()
+        try:
+            html, cached = self.html.render(md_file)
+        except Exception as e:
+            self.log(f"  HTML preview of {md_file.name} failed: {e}", Colors.RED)
+            return
+        seconds = time.time() - started
+        self.preview.publish_chapter(md_file.stem, html, seconds)
+        if not cached:
+            self.log(f"  html: {md_file.name} {seconds:.2f}s")
 
-    def __init__(self):
-        self.last_build = 0
-        self.debounce_seconds = 2  # Wait 2 seconds before rebuilding
+    def queue_html(self, path=None):
+        """Queue HTML previews for a changed path (None = every chapter)"""
+        if not self.html:
+            return
+        if path is None:
+            md_files = [md for files in find_markdown_files(TEXT_DIR).values() for md in files]
+        elif Path(path).resolve() == METADATA_FILE.resolve():
+            # Bibliography or language may have changed: re-render everything
+            self.html.update_metadata(self.session.metadata())
+            return self.queue_html(None)
+        elif Path(path).suffix == '.md' and Path(path).resolve().is_relative_to(TEXT_DIR.resolve()):
+            md_files = [Path(path)]
+        else:
+            return
+        for md_file in md_files:
+            self.html_worker.submit(self.render_html, md_file)
+
+    def queue_change(self, path=None):
+        """Queue a changed path (None = full rebuild); never blocks on a build"""
+        self.queue_html(path)
+        with self.condition:
+            if path is None:
+                self.full_pending = True
+            else:
+                self.pending.add(path)
+            self.last_event = time.time()
+            if self.building:
+                # Restart with the latest state instead of finishing a stale build
+                self.cancel_event.set()
+            self.condition.notify_all()
+
+    def build_loop(self):
+        """Builder thread: coalesce queued changes and build on the trailing edge"""
+        while True:
+            with self.condition:
+                while not self.stopped and not (self.pending or self.full_pending):
+                    self.condition.wait()
+                if self.stopped:
+                    return
+
+                # Trailing edge: wait until the burst of events is over
+                while not self.stopped:
+                    remaining = self.last_event + self.debounce_seconds - time.time()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                if self.stopped:
+                    return
+
+                paths, full = self.pending, self.full_pending
+                self.pending, self.full_pending = set(), False
+                self.cancel_event.clear()
+                self.building = True
+
+            completed = self.trigger_build(None if full else paths)
+
+            with self.condition:
+                self.building = False
+                if not completed:
+                    # Cancelled: rebuild these changes together with the new ones
+                    self.pending |= paths
+                    self.full_pending = self.full_pending or full
 
     def log(self, message, color=Colors.BLUE):
         timestamp = time.strftime("%H:%M:%S")
         print(f"{color}{Colors.BOLD}[{timestamp}]{Colors.END} {message}")
 
+    def relative_to_root(self, path):
+        """(root, path relative to it) for a path under a watched root, else None"""
+        path = Path(path).resolve()
+        for root in self.roots:
+            if path.is_relative_to(root):
+                return root, path.relative_to(root)
+        return None
+
+    def watch_root(self, root: Path):
+        """One recursive watch per root: a single inotify instance however deep the tree"""
+        if root not in self.watched_dirs:
+            self.watched_dirs[root] = self.observer.schedule(self, str(root), recursive=True)
+
+    def is_ignored(self, path) -> bool:
+        """Outside the watched roots, or under an excluded path"""
+        located = self.relative_to_root(path)
+        return located is None or bool(located[1].parts and self.filter.is_excluded(located[1]))
+
+    def dispatch(self, event):
+        """Drop events of excluded paths (a move counts if either end is watched)"""
+        paths = [event.src_path] + ([event.dest_path] if getattr(event, 'dest_path', '') else [])
+        if all(self.is_ignored(path) for path in paths):
+            return
+        super().dispatch(event)
+
+    def add_directory(self, directory):
+        """Queue the files of a new or moved-in directory (some may predate its inotify watch)"""
+        directory = Path(directory)
+        for file_path in directory.rglob('*'):
+            if file_path.is_file() and self.should_rebuild(file_path):
+                self.queue_change(str(file_path))
+
     def should_rebuild(self, path):
         """Check if file change should trigger rebuild"""
-        # Watch .md, .tex, .bib, and .yaml files
-        extensions = {'.md', '.tex', '.bib', '.yaml', '.yml'}
-        if Path(path).suffix not in extensions:
+        # Only included, non-excluded files under a watched root
+        located = self.relative_to_root(path)
+        if located is None or not self.filter.accepts_file(located[1]):
             return False
 
         # Ignore build directory
         if '/tmp/thesis-build' in str(path):
             return False
 
-        # Debounce: don't rebuild too frequently
-        now = time.time()
-        if now - self.last_build < self.debounce_seconds:
+        # Ignore files no pipeline stage depends on (e.g. content/text-fr)
+        if not self.graph.stages_for(path):
             return False
 
         return True
 
-    def trigger_build(self):
-        """Trigger a rebuild"""
+    def run_stage(self, stage: str) -> bool:
+        """Run one pipeline stage in-process"""
+        if stage == 'convert':
+            result = self.session.convert()
+            for file_result in result['files']:
+                if file_result['status'] != 'skipped':
+                    self.log(f"  {file_result['status']}: {file_result['source'].name}")
+                if file_result['error']:
+                    self.log(f"    {file_result['error']}", Colors.RED)
+            return result['success']
+
+        if stage == 'main_tex':
+            self.session.main_tex()
+            return True
+
+        if stage == 'latex':
+            return self.session.compile(self.cancel_event)
+
+        raise ValueError(f"Unknown stage: {stage}")
+
+    def trigger_build(self, changed_paths=None) -> bool:
+        """Rebuild the stages affected by changed_paths (all stages if None)
+
+        Returns False if the build was cancelled by a newer change.
+        """
+        stages = list(STAGES) if changed_paths is None else self.graph.plan(changed_paths)
+        if not stages:
+            return True
+
         self.log("=" * 60, Colors.YELLOW)
-        self.log("File changed, rebuilding...", Colors.YELLOW)
+        self.log(f"Rebuilding: {' → '.join(stages)}", Colors.YELLOW)
         self.log("=" * 60, Colors.YELLOW)
 
         try:
-            result = subprocess.run(
-                [sys.executable, str(BUILD_SCRIPT)],
-                capture_output=False,
-                text=True
-            )
+            ensure_build_dir()
+            ok = True
+            timings = {}
+            for stage in stages:
+                if self.cancel_event.is_set():
+                    raise BuildCancelled(stage)
+                started = time.time()
+                ok = self.run_stage(stage)
+                timings[stage] = round(time.time() - started, 3)
+                self.log(f"  {stage}: {timings[stage]:.2f}s")
+                if not ok:
+                    break
 
-            if result.returncode == 0:
+            if ok:
                 self.log("✓ Rebuild successful! 🎉", Colors.GREEN)
+                # Viewers reload only after a successful build
+                if self.preview and (BUILD_DIR / "thesis.pdf").exists():
+                    self.preview.publish(BUILD_DIR / "thesis.pdf", timings, BUILD_DIR / "thesis.log")
             else:
-                self.log("✗ Rebuild failed", Colors.RED)
+                self.log(f"✗ Rebuild failed at {stage}", Colors.RED)
 
+        except BuildCancelled:
+            self.log("↻ Newer change saved, restarting build", Colors.YELLOW)
+            return False
         except Exception as e:
             self.log(f"Error during rebuild: {e}", Colors.RED)
 
-        self.last_build = time.time()
+        return True
 
     def on_modified(self, event):
         """Called when a file is modified"""
@@ -86,36 +429,116 @@ class ThesisWatcher(FileSystemEventHandler):
         if self.should_rebuild(event.src_path):
             file_name = Path(event.src_path).name
             self.log(f"📝 {file_name} changed", Colors.BLUE)
-            self.trigger_build()
+            self.queue_change(event.src_path)
 
     def on_created(self, event):
         """Called when a file is created"""
         if event.is_directory:
+            self.add_directory(event.src_path)
             return
 
         if self.should_rebuild(event.src_path):
             file_name = Path(event.src_path).name
             self.log(f"📝 {file_name} created", Colors.BLUE)
-            self.trigger_build()
+            self.queue_change(event.src_path)
+
+    def on_deleted(self, event):
+        """Called when a file is deleted (removes the stale chapter output)"""
+        if event.is_directory:
+            return
+
+        if self.should_rebuild(event.src_path):
+            file_name = Path(event.src_path).name
+            self.log(f"📝 {file_name} deleted", Colors.BLUE)
+            self.queue_change(event.src_path)
+
+    def on_moved(self, event):
+        """Called on rename - editors save atomically by renaming a temp file over the target"""
+        if event.is_directory:
+            self.add_directory(event.dest_path)
+            return
+
+        # The temp file is excluded, so only the real source and/or target count
+        changed = [path for path in (event.src_path, event.dest_path) if self.should_rebuild(path)]
+        if changed:
+            self.log(f"📝 {Path(event.dest_path).name} saved", Colors.BLUE)
+            for path in changed:
+                self.queue_change(path)
+
+def start_observer(watcher: ThesisWatcher, poll: bool = False):
+    """Set up watches and start the observer, falling back to polling if inotify fails"""
+    observer_class = PollingObserver if poll else Observer
+    while True:
+        observer = observer_class()
+        watcher.observer = observer
+        watcher.watched_dirs = {}
+        try:
+            for root in watcher.roots:
+                if root.exists():
+                    watcher.watch_root(root)
+            observer.start()
+        except OSError as e:
+            if observer_class is PollingObserver:
+                raise
+            # e.g. inotify watch limit reached or unsupported filesystem;
+            # release the native watches scheduled so far before polling
+            observer.unschedule_all()
+            observer.stop()
+            watcher.log(f"Native file watching failed ({e}), falling back to polling", Colors.YELLOW)
+            observer_class = PollingObserver
+            continue
+
+        mode = "polling" if observer_class is PollingObserver else "native"
+        watcher.log(f"Watching {len(watcher.watched_dirs)} root(s) recursively ({mode})", Colors.BLUE)
+        return observer
 
 def main():
     """Main watch function"""
+    parser = argparse.ArgumentParser(description='Rebuild the thesis PDF when files change')
+    parser.add_argument('--serve', action='store_true',
+                        help='Serve the latest PDF over HTTP and push reloads to the browser')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='Preview server port')
+    parser.add_argument('--html', action='store_true',
+                        help='With --serve, also serve per-chapter HTML previews under /html/')
+    parser.add_argument('--include', action='append', metavar='GLOB',
+                        help=f"File name glob that triggers rebuilds (default: {' '.join(DEFAULT_INCLUDE)})")
+    parser.add_argument('--exclude', action='append', default=[], metavar='GLOB',
+                        help='Extra glob excluded from watching (added to the defaults)')
+    parser.add_argument('--no-session', action='store_true',
+                        help='Run a cold one-shot latexmk per build instead of a persistent latexmk -pvc session')
+    parser.add_argument('--poll', action='store_true',
+                        help='Use a polling observer (filesystems without inotify, e.g. network mounts)')
+    args = parser.parse_args()
+
+    preview = None
+    if args.serve:
+        preview = PreviewServer(port=args.port, media_dir=CONTENT_DIR / "media")
+        preview.start()
+
     print(f"\n{Colors.BOLD}{Colors.GREEN}{'=' * 60}{Colors.END}")
     print(f"{Colors.BOLD}{Colors.GREEN}Thesis Watcher Started 👀{Colors.END}")
     print(f"{Colors.BOLD}{Colors.GREEN}{'=' * 60}{Colors.END}\n")
     print(f"Watching: {Colors.YELLOW}{CONTENT_DIR}{Colors.END}")
+    if preview:
+        print(f"Preview: {Colors.YELLOW}{preview.url}{Colors.END}")
+        if args.html:
+            print(f"Chapters: {Colors.YELLOW}{preview.url}html/{Colors.END}")
     print(f"Press {Colors.RED}Ctrl+C{Colors.END} to stop\n")
 
-    # Initial build
-    watcher = ThesisWatcher()
+    # Initial build (runs on the builder thread)
+    session = CompileSession(persistent=not args.no_session)
+    if session.missing_tools():
+        print(f"{Colors.RED}Missing tools: {', '.join(session.missing_tools())}{Colors.END}\n")
+
+    watch_filter = WatchFilter(args.include, DEFAULT_EXCLUDE + args.exclude)
+    html = HtmlPreview(CONTENT_DIR, BUILD_DIR / "html-cache", session.metadata()) if args.html else None
+    watcher = ThesisWatcher(preview, watch_filter, session=session, html=html)
+    watcher.start()
     watcher.log("Running initial build...", Colors.BLUE)
-    watcher.trigger_build()
+    watcher.queue_change(None)
 
-    # Start watching
-    event_handler = watcher
-    observer = Observer()
-    observer.schedule(event_handler, str(CONTENT_DIR), recursive=True)
-    observer.start()
+    # Start watching: one non-recursive watch per directory that is not excluded
+    observer = start_observer(watcher, args.poll)
 
     try:
         while True:
@@ -125,6 +548,10 @@ def main():
         observer.stop()
 
     observer.join()
+    watcher.stop()
+    session.close()
+    if preview:
+        preview.stop()
     print(f"{Colors.GREEN}Goodbye! 👋{Colors.END}\n")
 
 if __name__ == "__main__":
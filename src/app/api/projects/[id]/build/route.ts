@@ -8,6 +8,9 @@ import * as path from "path";
 // Use Docker for builds (set to false to use local Python)
 const USE_DOCKER = process.env.USE_DOCKER_BUILD !== "false";
 
+// Bytes of build.log returned with a build (the full log stays in the build dir)
+const LOG_TAIL_BYTES = 64 * 1024;
+
 // POST /api/projects/[id]/build - Start a new build
 export async function POST(
   request: NextRequest,
@@ -118,10 +121,28 @@ interface BuildResult {
   success: boolean;
   pdfPath?: string;
   buildDir?: string;
+  logFile?: string;
   logs?: string;
   error?: string;
 }
 
+// Read at most maxBytes from the end of a log file, without loading the rest
+async function readLogTail(file: string, maxBytes = LOG_TAIL_BYTES): Promise<string> {
+  const handle = await fs.open(file, "r");
+  try {
+    const { size } = await handle.stat();
+    const length = Math.min(size, maxBytes);
+    const buffer = Buffer.alloc(length);
+    await handle.read(buffer, 0, length, size - length);
+    const tail = buffer.toString("utf-8");
+    if (length === size) return tail;
+    // The log was cut: start at a line boundary and point to the full file
+    return `[... ${size - length} bytes omitted, see ${file}]\n${tail.slice(tail.indexOf("\n") + 1)}`;
+  } finally {
+    await handle.close();
+  }
+}
+
 async function runPythonBuild(projectData: object): Promise<BuildResult> {
   if (USE_DOCKER) {
     return runDockerBuild(projectData);
@@ -240,56 +261,76 @@ async function runLocalPythonBuild(projectData: object): Promise<BuildResult> {
       "build_project.py"
     );
 
-    // Spawn Python process
-    const python = spawn("python3", [scriptPath], {
+    // Spawn Python process (NDJSON protocol: one event per line, log in build dir)
+    const python = spawn("python3", [scriptPath, "--protocol=ndjson"], {
       cwd: process.cwd(),
     });
 
-    let stdout = "";
+    let pending = "";
     let stderr = "";
+    let result: { success: boolean; pdf_path?: string; build_dir?: string; log_file?: string; error?: string } | null = null;
+
+    const handleLine = (line: string) => {
+      if (!line.trim()) return;
+      try {
+        const event = JSON.parse(line);
+        if (event.event === "result") {
+          result = event;
+        } else if (event.event === "stage_start" || event.event === "stage_end") {
+          console.log(`[build ${(projectData as { project_id?: string }).project_id}] ${event.event} ${event.stage}`);
+        }
+      } catch {
+        // Ignore non-JSON lines
+      }
+    };
 
     python.stdout.on("data", (data) => {
-      stdout += data.toString();
+      pending += data.toString();
+      const lines = pending.split("\n");
+      pending = lines.pop() || "";
+      lines.forEach(handleLine);
     });
 
     python.stderr.on("data", (data) => {
-      stderr += data.toString();
+      // Keep only the tail of stderr
+      stderr = (stderr + data.toString()).slice(-4000);
     });
 
     // Send project data via stdin
     python.stdin.write(JSON.stringify(projectData));
     python.stdin.end();
 
-    python.on("close", (code) => {
-      // Try to parse result from stdout
-      const resultMatch = stdout.match(/--- RESULT ---\s*([\s\S]*?)$/);
-      if (resultMatch) {
-        try {
-          const result = JSON.parse(resultMatch[1].trim());
-          resolve({
-            success: result.success,
-            pdfPath: result.pdf_path,
-            buildDir: result.build_dir,
-            logs: stdout,
-          });
-          return;
-        } catch {
-          // Failed to parse result
+    python.on("close", async (code) => {
+      handleLine(pending);
+
+      if (result) {
+        let logs = "";
+        if (result.log_file) {
+          logs = await readLogTail(result.log_file).catch(() => "");
         }
+        resolve({
+          success: result.success,
+          pdfPath: result.pdf_path,
+          buildDir: result.build_dir,
+          logFile: result.log_file,
+          logs,
+          error: result.error,
+        });
+        return;
       }
 
-      // If no parseable result, check exit code
+      // If no result event, check exit code
       if (code === 0) {
         resolve({
           success: false,
           error: "Build completed but no PDF path found",
-          logs: stdout + stderr,
+          logs: stderr,
         });
       } else {
         resolve({
           success: false,
           error: `Build failed with exit code ${code}`,
-          logs: stdout + stderr,
+          logs: stderr,
         });
       }
     });